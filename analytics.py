@@ -0,0 +1,232 @@
+"""Pluggable backends for the canned query catalogs.
+
+The catalogs run either on the transactional database (the default) or in
+an embedded DuckDB over the Parquet snapshot written by snapshot.py. DuckDB
+scans the snapshot column by column with vectorized, multi-threaded
+execution, so the heavy GROUP BY and window-function queries stay off the
+MySQL instance that takes new cases, and need no server at all.
+
+Catalog SQL sticks to syntax that MySQL, DuckDB and SQLite share; each
+backend adapts what differs (bind parameters, EXPLAIN, and the predicate
+that restricts a query to a date window).
+
+Usage:
+    python analytics.py --backend duckdb                  # run the catalogs offline
+    python analytics.py --backend database --catalog complex
+    python analytics.py --window 2015-01-01 2015-01-31 --explain   # plans show the pruned months
+"""
+import argparse
+import functools
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from query_catalog import WINDOW_PREDICATE
+from settings import DATABASE_URL
+
+ANALYTICS_BACKENDS = ('database', 'duckdb')
+STREAM_CHUNK_SIZE = 5_000
+# :name bind parameters, but not :: casts.
+BIND_PARAMETER = re.compile(r'(?<![:\w]):([A-Za-z_]\w*)')
+# Distinct statements kept compiled per process; the catalogs and page queries are a few dozen.
+COMPILED_STATEMENTS = 512
+
+
+@functools.lru_cache(maxsize=COMPILED_STATEMENTS)
+def compiled(query):
+    """The SQLAlchemy statement for query, parsed for bind parameters once per process."""
+    return text(query)
+
+
+@functools.lru_cache(maxsize=COMPILED_STATEMENTS)
+def duckdb_statement(query):
+    """query with :name bind parameters rewritten to DuckDB's $name, once per process."""
+    return BIND_PARAMETER.sub(r'$\1', query)
+
+
+def precompile(queries):
+    """Compile a query catalog for either backend ahead of its first run."""
+    for query in queries:
+        compiled(query)
+        duckdb_statement(query)
+
+
+class DatabaseBackend:
+    """Runs queries on a SQLAlchemy engine: MySQL, or the SQLite stand-in."""
+
+    name = 'database'
+    # Monthly RANGE partitions on stop_date are pruned by the predicate itself.
+    window_predicate = WINDOW_PREDICATE
+
+    def __init__(self, engine, connect=None):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self._connect = connect or engine.connect
+
+    def ready(self):
+        return True
+
+    def data_version(self):
+        # Callers already key results on traffic_stops' own data version.
+        return None
+
+    def read(self, query, params=None):
+        with self._connect() as conn:
+            return pd.read_sql(compiled(query), conn, params=params)
+
+    def stream(self, query, params=None, chunk_size=STREAM_CHUNK_SIZE):
+        with self._connect() as conn:
+            conn.execution_options(stream_results=True)
+            yield from pd.read_sql(compiled(query), conn, params=params, chunksize=chunk_size)
+
+    def explain(self, query, params=None):
+        prefix = "EXPLAIN QUERY PLAN" if self.dialect == 'sqlite' else "EXPLAIN"
+        with self._connect() as conn:
+            return pd.read_sql(compiled(f"{prefix} {query.strip().rstrip(';')}"), conn, params=params)
+
+    def describe(self):
+        return f"{self.dialect} database"
+
+
+class DuckDBBackend:
+    """Runs queries in an in-process DuckDB over the traffic_stops snapshot.
+
+    traffic_stops is a view on the Parquet files of the snapshot's current
+    version, re-pointed by the first query after a refresh. Each thread gets its own cursor. snapshot.py
+    is imported on use: every page reads through the database backend, only
+    the catalogs through this one.
+    """
+
+    name = 'duckdb'
+    dialect = 'duckdb'
+
+    def __init__(self, path=None, threads=None):
+        import duckdb
+        from snapshot import SNAPSHOT_PATH
+
+        self.path = path or SNAPSHOT_PATH
+        self._db = duckdb.connect(':memory:')
+        if threads:
+            self._db.execute(f"SET threads = {int(threads)}")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # The snapshot version the traffic_stops view reads.
+        self._view_source = None
+
+    @property
+    def partitioned(self):
+        return os.path.isdir(self.path)
+
+    @property
+    def window_predicate(self):
+        from snapshot import PARTITION_COLUMN
+        # DuckDB skips whole files only for filters on the Hive partition column.
+        if not self.partitioned:
+            return WINDOW_PREDICATE
+        return (f"{PARTITION_COLUMN} BETWEEN substr(:date_from, 1, 7) AND substr(:date_to, 1, 7) "
+                f"AND {WINDOW_PREDICATE}")
+
+    def ready(self):
+        return self.data_version() is not None
+
+    def data_version(self):
+        from snapshot import snapshot_modified_at
+        return snapshot_modified_at(self.path)
+
+    def _cursor(self):
+        from snapshot import PARTITION_COLUMN, snapshot_source
+        with self._lock:
+            if not self.ready():
+                raise FileNotFoundError(
+                    f"No snapshot at {self.path}; run `python snapshot.py` to build it"
+                )
+            snapshot_path = snapshot_source(self.path)
+            if snapshot_path != self._view_source:
+                path = snapshot_path.replace("'", "''")
+                if self.partitioned:
+                    source = (f"read_parquet('{os.path.join(path, '*', '*.parquet')}', hive_partitioning = true, "
+                              f"hive_types = {{'{PARTITION_COLUMN}': VARCHAR}})")
+                else:
+                    source = f"read_parquet('{path}')"
+                self._db.execute(f"CREATE OR REPLACE VIEW traffic_stops AS SELECT * FROM {source}")
+                self._view_source = snapshot_path
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self._db.cursor()
+        return cursor
+
+    def _execute(self, query, params=None):
+        if params:
+            return self._cursor().execute(duckdb_statement(query), params)
+        return self._cursor().execute(query)
+
+    def read(self, query, params=None):
+        return self._execute(query, params).df()
+
+    def stream(self, query, params=None, chunk_size=STREAM_CHUNK_SIZE):
+        reader = self._execute(query, params).fetch_record_batch(chunk_size)
+        for batch in reader:
+            yield batch.to_pandas()
+
+    def explain(self, query, params=None):
+        return self._execute(f"EXPLAIN {query.strip().rstrip(';')}", params).df()
+
+    def describe(self):
+        return f"DuckDB over {self.path}"
+
+
+def make_backend(name, engine=None, connect=None, snapshot_path=None):
+    if name == 'database':
+        return DatabaseBackend(engine if engine is not None else create_engine(DATABASE_URL), connect)
+    if name == 'duckdb':
+        return DuckDBBackend(snapshot_path)
+    raise ValueError(f"Unknown analytics backend: {name} (expected one of {', '.join(ANALYTICS_BACKENDS)})")
+
+
+def main():
+    from query_catalog import COMPLEX_QUERIES, MEDIUM_QUERIES, windowed
+    from snapshot import SNAPSHOT_PATH
+
+    catalogs = {'medium': MEDIUM_QUERIES, 'complex': COMPLEX_QUERIES}
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=ANALYTICS_BACKENDS, default='duckdb')
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="Parquet snapshot for the duckdb backend")
+    parser.add_argument('--catalog', choices=['all'] + list(catalogs), default='all')
+    parser.add_argument('--window', nargs=2, metavar=('FIRST', 'LAST'),
+                        help="only stops dated FIRST to LAST (YYYY-MM-DD, inclusive)")
+    parser.add_argument('--explain', action='store_true', help="print each query plan instead of running it")
+    args = parser.parse_args()
+    window = tuple(args.window) if args.window else None
+
+    backend = make_backend(args.backend, snapshot_path=args.snapshot)
+    failures = 0
+    for catalog_name, catalog in catalogs.items():
+        if args.catalog not in ('all', catalog_name):
+            continue
+        for name, query in catalog.items():
+            query, params = windowed(query, None, window, backend.window_predicate)
+            if args.explain:
+                plan = backend.explain(query, params)
+                print(f"{catalog_name:<8} {name}")
+                # DuckDB returns the whole plan as one rendered tree.
+                print(plan['explain_value'].iloc[0] if 'explain_value' in plan else plan.to_string(index=False))
+                continue
+            started = time.perf_counter()
+            try:
+                rows = len(backend.read(query, params))
+            except Exception as e:
+                failures += 1
+                print(f"{catalog_name:<8} {name:<60} FAILED: {e}")
+                continue
+            print(f"{catalog_name:<8} {name:<60} {(time.perf_counter() - started) * 1000:>9.1f} ms "
+                  f"{rows:>8,} rows")
+    print(f"Ran on {backend.describe()}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Dashboard pages, imported on first use by the router in traffic_dashboard.py.
+
+Streamlit re-executes the main script on every interaction, but modules it
+imports stay in sys.modules, so each page's imports, resources and function
+definitions are set up once per process and only when the page is opened.
+Not named pages/, which Streamlit would turn into its own multipage app.
+"""
+import importlib
+import sys
+
+# Sidebar title -> module in this package, in sidebar order.
+PAGES = {
+    "Dashboard": 'dashboard',
+    "Search Incidents": 'search_incidents',
+    "Vehicle Search": 'vehicle_search',
+    "Driver Details": 'driver_details',
+    "Register New Case": 'register_case',
+    "Bulk Import": 'bulk_upload',
+    "Medium Level Queries": 'medium_queries',
+    "Complex Level Queries": 'complex_queries',
+}
+
+
+def page_for_slug(slug):
+    """The page title for a ?page= slug (its module name), or None."""
+    for title, module in PAGES.items():
+        if module == slug:
+            return title
+    return None
+
+
+def render_page(title, instrumentation):
+    """Import the page's module if this process has not yet, then render it."""
+    module_name = f"{__name__}.{PAGES[title]}"
+    module = sys.modules.get(module_name)
+    if module is None:
+        with instrumentation.track('import', module_name):
+            module = importlib.import_module(module_name)
+    with instrumentation.track('render', title):
+        module.render()
@@ -0,0 +1,42 @@
+"""Bulk Import: resumable loads of historical stops from CSV or Parquet files."""
+import streamlit as st
+
+from app_pages.common import engine, get_stop_index, query_cache, refresh_row_indexes
+from bulk_import import checkpoint_path_for, detect_format, import_stops
+
+# ==================== PAGE ====================
+def render():
+    st.title("📥 Bulk Import")
+    st.markdown("Load historical traffic stops from a CSV or Parquet file")
+    
+    uploaded_file = st.file_uploader("Stops File", type=["csv", "parquet"])
+    
+    if uploaded_file is not None:
+        checkpoint_path = checkpoint_path_for(uploaded_file.name, uploaded_file.size)
+        
+        if st.button("Start Import"):
+            progress_bar = st.progress(0.0)
+            status = st.empty()
+            
+            def report_progress(progress):
+                progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0))
+                status.write(
+                    f"{progress.rows_read:,} rows read · {progress.rows_inserted:,} inserted · "
+                    f"{progress.rows_rejected:,} rejected · {progress.rows_per_second:,.0f} rows/s"
+                )
+            
+            try:
+                progress = import_stops(engine, uploaded_file, detect_format(uploaded_file.name),
+                                        checkpoint_path, on_progress=report_progress)
+                progress_bar.progress(1.0)
+                st.success(
+                    f"✅ Imported {progress.rows_inserted:,} rows ({progress.rows_rejected:,} rejected) "
+                    f"in {progress.elapsed:.1f}s at {progress.rows_per_second:,.0f} rows/s"
+                )
+            except Exception as e:
+                st.error(f"Error: {str(e)}. Run the import again to resume from the last checkpoint.")
+            finally:
+                query_cache.bump_version()
+                refresh_row_indexes()
+                # Chunks commit alongside other writers, possibly out of id order; reseal from the database.
+                get_stop_index().expire()
@@ -0,0 +1,665 @@
+"""Resources and helpers shared by the dashboard pages.
+
+Imported once per process by the page router in traffic_dashboard.py, so
+the engine, caches and helper definitions are set up on the first run
+rather than on every rerun. Page-specific resources live in their page
+module and are only set up when that page is first opened; getters for
+resources several pages share import their module on first call, so a
+page only loads the subsystems it uses.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import create_engine, make_url, text
+
+from analytics import DatabaseBackend, make_backend
+from instrumentation import METRICS_EXPORT_PATH, Instrumentation, current_origin, origin
+from query_catalog import PAGE_SIZE, build_where_clause, filtered_summary_query, page_query, windowed
+from query_executor import QueryExecutor
+from settings import (
+    ANALYTICS_BACKEND, DATABASE_URL, DB_CONNECT_TIMEOUT, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE,
+    DB_POOL_TIMEOUT, SHARED_CACHE,
+)
+from shared_cache import make_shared_cache
+
+# Database connection
+# Drivers that take a connect_timeout argument; others, such as SQLite's, reject it.
+CONNECT_TIMEOUT_BACKENDS = ('mysql', 'postgresql')
+
+@st.cache_resource
+def get_db_connection():
+    connect_args = {}
+    if make_url(DATABASE_URL).get_backend_name() in CONNECT_TIMEOUT_BACKENDS:
+        connect_args['connect_timeout'] = DB_CONNECT_TIMEOUT
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+    return engine
+
+engine = get_db_connection()
+
+@st.cache_resource
+def get_query_executor():
+    return QueryExecutor(engine)
+
+query_executor = get_query_executor()
+
+# Reads go through a backend; pages use the database and the canned query
+# catalogs use the analytics backend (see ANALYTICS BACKEND below).
+database = DatabaseBackend(engine, connect=query_executor.connect)
+
+@st.cache_resource
+def get_instrumentation():
+    return Instrumentation()
+
+instrumentation = get_instrumentation()
+
+# ==================== SHARED CACHE ====================
+# With TRAFFIC_SHARED_CACHE=directory, results and snapshot frames are kept
+# once per node for every worker process; see shared_cache.py.
+@st.cache_resource
+def get_shared_cache():
+    return make_shared_cache(SHARED_CACHE)
+
+shared_cache = get_shared_cache()
+
+# ==================== RESULT CACHE ====================
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DATA_VERSION_TTL_SECONDS = 5
+
+class QueryCache:
+    """LRU cache of query results shared by every session of this process.
+
+    Keys include a data-version token for traffic_stops, so new rows make
+    older entries unreachable; bump_version() does the same immediately.
+    With shared, a SharedFrameCache, misses fall through to the entries
+    every worker on the node shares, and the token's generation is the
+    shared one, so a bump in any worker invalidates them all.
+    """
+
+    def __init__(self, max_bytes=QUERY_CACHE_MAX_BYTES, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.total_bytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def data_version(self):
+        with self._lock:
+            if time.monotonic() - self._version_checked_at < DATA_VERSION_TTL_SECONDS:
+                return self._version
+        # MAX(id) is a single primary-key lookup, unlike COUNT(*) on InnoDB.
+        query = "SELECT MAX(id) FROM traffic_stops"
+        with instrumentation.track('db', query) as event, engine.connect() as conn:
+            max_id = conn.execute(text(query)).scalar()
+            event.rows = 1
+        generation = self.shared.generation() if self.shared is not None else self._generation
+        with self._lock:
+            self._version = (generation, max_id)
+            self._version_checked_at = time.monotonic()
+            return self._version
+
+    def bump_version(self):
+        if self.shared is not None:
+            self.shared.bump_generation()
+        with self._lock:
+            self._generation += 1
+            self._version_checked_at = 0.0
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        result = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._keep(key, result)
+        return result
+
+    def put(self, key, result):
+        """Cache result and return the cached copy to use in its place."""
+        if self.shared is not None:
+            result = self.shared.share(key, result)
+        self._keep(key, result)
+        return result
+
+    def _keep(self, key, result):
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(shared=shared_cache)
+
+query_cache = get_query_cache()
+
+# ==================== HELPER FUNCTIONS ====================
+def query_cache_key(query, params=None, postprocess=None, backend=database):
+    return (query, tuple(sorted((params or {}).items())), query_cache.data_version(),
+            getattr(postprocess, '__name__', None), backend.name, backend.data_version())
+
+def run_query(query, params=None, use_cache=True, postprocess=None, backend=database):
+    """Run a read query, serving repeated calls from the shared result cache.
+
+    postprocess, if given, is applied before the result is cached. Cached
+    DataFrames are shared between sessions and must not be mutated. Safe to
+    call from worker threads; errors are raised, not shown.
+    """
+    key = None
+    if use_cache:
+        key = query_cache_key(query, params, postprocess, backend)
+        result = query_cache.get(key)
+        if result is not None:
+            with instrumentation.track('db', query) as event:
+                event.cache = 'hit'
+                instrumentation.record_result(event, result)
+            return result
+    with instrumentation.track('db', query) as event:
+        event.cache = 'miss' if use_cache else None
+        result = backend.read(query, params)
+        instrumentation.record_result(event, result)
+    if instrumentation.is_slow(event):
+        instrumentation.capture_plan(backend, query, params)
+    if postprocess is not None:
+        with instrumentation.track('pandas', postprocess.__name__) as event:
+            result = postprocess(result)
+            instrumentation.record_result(event, result)
+    if key is not None:
+        result = query_cache.put(key, result)
+    return result
+
+def execute_query(query, params=None, use_cache=True, postprocess=None):
+    try:
+        return run_query(query, params, use_cache, postprocess)
+    except Exception as e:
+        st.error(f"Error executing query: {str(e)}")
+        return None
+
+def show_run_all(catalog, backend=database, window=None):
+    page_origin = current_origin.get()
+    
+    def run_named(name, query):
+        with origin(f"{page_origin}: {name}"):
+            return run_query(*windowed(query, None, window, backend.window_predicate), backend=backend)
+    
+    started = time.perf_counter()
+    outcomes = query_executor.run_all(run_named, {name: (name, query) for name, query in catalog.items()})
+    elapsed = time.perf_counter() - started
+    serial = sum(outcome.seconds for outcome in outcomes.values())
+    st.success(f"Ran {len(outcomes)} queries in {elapsed:.2f}s "
+               f"({serial:.2f}s of query time in total)")
+    for name, outcome in outcomes.items():
+        with st.expander(f"{name} · {outcome.seconds * 1000:.0f} ms"):
+            if outcome.error is not None:
+                st.error(f"Error executing query: {str(outcome.error)}")
+            else:
+                st.dataframe(outcome.result, use_container_width=True)
+
+def show_query_plan(query, params=None, backend=database):
+    """The backend's plan for query, e.g. to check which month partitions it reads."""
+    if not st.checkbox("Show query plan"):
+        return
+    try:
+        plan = backend.explain(query, params)
+    except Exception as e:
+        st.error(f"Error explaining query: {str(e)}")
+        return
+    if 'explain_value' in plan:
+        # DuckDB renders the whole plan as one tree.
+        st.code(plan['explain_value'].iloc[0])
+    else:
+        st.dataframe(plan, use_container_width=True, hide_index=True)
+
+# ==================== DATE WINDOW ====================
+# One date window, chosen in the sidebar, restricts every page of a session.
+# Pages read it with date_window() and pass it to their queries and to the
+# per-window aggregates, which only read the months in the window.
+DATE_WINDOWS = {"All dates": None, "Last 30 days": 30, "Last 90 days": 90, "Last 12 months": 365}
+CUSTOM_DATE_WINDOW = "Custom range"
+DATE_WINDOW_KEY = "date_window"
+# Windows whose aggregates, facet counts and profiles are kept per process.
+WINDOWED_RESOURCES = 8
+
+def show_date_window():
+    """Sidebar control for the session's date window; returns the window."""
+    choice = st.sidebar.selectbox("Stop dates", list(DATE_WINDOWS) + [CUSTOM_DATE_WINDOW],
+                                  key="date_window_choice")
+    today = date.today()
+    if choice == CUSTOM_DATE_WINDOW:
+        # Streamlit would otherwise refuse dates more than ten years back.
+        dates = st.sidebar.date_input("From / to", (today - timedelta(days=29), today),
+                                      min_value=date(1900, 1, 1), key="date_window_range")
+        # Until the second date is picked the range is a single day.
+        window = (dates[0].isoformat(), dates[-1].isoformat()) if dates else None
+    elif DATE_WINDOWS[choice] is None:
+        window = None
+    else:
+        window = ((today - timedelta(days=DATE_WINDOWS[choice] - 1)).isoformat(), today.isoformat())
+    if window is not None:
+        st.sidebar.caption(f"Stops dated {window[0]} to {window[1]}")
+    st.session_state[DATE_WINDOW_KEY] = window
+    return window
+
+def date_window():
+    """The session's date window as a (first, last) pair of ISO dates, or None for all dates."""
+    return st.session_state.get(DATE_WINDOW_KEY)
+
+def windowed_reader(window):
+    """read(query, params) for the id-watermark aggregates, restricted to window."""
+    return lambda query, params: run_query(*windowed(query, params, window), use_cache=False)
+
+# ==================== STREAMING EXECUTION ====================
+# Large results are read through a server-side cursor in chunks. Rendering
+# starts with the first chunk and stops at a row or memory cap, so peak
+# memory is bounded by the cap rather than by the size of the result.
+STREAM_CHUNK_SIZE = 5_000
+DEFAULT_ROW_CAP = 100_000
+STREAM_MEMORY_CAP_BYTES = 200 * 1024 * 1024
+
+def stream_query(query, params=None, chunk_size=STREAM_CHUNK_SIZE, backend=database):
+    return backend.stream(query, params, chunk_size)
+
+def show_streamed_result(query, params=None, row_cap=DEFAULT_ROW_CAP, backend=database):
+    """Render a query result progressively and return the rows shown.
+
+    Complete results are stored in the query cache; truncated ones are not.
+    """
+    key = query_cache_key(query, params, backend=backend)
+    cached = query_cache.get(key)
+    if cached is not None and len(cached) <= row_cap:
+        st.dataframe(cached, use_container_width=True)
+        st.caption(f"{len(cached):,} rows")
+        return cached
+    
+    table = st.empty()
+    counter = st.empty()
+    chunks = []
+    rows = 0
+    size = 0
+    truncated = False
+    stream = stream_query(query, params, backend=backend)
+    try:
+        with instrumentation.track('db', query) as event:
+            event.cache = 'miss'
+            for chunk in stream:
+                if rows + len(chunk) > row_cap:
+                    chunk = chunk.iloc[:row_cap - rows]
+                    truncated = True
+                chunks.append(chunk)
+                rows += len(chunk)
+                size += int(chunk.memory_usage(index=True, deep=True).sum())
+                event.rows, event.bytes = rows, size
+                if len(chunks) == 1:
+                    table.dataframe(chunk, use_container_width=True)
+                counter.caption(f"{rows:,} rows loaded…")
+                if size > STREAM_MEMORY_CAP_BYTES:
+                    truncated = True
+                if truncated:
+                    break
+    except Exception as e:
+        st.error(f"Error executing query: {str(e)}")
+        return None
+    finally:
+        # Closes the server-side cursor even when we stop early at the cap.
+        stream.close()
+    
+    if instrumentation.is_slow(event):
+        instrumentation.capture_plan(backend, query, params)
+    with instrumentation.track('pandas', 'concat chunks') as concat_event:
+        result = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        instrumentation.record_result(concat_event, result)
+    if len(chunks) > 1:
+        table.dataframe(result, use_container_width=True)
+    if truncated:
+        counter.warning(f"Showing the first {rows:,} rows ({size / 1024 ** 2:.0f} MB). "
+                        "Raise the row limit to see more.")
+    else:
+        counter.caption(f"{rows:,} rows")
+        result = query_cache.put(key, result)
+    return result
+
+# ==================== EXPORT ====================
+def show_export(name, key, make_chunks):
+    """Export controls that stream make_chunks() to a file; see export.py."""
+    from export import EXPORT_DOWNLOAD_MAX_BYTES, EXPORT_FORMATS, export_path, write_export
+    
+    with st.expander("Export"):
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_export_format")
+        if st.button("Export", key=f"{key}_export"):
+            path = export_path(name, export_format)
+            status = st.empty()
+            
+            def report_progress(stats):
+                status.caption(f"{stats.rows:,} rows · {stats.bytes / 1024 ** 2:.1f} MB · "
+                               f"{stats.rows_per_second:,.0f} rows/s")
+            
+            try:
+                stats = write_export(make_chunks(), export_format, path, on_progress=report_progress)
+            except Exception as e:
+                st.error(f"Error exporting: {str(e)}")
+                return
+            status.success(
+                f"Exported {stats.rows:,} rows ({stats.bytes / 1024 ** 2:.1f} MB) in {stats.seconds:.1f}s · "
+                f"{stats.rows_per_second:,.0f} rows/s · {stats.bytes_per_second / 1024 ** 2:.1f} MB/s"
+            )
+            if stats.bytes <= EXPORT_DOWNLOAD_MAX_BYTES:
+                with open(path, 'rb') as f:
+                    st.download_button(
+                        label=f"Download {export_format}",
+                        data=f,
+                        file_name=os.path.basename(path),
+                        mime=EXPORT_FORMATS[export_format][1],
+                        key=f"{key}_download",
+                    )
+            else:
+                st.info(f"The export is too large to download here and was saved to {path}")
+
+# ==================== SNAPSHOT MODE ====================
+# With TRAFFIC_SNAPSHOT_MODE=1 full-table reads come from a local Parquet
+# snapshot instead of MySQL; see snapshot.py.
+SNAPSHOT_MODE = os.environ.get('TRAFFIC_SNAPSHOT_MODE') == '1'
+
+@st.cache_resource
+def get_snapshot_store():
+    from snapshot import SnapshotStore
+    return SnapshotStore(engine, shared=shared_cache)
+
+# Without a snapshot the memory report measures the latest rows rather than
+# reading the whole table on every rerun.
+MEMORY_REPORT_SAMPLE_ROWS = 100_000
+
+def get_memory_report_sample():
+    """The latest MEMORY_REPORT_SAMPLE_ROWS rows with compact column types."""
+    from stops_frame import compact_stops
+    query = "SELECT * FROM traffic_stops ORDER BY id DESC LIMIT :limit"
+    return execute_query(query, {'limit': MEMORY_REPORT_SAMPLE_ROWS}, postprocess=compact_stops)
+
+# ==================== ANALYTICS BACKEND ====================
+# With TRAFFIC_ANALYTICS_BACKEND=duckdb the canned query catalogs run in an
+# embedded DuckDB over the snapshot instead of MySQL; see analytics.py.
+@st.cache_resource
+def get_analytics_backend():
+    return make_backend(ANALYTICS_BACKEND, engine, connect=query_executor.connect)
+
+def get_catalog_backend():
+    """The analytics backend, or the database while its snapshot is being built."""
+    backend = get_analytics_backend()
+    if backend.name != 'duckdb':
+        return backend
+    store = get_snapshot_store()
+    age = store.age()
+    if age is None or age > store.max_age:
+        store.refresh_in_background()
+    if not backend.ready():
+        st.info("The analytics snapshot is being built; queries run on the database until it is ready.")
+        return database
+    return backend
+
+# ==================== FACET INDEX ====================
+# Filter dropdowns and their counts come from a shared facet index kept
+# current from an id watermark; see facets.py.
+FACET_ALL = "All"
+
+@st.cache_resource(max_entries=WINDOWED_RESOURCES)
+def get_facet_index(window=None):
+    from facets import FacetIndex
+    return FacetIndex(windowed_reader(window))
+
+def get_facets(window=None):
+    """The facet index for window, refreshed; None if it could not be loaded."""
+    facets = get_facet_index(window)
+    try:
+        facets.refresh()
+    except Exception as e:
+        st.error(f"Error refreshing filters: {str(e)}")
+        if facets.watermark is None:
+            return None
+    return facets
+
+def selected_facets(keys):
+    """{column: value} for the facet selectboxes, by widget key, that are not set to All."""
+    selected = {}
+    for column, key in keys.items():
+        value = st.session_state.get(key, FACET_ALL)
+        if value != FACET_ALL:
+            selected[column] = value
+    return selected
+
+def facet_selectbox(facets, label, column, filters, key):
+    """Selectbox over column's values, each with its count given the other filters.
+
+    Returns the chosen value, or None for All.
+    """
+    counts = facets.counts(column, filters)
+    options = [FACET_ALL] + counts.index.tolist()
+    current = st.session_state.get(key, FACET_ALL)
+    if current not in options:
+        # Keep the current choice listed when the other selections leave it no rows.
+        options.append(current)
+    total = int(counts.sum())
+    
+    def format_option(value):
+        if value == FACET_ALL:
+            return f"{FACET_ALL} ({total:,})"
+        return f"{value} ({int(counts.get(value, 0)):,})"
+    
+    choice = st.selectbox(label, options, key=key, format_func=format_option)
+    return None if choice == FACET_ALL else choice
+
+# ==================== FILTERED VIEWS ====================
+def get_filtered_summary(where, params):
+    result = execute_query(filtered_summary_query(where), params)
+    return None if result is None else result.iloc[0]
+
+def fetch_page(where, params, after_id=None, page_size=PAGE_SIZE):
+    return execute_query(*page_query(where, params, after_id, page_size))
+
+def show_paginated_table(state_key, where, params, total, matches=None):
+    """Page through the rows matching where; with matches, page ids come from the stop index."""
+    # Each entry is the id the page starts after; None is the first page.
+    state = st.session_state.setdefault(state_key, {'filters': None, 'cursors': [None]})
+    filters = (where, tuple(sorted(params.items())))
+    if state['filters'] != filters:
+        state['filters'] = filters
+        state['cursors'] = [None]
+    
+    if matches is None:
+        page_df = fetch_page(where, params, state['cursors'][-1])
+    else:
+        page_ids = matches.ids(state['cursors'][-1], PAGE_SIZE)
+        page_df = execute_query(*rows_by_id_query(page_ids)) if page_ids else pd.DataFrame()
+    if page_df is None:
+        return
+    st.dataframe(page_df, use_container_width=True)
+    
+    page_number = len(state['cursors'])
+    page_count = max(1, -(-int(total) // PAGE_SIZE))
+    has_next = len(page_df) == PAGE_SIZE and page_number < page_count
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{state_key}_prev", disabled=page_number == 1,
+                  on_click=lambda: state['cursors'].pop())
+    with col2:
+        st.caption(f"Page {page_number} of {page_count}")
+    with col3:
+        if has_next:
+            last_id = int(page_df['id'].iloc[-1])
+            st.button("Next ▶", key=f"{state_key}_next",
+                      on_click=lambda: state['cursors'].append(last_id))
+        else:
+            st.button("Next ▶", key=f"{state_key}_next", disabled=True)
+
+# ==================== STOP INDEX ====================
+# Search Incidents and Driver Details count, summarize and page through the
+# rows matching their filters with a bitmap index; see stop_index.py.
+@st.cache_resource(max_entries=WINDOWED_RESOURCES)
+def get_stop_index(window=None):
+    from stop_index import STOP_INDEX_COLUMNS, StopIndex
+    index = StopIndex(engine, window)
+    if SNAPSHOT_MODE and window is None:
+        df = get_snapshot_store().read(['id'] + list(STOP_INDEX_COLUMNS))
+        if df is not None:
+            index.add_frame(df.sort_values('id'))
+    index.load(after_id=index.max_id, until_id=query_cache.data_version()[1])
+    return index
+
+def get_matches(equals=None, between=None, window=None):
+    """The stop index's matches for the filters, or None if the index could not be loaded."""
+    try:
+        index = get_stop_index(window)
+        index.refresh(query_cache.data_version()[1])
+        return index.match(equals, between)
+    except Exception as e:
+        st.error(f"Error loading the stop index: {str(e)}")
+        return None
+
+# ==================== ROW INDEXES ====================
+@st.cache_resource
+def get_vehicle_index():
+    from vehicle_index import VehicleIndex
+    index = VehicleIndex(engine)
+    if SNAPSHOT_MODE:
+        df = get_snapshot_store().read(['id', 'vehicle_number', 'is_arrested', 'search_conducted'])
+        if df is not None:
+            index.add_frame(df[df['vehicle_number'].notna()].sort_values('id'))
+    index.load(after_id=index.max_id, until_id=query_cache.data_version()[1])
+    return index
+
+@st.cache_resource
+def get_heavy_hitters():
+    from heavy_hitters import HeavyHitters
+    hitters = HeavyHitters.open(engine)
+    hitters.refresh(query_cache.data_version()[1])
+    # Changes since the last periodic save are written on shutdown.
+    atexit.register(hitters.flush)
+    return hitters
+
+@st.cache_resource(max_entries=WINDOWED_RESOURCES)
+def get_stop_profiles(window=None):
+    from profiles import StopProfiles
+    profiles = StopProfiles(engine, window)
+    profiles.load(until_id=query_cache.data_version()[1])
+    return profiles
+
+def refresh_row_indexes():
+    """Fold rows inserted since the last call into the vehicle index, the sketches and the profiles.
+
+    Only the all-dates profiles are refreshed here. Profiles and stop
+    indexes over a date window refresh lazily: every page refreshes the
+    instance for its window before reading it.
+    """
+    latest_id = query_cache.data_version()[1]
+    get_vehicle_index().refresh(latest_id)
+    get_heavy_hitters().refresh(latest_id)
+    get_stop_profiles().refresh(latest_id)
+
+def rows_by_id_query(row_ids, window=None):
+    id_list = ", ".join(str(int(i)) for i in row_ids)
+    where, params = build_where_clause(extra=[f"id IN ({id_list})"], window=window)
+    return f"SELECT * FROM traffic_stops {where} ORDER BY id", params
+
+# ==================== SIDEBAR ====================
+def show_sidebar_status():
+    pool_status = query_executor.pool_status()
+    st.sidebar.caption(
+        f"DB pool: {pool_status['checked_out']}/{pool_status['size']} in use "
+        f"(+{pool_status['overflow']} overflow) · wait p50 {pool_status['wait_p50_ms']:.0f} ms, "
+        f"p95 {pool_status['wait_p95_ms']:.0f} ms"
+    )
+    
+    if SNAPSHOT_MODE:
+        snapshot_age = get_snapshot_store().age()
+        if snapshot_age is None:
+            st.sidebar.caption("Snapshot: building…")
+        else:
+            st.sidebar.caption(f"Snapshot: {snapshot_age / 60:.0f} min old")
+    
+    if shared_cache is not None:
+        shared_stats = shared_cache.stats()
+        st.sidebar.caption(
+            f"Shared cache: {shared_stats['entries']} entries, {shared_stats['bytes'] / 1024 ** 2:.0f} MB "
+            f"of {shared_stats['max_bytes'] / 1024 ** 2:.0f} MB"
+        )
+
+def show_performance_panel():
+    # Summarizing the events costs more than most page reruns, so it is opt-in.
+    if not st.sidebar.checkbox("Show performance"):
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        perf_summary = instrumentation.summary()
+        if perf_summary.empty:
+            st.caption("No database calls recorded yet")
+        else:
+            st.dataframe(perf_summary.round(2), use_container_width=True, hide_index=True)
+            slow_queries = instrumentation.slow_queries()
+            st.caption(f"{len(slow_queries)} slow calls (≥ {instrumentation.slow_query_ms:.0f} ms)")
+            for slow in slow_queries.head(10).itertuples():
+                st.text(f"{slow.wall_ms:,.0f} ms · {slow.rows:,} rows · {slow.origin}")
+                st.code(slow.statement, language="sql")
+                plan = instrumentation.plan_for(slow.statement)
+                if plan is not None:
+                    st.dataframe(plan, use_container_width=True, hide_index=True)
+        if st.button("Export Metrics"):
+            event_count = instrumentation.export()
+            st.success(f"Wrote {event_count} events to {METRICS_EXPORT_PATH}")
+
+def show_memory_report():
+    if not st.sidebar.checkbox("Show memory report"):
+        return
+    from stops_frame import memory_report
+    
+    with st.expander("Memory Report", expanded=True):
+        df = get_snapshot_store().read() if SNAPSHOT_MODE else None
+        sampled = df is None
+        if sampled:
+            df = get_memory_report_sample()
+        if df is not None:
+            if sampled:
+                st.caption(f"Measured on the latest {len(df):,} rows; "
+                           "in snapshot mode the whole table is measured.")
+            report = memory_report(df)
+            total = report.loc['TOTAL']
+            label = "Sample" if sampled else "In-memory table"
+            if 'loaded_bytes' in report:
+                st.write(f"{label}: {total['bytes'] / 1024 ** 2:.1f} MB "
+                         f"(loaded as {total['loaded_bytes'] / 1024 ** 2:.1f} MB, "
+                         f"{total['reduction']:.1f}x smaller)")
+            else:
+                st.write(f"{label}: {total['bytes'] / 1024 ** 2:.1f} MB")
+            st.dataframe(report, use_container_width=True)
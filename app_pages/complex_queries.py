@@ -0,0 +1,44 @@
+"""Complex Level Queries: the window-function and subquery catalog."""
+import streamlit as st
+
+from analytics import precompile
+from app_pages.common import (
+    DEFAULT_ROW_CAP, date_window, get_catalog_backend, show_export, show_query_plan, show_run_all,
+    show_streamed_result, stream_query,
+)
+from export import EXPORT_CHUNK_SIZE
+from instrumentation import current_origin, origin
+from query_catalog import COMPLEX_QUERIES, windowed
+
+precompile(COMPLEX_QUERIES.values())
+
+# ==================== PAGE ====================
+def render():
+    st.title("🔬 SQL QUERIES - Complex Level")
+    st.markdown("Advanced analytical queries with window functions and subqueries")
+    catalog_backend = get_catalog_backend()
+    st.caption(f"Running on {catalog_backend.describe()}")
+    
+    selected_complex = st.selectbox(
+        "Select Complex Query",
+        list(COMPLEX_QUERIES.keys())
+    )
+    
+    row_cap = st.number_input("Row Limit", min_value=1_000, value=DEFAULT_ROW_CAP, step=50_000,
+                              key="complex_query_row_cap")
+    
+    window = date_window()
+    query, params = windowed(COMPLEX_QUERIES[selected_complex], None, window, catalog_backend.window_predicate)
+    show_export("complex_query", "complex_query",
+                lambda: stream_query(query, params, EXPORT_CHUNK_SIZE, backend=catalog_backend))
+    show_query_plan(query, params, catalog_backend)
+    
+    if st.button("Run All Queries"):
+        show_run_all(COMPLEX_QUERIES, catalog_backend, window)
+    
+    if st.button("Execute Complex Query"):
+        status = st.empty()
+        with origin(f"{current_origin.get()}: {selected_complex}"):
+            result = show_streamed_result(query, params, row_cap=int(row_cap), backend=catalog_backend)
+        if result is not None:
+            status.success("Complex query executed successfully!")
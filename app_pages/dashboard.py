@@ -0,0 +1,120 @@
+"""Dashboard: headline totals and charts, kept current by the aggregation layer."""
+import time
+
+import streamlit as st
+
+from app_pages.common import WINDOWED_RESOURCES, date_window, query_executor, windowed_reader
+from charts import ChartCache, draw_bar, draw_barh, draw_histogram, draw_pie, render_chart
+from live_aggregates import LiveAggregates
+from settings import DASHBOARD_REFRESH_SECONDS
+
+# ==================== CHARTS ====================
+# Rendered chart images are shared by all sessions; see charts.py.
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
+
+# ==================== AGGREGATION LAYER ====================
+# Dashboard totals and value counts are shared by every session and kept
+# current from an id watermark; see live_aggregates.py. Each date window has
+# its own, which only reads the stops dated within it.
+@st.cache_resource(max_entries=WINDOWED_RESOURCES)
+def get_live_aggregates(window=None):
+    return LiveAggregates(windowed_reader(window), executor=query_executor)
+
+
+# ==================== PAGE ====================
+def render():
+    st.title("🚔 Traffic Police Analytics Dashboard")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        auto_refresh = st.toggle("Auto-refresh", key="dashboard_auto_refresh")
+    with col2:
+        refresh_seconds = st.number_input("Refresh every (seconds)", min_value=2, max_value=3600,
+                                          value=DASHBOARD_REFRESH_SECONDS, key="dashboard_refresh_seconds",
+                                          disabled=not auto_refresh)
+    st.markdown("---")
+    window = date_window()
+    
+    # Only this fragment reruns on each tick, and a tick reads only the rows
+    # inserted since the previous one.
+    @st.fragment(run_every=refresh_seconds if auto_refresh else None)
+    def show_dashboard():
+        live = get_live_aggregates(window)
+        try:
+            live.refresh()
+        except Exception as e:
+            st.error(f"Error refreshing dashboard: {str(e)}")
+            if live.watermark is None:
+                return
+        metrics = live.metrics()
+        
+        if metrics['total_stops'] > 0:
+            # Key Metrics
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Stops", int(metrics['total_stops']))
+            with col2:
+                st.metric("Total Arrests", int(metrics['arrests']))
+            with col3:
+                st.metric("Searches Conducted", int(metrics['searches']))
+            with col4:
+                st.metric("Drug-Related Stops", int(metrics['drug_stops']))
+            
+            st.markdown("---")
+            
+            # Visualizations
+            chart_cache = get_chart_cache()
+            theme = st.get_option("theme.base") or "light"
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Stops by Country")
+                country_stops = live.value_counts('country_name')
+                if not country_stops.empty:
+                    st.image(render_chart(
+                        chart_cache, draw_bar, (country_stops.index.tolist(), country_stops.to_numpy()),
+                        (10, 5), theme, title="Number of Stops by Country", xlabel="Country",
+                        ylabel="Number of Stops", color='steelblue', rotation=45,
+                    ), use_container_width=True)
+            
+            with col2:
+                st.subheader("Gender Distribution")
+                gender_dist = live.value_counts('driver_gender')
+                if not gender_dist.empty:
+                    st.image(render_chart(
+                        chart_cache, draw_pie, (gender_dist.index.tolist(), gender_dist.to_numpy()),
+                        (8, 5), theme, title="Driver Gender Distribution",
+                    ), use_container_width=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Stop Outcomes")
+                outcomes = live.value_counts('stop_outcome')
+                if not outcomes.empty:
+                    st.image(render_chart(
+                        chart_cache, draw_barh, (outcomes.index.tolist(), outcomes.to_numpy()),
+                        (10, 5), theme, title="Stop Outcomes Distribution", xlabel="Count", color='coral',
+                    ), use_container_width=True)
+            
+            with col2:
+                st.subheader("Age Distribution")
+                age_hist = live.age_histogram()
+                if age_hist is not None:
+                    st.image(render_chart(
+                        chart_cache, draw_histogram, age_hist, (10, 5), theme,
+                        title="Driver Age Distribution", xlabel="Age", ylabel="Frequency", color='green',
+                    ), use_container_width=True)
+            
+            chart_stats = chart_cache.stats()
+            st.caption(f"Chart cache: {chart_stats['hits']} hits · {chart_stats['misses']} misses · "
+                       f"{chart_stats['charts']} charts ({chart_stats['bytes'] / 1024:.0f} KB)")
+        
+        dates = "all dates" if window is None else f"stops dated {window[0]} to {window[1]}"
+        st.caption(f"Updated {time.strftime('%H:%M:%S')} · {dates} · {live.last_delta_rows:,} new rows "
+                   f"in the last refresh · up to id {live.watermark}")
+    
+    show_dashboard()
@@ -0,0 +1,73 @@
+"""Driver Details: stops by driver age and gender, and driver profiles."""
+import streamlit as st
+
+from app_pages.common import (
+    date_window, facet_selectbox, get_facets, get_filtered_summary, get_matches, get_stop_profiles,
+    query_cache, show_export, show_paginated_table, stream_query,
+)
+from export import EXPORT_CHUNK_SIZE
+from query_catalog import build_where_clause
+
+# ==================== PAGE ====================
+def render():
+    st.title("👤 Driver Details")
+    st.markdown("Search and view driver information")
+    
+    window = date_window()
+    facets = get_facets(window)
+    age_bounds = None if facets is None else facets.bounds('driver_age')
+    
+    if age_bounds is not None:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age_min, age_max = int(age_bounds[0]), int(age_bounds[1])
+            if age_min < age_max:
+                age_range = st.slider("Driver Age Range", age_min, age_max, (age_min, age_max))
+            else:
+                # A slider needs two distinct ends, e.g. in a short date window.
+                age_range = (age_min, age_max)
+                st.caption(f"Every driver is {age_min}")
+        
+        with col2:
+            # Counts are for the chosen age range.
+            selected_gender = facet_selectbox(facets, "Gender", 'driver_gender', {'driver_age': age_range},
+                                              "driver_details_gender")
+        
+        filters = {}
+        if selected_gender is not None:
+            filters['driver_gender'] = selected_gender
+        
+        where, params = build_where_clause(equals=filters, between={'driver_age': age_range}, window=window)
+        # The stop index answers without reading traffic_stops; SQL is the fallback.
+        matches = get_matches(filters, {'driver_age': age_range}, window)
+        summary = matches.summary() if matches is not None else get_filtered_summary(where, params)
+        
+        if summary is not None:
+            total = int(summary['total'])
+            st.write(f"Found {total} drivers")
+            show_paginated_table("driver_details_page", where, params, total, matches)
+            show_export("driver_details", "driver_details", lambda: stream_query(
+                f"SELECT * FROM traffic_stops {where} ORDER BY id", params, EXPORT_CHUNK_SIZE))
+            
+            if total > 0:
+                st.subheader("Driver Statistics")
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Total Records", total)
+                with col2:
+                    arrest_rate = summary['arrests'] / total * 100
+                    st.metric("Arrest Rate %", f"{arrest_rate:.2f}%")
+                with col3:
+                    search_rate = summary['searches'] / total * 100
+                    st.metric("Search Rate %", f"{search_rate:.2f}%")
+                with col4:
+                    st.metric("Average Age", f"{summary['avg_age']:.1f}")
+            
+            st.subheader("Driver Profiles")
+            st.caption("By country, gender, race and age group")
+            profiles = get_stop_profiles(window)
+            profiles.refresh(query_cache.data_version()[1])
+            st.dataframe(profiles.driver_profiles(filters.get('driver_gender')), use_container_width=True)
+    elif facets is not None:
+        st.info("No drivers with a known age in the selected dates")
@@ -0,0 +1,89 @@
+"""Medium Level Queries: the medium catalog, with sketch answers for the top-vehicle queries."""
+import time
+
+import streamlit as st
+
+from analytics import precompile
+from app_pages.common import (
+    DEFAULT_ROW_CAP, date_window, execute_query, get_catalog_backend, get_heavy_hitters, query_cache,
+    show_export, show_query_plan, show_run_all, show_streamed_result, stream_query,
+)
+from export import EXPORT_CHUNK_SIZE
+from heavy_hitters import exact_top_query
+from instrumentation import current_origin, origin
+from query_catalog import HEAVY_HITTER_QUERIES, MEDIUM_QUERIES, windowed
+
+precompile(MEDIUM_QUERIES.values())
+
+# ==================== HEAVY HITTERS ====================
+def show_heavy_hitters(flag, k, country=None, verify=False):
+    """Render a top-k answer from the heavy-hitter sketches, optionally checked against SQL."""
+    hitters = get_heavy_hitters()
+    hitters.refresh(query_cache.data_version()[1])
+    started = time.perf_counter()
+    result = hitters.top(flag, country, k)
+    elapsed = time.perf_counter() - started
+    st.dataframe(result, use_container_width=True)
+    st.caption(f"Answered from the sketch in {elapsed * 1e6:,.0f} µs · "
+               f"{result.attrs.get('total', 0):,} flagged stops · counts are high by at most "
+               f"{result.attrs.get('max_error', 0):,} · {int(result['guaranteed'].sum())} of {len(result)} "
+               "guaranteed to be in the top k")
+    if verify:
+        exact = execute_query(*exact_top_query(flag, country, k))
+        if exact is not None:
+            merged = result.merge(exact, on='vehicle_number', how='outer', suffixes=('', '_exact'))
+            st.dataframe(merged, use_container_width=True)
+            agreed = len(set(result['vehicle_number']) & set(exact['vehicle_number']))
+            st.caption(f"{agreed} of {len(exact)} plates in the exact top {k} (ties at the cut-off may differ)")
+    return result
+
+# ==================== PAGE ====================
+def render():
+    st.title("📊 SQL QUERIES - Medium Level")
+    st.markdown("Select a query to execute from the dropdown below")
+    catalog_backend = get_catalog_backend()
+    st.caption(f"Running on {catalog_backend.describe()}")
+    
+    selected_query = st.selectbox(
+        "Select a Query",
+        list(MEDIUM_QUERIES.keys())
+    )
+    
+    row_cap = st.number_input("Row Limit", min_value=1_000, value=DEFAULT_ROW_CAP, step=50_000,
+                              key="query_result_row_cap")
+    
+    window = date_window()
+    query, params = windowed(MEDIUM_QUERIES[selected_query], None, window, catalog_backend.window_predicate)
+    show_export("query_result", "query_result",
+                lambda: stream_query(query, params, EXPORT_CHUNK_SIZE, backend=catalog_backend))
+    show_query_plan(query, params, catalog_backend)
+    
+    heavy_hitter_query = HEAVY_HITTER_QUERIES.get(selected_query)
+    use_sketch = False
+    if heavy_hitter_query is not None:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # The sketches count stops of every date, so a date window needs the exact query.
+            use_sketch = st.toggle("Answer from the heavy-hitter sketch", value=True, key="use_heavy_hitters",
+                                   disabled=window is not None) and window is None
+        with col2:
+            sketch_country = st.selectbox("Country", ["All countries"] + get_heavy_hitters().countries(),
+                                          key="heavy_hitters_country", disabled=not use_sketch)
+        with col3:
+            verify_sketch = st.checkbox("Verify against the exact query", key="verify_heavy_hitters",
+                                        disabled=not use_sketch)
+    
+    if st.button("Run All Queries"):
+        show_run_all(MEDIUM_QUERIES, catalog_backend, window)
+    
+    if st.button("Execute Query"):
+        status = st.empty()
+        with origin(f"{current_origin.get()}: {selected_query}"):
+            if use_sketch:
+                flag, k = heavy_hitter_query
+                result = show_heavy_hitters(flag, k, None if sketch_country == "All countries" else sketch_country,
+                                            verify_sketch)
+            else:
+                result = show_streamed_result(query, params, row_cap=int(row_cap), backend=catalog_backend)
+        if result is not None:
+            status.success("Query executed successfully!")
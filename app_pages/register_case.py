@@ -0,0 +1,112 @@
+"""Register New Case: validated submissions queued for group-committed writes."""
+import streamlit as st
+
+from app_pages.common import (
+    engine, get_heavy_hitters, get_stop_profiles, get_vehicle_index, instrumentation, query_cache,
+)
+from write_queue import CaseQueue, new_case_key, validate_case
+
+# ==================== WRITE QUEUE ====================
+# New cases are queued durably and written in group commits; see write_queue.py.
+@st.cache_resource
+def get_case_queue():
+    vehicle_index = get_vehicle_index()
+    hitters = get_heavy_hitters()
+    profiles = get_stop_profiles()
+    
+    # Windowed profiles are refreshed lazily by the pages that read them; see refresh_row_indexes.
+    def on_commit(rows):
+        query_cache.bump_version()
+        latest_id = query_cache.data_version()[1]
+        vehicle_index.refresh(latest_id)
+        hitters.refresh(latest_id)
+        profiles.refresh(latest_id)
+    
+    return CaseQueue(engine, on_commit=on_commit, instrumentation=instrumentation).start()
+
+
+# ==================== PAGE ====================
+def render():
+    st.title("📝 Register New Case")
+    st.markdown("Add a new traffic stop record to the database")
+    
+    case_queue = get_case_queue()
+    submitted_keys = st.session_state.setdefault('submitted_case_keys', [])
+    # One idempotency key per filled-in form, so a replayed submit queues the case once.
+    form_key = st.session_state.setdefault('case_form_key', new_case_key())
+    
+    with st.form("new_case_form"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            stop_date = st.date_input("Stop Date")
+            stop_time = st.time_input("Stop Time")
+            country_name = st.text_input("Country Name")
+            driver_gender = st.selectbox("Driver Gender", ["M", "F", "Other"])
+            driver_age = st.number_input("Driver Age", min_value=0, max_value=120, step=1)
+            driver_race = st.text_input("Driver Race")
+        
+        with col2:
+            violation = st.text_input("Violation")
+            violation_raw = st.text_input("Violation (Raw)")
+            search_conducted = st.selectbox("Search Conducted", [0, 1])
+            search_type = st.selectbox("Search Type", ["None", "Vehicle", "Person", "Both"])
+            stop_outcome = st.selectbox("Stop Outcome", ["Citation", "Warning", "Arrest", "Release"])
+            is_arrested = st.selectbox("Is Arrested", [0, 1])
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            stop_duration = st.text_input("Stop Duration (e.g., 15 mins)")
+            drugs_related = st.selectbox("Drugs Related Stop", [0, 1])
+        
+        with col2:
+            vehicle_number = st.text_input("Vehicle Number")
+        
+        submit_button = st.form_submit_button("Register Case")
+        
+        if submit_button:
+            try:
+                record = validate_case({
+                    'stop_date': str(stop_date),
+                    'stop_time': str(stop_time),
+                    'country_name': country_name,
+                    'driver_gender': driver_gender,
+                    'driver_age': driver_age,
+                    'driver_race': driver_race,
+                    'violation_raw': violation_raw,
+                    'violation': violation,
+                    'search_conducted': search_conducted,
+                    'search_type': search_type,
+                    'stop_outcome': stop_outcome,
+                    'is_arrested': is_arrested,
+                    'stop_duration': stop_duration,
+                    'drugs_related_stop': drugs_related,
+                    'vehicle_number': vehicle_number,
+                })
+                with instrumentation.track('queue', 'submit case') as event:
+                    case_key = case_queue.submit(record, form_key)
+                    event.rows = 1
+                submitted_keys.append(case_key)
+                # The next submission is a new case with a new key.
+                del st.session_state['case_form_key']
+                st.success(f"✅ Case queued (reference {case_key[:8]}); it is saved to the database in the background.")
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    
+    # Refreshes only the status table until every case is confirmed.
+    @st.fragment(run_every=2)
+    def show_case_status():
+        if submitted_keys:
+            st.subheader("Your Submissions")
+            statuses = case_queue.status(submitted_keys[-20:])
+            statuses['case_key'] = statuses['case_key'].str[:8]
+            st.dataframe(statuses, use_container_width=True, hide_index=True)
+        queue_stats = case_queue.stats()
+        caption = (f"Write queue: {queue_stats['pending']} pending · {queue_stats['failed']} failed · "
+                   f"{queue_stats['batches']} group commits · last batch {queue_stats['last_batch_size']} cases")
+        if queue_stats['last_error']:
+            caption += f" · retrying after: {queue_stats['last_error'][:120]}"
+        st.caption(caption)
+    
+    show_case_status()
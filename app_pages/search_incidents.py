@@ -0,0 +1,51 @@
+"""Search Incidents: filtered, paginated stops where a search was conducted."""
+import streamlit as st
+
+from app_pages.common import (
+    date_window, facet_selectbox, get_facets, get_filtered_summary, get_matches, selected_facets,
+    show_export, show_paginated_table, stream_query,
+)
+from export import EXPORT_CHUNK_SIZE
+from query_catalog import build_where_clause
+
+# Facet column -> selectbox key.
+FILTER_KEYS = {
+    'search_type': "search_incidents_search_type",
+    'country_name': "search_incidents_country",
+    'violation': "search_incidents_violation",
+}
+
+# ==================== PAGE ====================
+def render():
+    st.title("🔍 Search Incidents")
+    st.markdown("Filter and view incidents where search was conducted")
+    
+    window = date_window()
+    facets = get_facets(window)
+    if facets is None:
+        return
+    
+    # Filters; each dropdown counts the incidents left by the other two.
+    filters = {'search_conducted': 1}
+    filters.update(selected_facets(FILTER_KEYS))
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        facet_selectbox(facets, "Search Type", 'search_type', filters, FILTER_KEYS['search_type'])
+    
+    with col2:
+        facet_selectbox(facets, "Country", 'country_name', filters, FILTER_KEYS['country_name'])
+    
+    with col3:
+        facet_selectbox(facets, "Violation", 'violation', filters, FILTER_KEYS['violation'])
+    
+    where, params = build_where_clause(equals=filters, window=window)
+    # The stop index answers without reading traffic_stops; SQL is the fallback.
+    matches = get_matches(filters, window=window)
+    summary = matches.summary() if matches is not None else get_filtered_summary(where, params)
+    
+    if summary is not None:
+        st.write(f"Found {int(summary['total'])} incidents")
+        show_paginated_table("search_incidents_page", where, params, summary['total'], matches)
+        show_export("search_incidents", "search_incidents", lambda: stream_query(
+            f"SELECT * FROM traffic_stops {where} ORDER BY id", params, EXPORT_CHUNK_SIZE))
@@ -0,0 +1,183 @@
+"""Vehicle Search: plate lookups, vehicle profiles and repeat offenders."""
+import pandas as pd
+import streamlit as st
+
+from app_pages.common import (
+    date_window, execute_query, get_stop_profiles, get_vehicle_index, query_cache, rows_by_id_query, run_query,
+    show_export,
+)
+from export import EXPORT_CHUNK_SIZE
+from query_catalog import build_where_clause
+
+VEHICLE_RESULT_LIMIT = 500
+REPEAT_OFFENDER_LIMIT = 100
+
+# ==================== SQL FALLBACK ====================
+# Used while the plate index or the profiles cannot be loaded. Plates are
+# matched as stored, without the index's case and separator folding.
+def plate_pattern(vehicle_num, mode):
+    needle = vehicle_num.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+    return {'exact': needle, 'prefix': f"{needle}%", 'contains': f"%{needle}%"}[mode]
+
+def vehicle_rows_query(vehicle_num, mode, window=None, limit=VEHICLE_RESULT_LIMIT):
+    where, params = build_where_clause(extra=["vehicle_number LIKE :plate ESCAPE '!'"], window=window)
+    params.update(plate=plate_pattern(vehicle_num, mode), limit=limit)
+    return f"SELECT * FROM traffic_stops {where} ORDER BY id LIMIT :limit", params
+
+def vehicle_summary_query(vehicle_num, mode, window=None):
+    where, params = build_where_clause(extra=["vehicle_number LIKE :plate ESCAPE '!'"], window=window)
+    params['plate'] = plate_pattern(vehicle_num, mode)
+    return f"""
+        SELECT COUNT(*) AS stops,
+               COALESCE(SUM(is_arrested), 0) AS arrests,
+               COALESCE(SUM(search_conducted), 0) AS searches,
+               COALESCE(SUM(drugs_related_stop), 0) AS drug_stops
+        FROM traffic_stops
+        {where}
+    """, params
+
+def repeat_offenders_query(min_stops, sort_by, window=None, limit=REPEAT_OFFENDER_LIMIT):
+    where, params = build_where_clause(extra=["vehicle_number IS NOT NULL"], window=window)
+    params.update(min_stops=min_stops, limit=limit)
+    return f"""
+        SELECT vehicle_number AS vehicle,
+               COUNT(*) AS stops,
+               COALESCE(SUM(is_arrested), 0) AS arrests,
+               COALESCE(SUM(search_conducted), 0) AS searches,
+               COALESCE(SUM(drugs_related_stop), 0) AS drug_stops
+        FROM traffic_stops
+        {where}
+        GROUP BY vehicle_number
+        HAVING COUNT(*) >= :min_stops
+        ORDER BY {sort_by} DESC, stops DESC
+        LIMIT :limit
+    """, params
+
+def refreshed(label, getter, latest_id, *args):
+    """getter(*args) refreshed up to latest_id, or None if it could not be loaded."""
+    try:
+        resource = getter(*args)
+    except Exception as e:
+        st.error(f"Error loading the {label}: {str(e)}")
+        return None
+    try:
+        resource.refresh(latest_id)
+    except Exception as e:
+        # Still usable, just without the latest rows.
+        st.error(f"Error refreshing the {label}: {str(e)}")
+    return resource
+
+# ==================== ROWS BY ID ====================
+def stream_rows_by_id(row_ids, batch_size=EXPORT_CHUNK_SIZE, window=None):
+    for start in range(0, len(row_ids), batch_size):
+        yield run_query(*rows_by_id_query(row_ids[start:start + batch_size], window), use_cache=False)
+
+def fetch_rows_by_id(row_ids, window=None, limit=None):
+    """The first limit rows, by id, among row_ids dated within window."""
+    if not row_ids:
+        return pd.DataFrame()
+    if window is None:
+        return execute_query(*rows_by_id_query(row_ids[:limit]))
+    # Which ids fall in the window is only known once they are read, so
+    # read them in batches until there are enough.
+    chunks = []
+    rows = 0
+    try:
+        for chunk in stream_rows_by_id(row_ids, window=window):
+            chunks.append(chunk)
+            rows += len(chunk)
+            if limit is not None and rows >= limit:
+                break
+    except Exception as e:
+        st.error(f"Error executing query: {str(e)}")
+        return None
+    return pd.concat(chunks, ignore_index=True).iloc[:limit]
+
+# ==================== PAGE ====================
+def render():
+    st.title("🚗 Vehicle Search")
+    st.markdown("Search for specific vehicle incidents")
+    
+    window = date_window()
+    latest_id = query_cache.data_version()[1]
+    # The plate index covers all dates; profiles and rows follow the date window.
+    vehicle_index = refreshed("vehicle index", get_vehicle_index, latest_id)
+    profiles = refreshed("vehicle profiles", get_stop_profiles, latest_id, window)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        vehicle_num = st.text_input("Enter Vehicle Number:")
+    with col2:
+        match_modes = {"Contains": "contains", "Starts with": "prefix", "Exact": "exact"}
+        match_mode = st.selectbox("Match", list(match_modes.keys()))
+    
+    if vehicle_num and (vehicle_index is None or profiles is None):
+        summary = execute_query(*vehicle_summary_query(vehicle_num, match_modes[match_mode], window))
+        stops = 0 if summary is None else int(summary['stops'].iloc[0])
+        st.write(f"Found {stops} records for vehicle: {vehicle_num}")
+        if stops > VEHICLE_RESULT_LIMIT:
+            st.caption(f"Showing the first {VEHICLE_RESULT_LIMIT} records")
+        if stops > 0:
+            vehicle_data = execute_query(*vehicle_rows_query(vehicle_num, match_modes[match_mode], window))
+            if vehicle_data is not None:
+                st.dataframe(vehicle_data, use_container_width=True)
+            st.subheader("Vehicle Statistics")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Stops", stops)
+            with col2:
+                st.metric("Arrests", int(summary['arrests'].iloc[0]))
+            with col3:
+                st.metric("Searches", int(summary['searches'].iloc[0]))
+            with col4:
+                st.metric("Drug-Related Stops", int(summary['drug_stops'].iloc[0]))
+    elif vehicle_num:
+        plates = vehicle_index.lookup(vehicle_num, match_modes[match_mode])
+        profile = profiles.vehicle(plates)
+        stops = 0 if profile is None else profile['stops']
+        st.write(f"Found {stops} records for vehicle: {vehicle_num}")
+        
+        if stops > VEHICLE_RESULT_LIMIT:
+            st.caption(f"Showing the first {VEHICLE_RESULT_LIMIT} records")
+        if stops > 0:
+            row_ids = vehicle_index.row_ids(plates, limit=None if window else VEHICLE_RESULT_LIMIT)
+            vehicle_data = fetch_rows_by_id(row_ids, window, VEHICLE_RESULT_LIMIT)
+            if vehicle_data is not None:
+                st.dataframe(vehicle_data, use_container_width=True)
+            show_export(f"vehicle_{vehicle_num}", "vehicle_search",
+                        lambda: stream_rows_by_id(vehicle_index.row_ids(plates), window=window))
+        
+        if profile is not None:
+            st.subheader("Vehicle Statistics")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Stops", profile['stops'])
+            with col2:
+                st.metric("Arrests", profile['arrests'])
+            with col3:
+                st.metric("Searches", profile['searches'])
+            with col4:
+                st.metric("Drug-Related Stops", profile['drug_stops'])
+            first_stop, last_stop = profile['first_stop'], profile['last_stop']
+            if pd.notna(first_stop):
+                st.caption(f"First stop {first_stop:%Y-%m-%d} · last stop {last_stop:%Y-%m-%d} · "
+                           f"most frequent violation: {profile['top_violation'] or 'n/a'}")
+    
+    st.subheader("Repeat Offenders")
+    col1, col2 = st.columns(2)
+    with col1:
+        min_stops = st.number_input("Minimum stops", min_value=2, value=3, step=1)
+    with col2:
+        offender_orders = {"Stops": "stops", "Arrests": "arrests", "Searches": "searches",
+                           "Drug-related stops": "drug_stops"}
+        offender_order = st.selectbox("Rank by", list(offender_orders.keys()))
+    if profiles is None:
+        offenders = execute_query(*repeat_offenders_query(int(min_stops), offender_orders[offender_order], window))
+    else:
+        offenders = profiles.repeat_offenders(int(min_stops), offender_orders[offender_order])
+    if offenders is not None:
+        st.dataframe(offenders, use_container_width=True)
+    if profiles is not None and st.button("Rebuild profiles"):
+        with st.spinner("Rebuilding vehicle and driver profiles..."):
+            profiles.rebuild()
+        st.rerun()
@@ -0,0 +1,202 @@
+"""Synthetic traffic_stops data and a local SQLite stand-in for MySQL.
+
+Rows follow skewed real-world shapes: a Zipf-distributed vehicle pool so a
+few plates recur often, weighted countries, races, violations and
+outcomes, daytime-heavy stop times and violation-dependent search, arrest
+and drug rates. Derived columns are filled the way migrate.py fills them.
+
+Usage:
+    python -m benchmarks.synthetic --rows 1000000 --db bench_1m.sqlite
+    python -m benchmarks.synthetic --rows 10000 --csv stops_10k.csv
+"""
+import argparse
+import math
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_import import STOP_COLUMNS
+from migrate import INDEXES
+
+GENERATE_CHUNK_SIZE = 200_000
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+COUNTRIES = {'USA': 0.46, 'Canada': 0.31, 'India': 0.23}
+GENDERS = {'M': 0.68, 'F': 0.32}
+RACES = {'White': 0.70, 'Black': 0.14, 'Hispanic': 0.10, 'Asian': 0.04, 'Other': 0.02}
+# violation: (share, raw spelling, search rate, arrest rate)
+VIOLATIONS = {
+    'Speeding': (0.56, 'Speeding', 0.02, 0.015),
+    'Moving violation': (0.19, 'Other Traffic Violation', 0.06, 0.05),
+    'Equipment': (0.12, 'Equipment/Inspection Violation', 0.06, 0.04),
+    'Other': (0.06, 'Call for Service', 0.05, 0.11),
+    'Registration/plates': (0.04, 'Registration Violation', 0.09, 0.10),
+    'Seat belt': (0.03, 'Seatbelt Violation', 0.03, 0.03),
+}
+SEARCH_TYPES = {'Vehicle': 0.55, 'Person': 0.25, 'Both': 0.20}
+NON_ARREST_OUTCOMES = {'Citation': 0.90, 'Warning': 0.07, 'Release': 0.03}
+PLATE_PREFIXES = np.array(['TN', 'KA', 'MH', 'DL', 'ON', 'BC', 'NY', 'CA', 'TX'])
+DATE_RANGE = ('2005-01-01', '2015-12-31')
+# Relative stop volume per hour of day, busiest in the late morning and afternoon.
+HOURLY_WEIGHTS = np.array([2, 1.5, 1.2, 1, 1, 1.5, 3, 5, 6, 7, 8, 8,
+                           7, 7, 7, 7, 8, 8, 7, 6, 5, 4, 3, 2.5])
+
+SQLITE_SCHEMA = """
+    CREATE TABLE traffic_stops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stop_date TEXT, stop_time TEXT, country_name TEXT, driver_gender TEXT,
+        driver_age_raw REAL, driver_age INTEGER, driver_race TEXT, violation_raw TEXT,
+        violation TEXT, search_conducted INTEGER, search_type TEXT, stop_outcome TEXT,
+        is_arrested INTEGER, stop_duration TEXT, drugs_related_stop INTEGER,
+        vehicle_number TEXT, stop_hour INTEGER, stop_year INTEGER, stop_month INTEGER,
+        duration_minutes REAL, age_group TEXT, case_key TEXT UNIQUE
+    )
+"""
+
+
+def _choice(rng, weights, size):
+    labels = np.array(list(weights))
+    p = np.array(list(weights.values()), dtype=float)
+    return labels[rng.choice(len(labels), size=size, p=p / p.sum())]
+
+
+def generate_chunk(rng, size, plate_pool):
+    violation_names = list(VIOLATIONS)
+    violation_idx = rng.choice(len(violation_names),
+                               size=size, p=[v[0] for v in VIOLATIONS.values()])
+    violation = np.array(violation_names)[violation_idx]
+    violation_raw = np.array([v[1] for v in VIOLATIONS.values()])[violation_idx]
+    search_rate = np.array([v[2] for v in VIOLATIONS.values()])[violation_idx]
+    arrest_rate = np.array([v[3] for v in VIOLATIONS.values()])[violation_idx]
+
+    search_conducted = rng.random(size) < search_rate
+    # Searches make an arrest and a drug finding far more likely.
+    is_arrested = rng.random(size) < np.where(search_conducted, 0.35, arrest_rate)
+    drugs_related = rng.random(size) < np.where(search_conducted, 0.25, 0.002)
+    outcome = np.where(is_arrested, 'Arrest', _choice(rng, NON_ARREST_OUTCOMES, size))
+    search_type = np.where(search_conducted, _choice(rng, SEARCH_TYPES, size), None)
+
+    start, end = (np.datetime64(d) for d in DATE_RANGE)
+    stop_date = start + rng.integers(0, (end - start).astype(int) + 1, size).astype('timedelta64[D]')
+    hour = rng.choice(24, size=size, p=HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum())
+    minute = rng.integers(0, 60, size)
+
+    age = np.clip(np.round(rng.normal(36, 13, size)), 15, 88)
+    age_missing = rng.random(size) < 0.005
+    duration = np.clip(np.round(rng.lognormal(2.4, 0.6, size)), 1, 120).astype(int)
+
+    # Zipf ranks over a fixed plate pool: a long tail with a few frequent plates.
+    plate_rank = (rng.zipf(1.3, size) - 1) % len(plate_pool)
+
+    df = pd.DataFrame({
+        'stop_date': pd.to_datetime(stop_date).strftime('%Y-%m-%d'),
+        'stop_time': [f"{h:02d}:{m:02d}:00" for h, m in zip(hour, minute)],
+        'country_name': _choice(rng, COUNTRIES, size),
+        'driver_gender': _choice(rng, GENDERS, size),
+        'driver_age_raw': np.where(age_missing, np.nan, age),
+        'driver_age': pd.array(np.where(age_missing, np.nan, age), dtype='Int16'),
+        'driver_race': _choice(rng, RACES, size),
+        'violation_raw': violation_raw,
+        'violation': violation,
+        'search_conducted': search_conducted.astype(np.int8),
+        'search_type': search_type,
+        'stop_outcome': outcome,
+        'is_arrested': is_arrested.astype(np.int8),
+        'stop_duration': [f"{d} mins" for d in duration],
+        'drugs_related_stop': drugs_related.astype(np.int8),
+        'vehicle_number': plate_pool[plate_rank],
+    })
+    df['stop_hour'] = hour
+    df['stop_year'] = pd.to_datetime(df['stop_date']).dt.year
+    df['stop_month'] = pd.to_datetime(df['stop_date']).dt.month
+    df['duration_minutes'] = duration.astype(float)
+    df['age_group'] = pd.cut(df['driver_age'].astype(float), [-math.inf, 25, 35, 45, 55, math.inf],
+                             right=False, labels=['<25', '25-34', '35-44', '45-54', '55+']).astype(object)
+    return df
+
+
+def make_plate_pool(rng, rows):
+    pool_size = max(rows // 3, 10)
+    prefixes = PLATE_PREFIXES[rng.integers(0, len(PLATE_PREFIXES), pool_size)]
+    numbers = rng.permutation(pool_size) + 1_000_000
+    return np.array([f"{p}{n:07d}" for p, n in zip(prefixes, numbers)])
+
+
+def generate(rows, seed=42, chunk_size=GENERATE_CHUNK_SIZE):
+    """Yield DataFrame chunks that add up to rows synthetic stops."""
+    rng = np.random.default_rng(seed)
+    plate_pool = make_plate_pool(rng, rows)
+    for start in range(0, rows, chunk_size):
+        yield generate_chunk(rng, min(chunk_size, rows - start), plate_pool)
+
+
+# ==================== SQLITE STAND-IN ====================
+def sqlite_engine(path):
+    """SQLAlchemy engine on a stand-in database."""
+    from sqlalchemy import create_engine
+
+    return create_engine(f"sqlite:///{path}")
+
+
+def load_sqlite(path, chunks, with_indexes=True, on_chunk=None):
+    """Create a fresh stand-in database at path from generated chunks."""
+    if os.path.exists(path):
+        os.remove(path)
+    columns = STOP_COLUMNS + ['stop_hour', 'stop_year', 'stop_month', 'duration_minutes', 'age_group']
+    insert = (f"INSERT INTO traffic_stops ({', '.join(columns)}) "
+              f"VALUES ({', '.join('?' for _ in columns)})")
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(SQLITE_SCHEMA)
+        rows = 0
+        for chunk in chunks:
+            records = chunk[columns].astype(object).where(chunk[columns].notna(), None)
+            conn.executemany(insert, records.itertuples(index=False, name=None))
+            conn.commit()
+            rows += len(chunk)
+            if on_chunk is not None:
+                on_chunk(rows)
+        if with_indexes:
+            for index, index_columns in INDEXES.items():
+                conn.execute(f"CREATE INDEX {index} ON traffic_stops ({index_columns})")
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10k', help="row count or one of: " + ", ".join(SIZES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help="SQLite stand-in database to (re)create")
+    parser.add_argument('--csv', help="also write the rows to this CSV file")
+    args = parser.parse_args()
+
+    rows = SIZES.get(str(args.rows).lower()) or int(args.rows)
+    if not args.db and not args.csv:
+        parser.error("give --db and/or --csv")
+
+    started = time.perf_counter()
+    chunks = generate(rows, args.seed)
+    if args.csv:
+        def write_csv(chunks):
+            for i, chunk in enumerate(chunks):
+                chunk[STOP_COLUMNS].to_csv(args.csv, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+                yield chunk
+        chunks = write_csv(chunks)
+    if args.db:
+        load_sqlite(args.db, chunks, on_chunk=lambda n: print(f"  {n:,} rows"))
+    else:
+        for _ in chunks:
+            pass
+    print(f"Generated {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
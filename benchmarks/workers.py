@@ -0,0 +1,142 @@
+"""Memory of several worker processes holding the snapshot, with and without the shared cache.
+
+Each worker is a fresh interpreter that reads the whole snapshot through a
+SnapshotStore, as a dashboard process in snapshot mode does, and reports
+its memory while every other worker still holds its frame. Private memory
+is what the worker alone pays (anonymous pages); the node total is the sum
+of proportional set sizes, where pages mapped by several workers count
+once. Without the shared cache both grow with the number of workers; with
+it the snapshot is decoded once and mapped by all of them. Linux only.
+
+Usage:
+    python snapshot.py                                 # build the snapshot first
+    python -m benchmarks.workers --workers 4
+    python -m benchmarks.workers --snapshot bench_1m_snapshot --workers 8 --output workers.json
+"""
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from shared_cache import SHARED_CACHES, make_shared_cache
+from snapshot import SNAPSHOT_PATH, SnapshotStore, snapshot_modified_at
+
+WORKERS = 4
+SMAPS_ROLLUP = '/proc/self/smaps_rollup'
+
+
+def memory_mb():
+    """This process's memory from smaps_rollup, in MB by field."""
+    fields = {}
+    with open(SMAPS_ROLLUP) as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == 'kB':
+                fields[name] = int(parts[0]) / 1024
+    return fields
+
+
+def hold_snapshot(snapshot, mode, cache_dir):
+    """Runs in the worker: read the snapshot, report, and hold it until stdin closes."""
+    shared = make_shared_cache(mode, cache_dir)
+    store = SnapshotStore(None, snapshot, max_age=float('inf'), shared=shared)
+    started = time.perf_counter()
+    frame = store.read()
+    elapsed = time.perf_counter() - started
+    memory = memory_mb()
+    print(json.dumps({
+        'rows': len(frame),
+        'read_ms': round(elapsed * 1000, 1),
+        'private_mb': round(memory['Anonymous'], 1),
+        'rss_mb': round(memory['Rss'], 1),
+    }), flush=True)
+    sys.stdin.read()
+    # Proportional sizes are final only once every worker has mapped the snapshot.
+    print(json.dumps({'pss_mb': round(memory_mb()['Pss'], 1)}), flush=True)
+
+
+def run_workers(snapshot, mode, workers):
+    """Start the workers one after another, as a server does, and return their reports."""
+    cache_dir = tempfile.mkdtemp(prefix='traffic_cache-bench-', dir='/dev/shm')
+    children = []
+    try:
+        reports = []
+        for _ in range(workers):
+            child = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.workers', '--child', mode, '--snapshot', snapshot,
+                 '--cache-dir', cache_dir],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            )
+            children.append(child)
+            reports.append(json.loads(child.stdout.readline()))
+        for child, report in zip(children, reports):
+            child.stdin.close()
+            report.update(json.loads(child.stdout.readline()))
+            child.wait()
+        return {
+            'mode': mode,
+            'workers': workers,
+            'first_read_ms': reports[0]['read_ms'],
+            'later_read_ms': max((report['read_ms'] for report in reports[1:]), default=None),
+            'first_private_mb': reports[0]['private_mb'],
+            # What each worker after the first adds; with the shared cache it maps the first one's decode.
+            'later_private_mb': max((report['private_mb'] for report in reports[1:]), default=None),
+            'node_total_mb': round(sum(report['pss_mb'] for report in reports), 1),
+            'workers_detail': reports,
+        }
+    finally:
+        for child in children:
+            child.kill()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="snapshot written by snapshot.py")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--mode', choices=SHARED_CACHES, action='append', help="measure only these modes")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        hold_snapshot(args.snapshot, args.child, args.cache_dir)
+        return
+    if snapshot_modified_at(args.snapshot) is None:
+        parser.error(f"no snapshot at {args.snapshot}; run python snapshot.py first")
+
+    results = []
+    for mode in args.mode or SHARED_CACHES:
+        result = run_workers(args.snapshot, mode, args.workers)
+        results.append(result)
+        print(f"{mode:<10} {args.workers} workers: private {result['first_private_mb']:>7.1f} MB first, "
+              f"{result['later_private_mb'] or 0:>7.1f} MB each after, "
+              f"node total {result['node_total_mb']:>7.1f} MB, "
+              f"reads {result['first_read_ms']:>6.0f} / {result['later_read_ms'] or 0:>6.0f} ms",
+              file=sys.stderr)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'snapshot': args.snapshot,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""Bulk loading of historical traffic stops from CSV or Parquet files.
+
+Files are streamed in chunks, each chunk is validated and coerced with
+vectorized pandas operations and written with multi-row executemany
+batches inside one transaction per chunk. After every committed chunk a
+JSON checkpoint records how many input rows are done, so an interrupted
+import resumes where it stopped.
+
+Usage:
+    python bulk_import.py stops.csv [--chunk-size 50000] [--batch-size 1000]
+"""
+import argparse
+import json
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from settings import DATABASE_URL
+
+CHUNK_SIZE = 50_000
+BATCH_SIZE = 1_000
+CHECKPOINT_DIR = '.import_checkpoints'
+
+STOP_COLUMNS = [
+    'stop_date', 'stop_time', 'country_name', 'driver_gender', 'driver_age_raw',
+    'driver_age', 'driver_race', 'violation_raw', 'violation', 'search_conducted',
+    'search_type', 'stop_outcome', 'is_arrested', 'stop_duration', 'drugs_related_stop',
+    'vehicle_number',
+]
+TEXT_COLUMNS = [
+    'country_name', 'driver_gender', 'driver_race', 'violation_raw', 'violation',
+    'search_type', 'stop_outcome', 'stop_duration', 'vehicle_number',
+]
+FLAG_COLUMNS = ['search_conducted', 'is_arrested', 'drugs_related_stop']
+FLAG_VALUES = {
+    '1': 1, '1.0': 1, 'true': 1, 't': 1, 'yes': 1, 'y': 1,
+    '0': 0, '0.0': 0, 'false': 0, 'f': 0, 'no': 0, 'n': 0,
+}
+
+INSERT_QUERY = f"""
+    INSERT INTO traffic_stops ({', '.join(STOP_COLUMNS)})
+    VALUES ({', '.join(':' + column for column in STOP_COLUMNS)})
+"""
+
+
+@dataclass
+class ImportProgress:
+    rows_read: int = 0
+    rows_inserted: int = 0
+    rows_rejected: int = 0
+    elapsed: float = 0.0
+    # Rows inserted by earlier runs of a resumed import; excluded from throughput.
+    rows_resumed: int = 0
+
+    @property
+    def rows_per_second(self):
+        return (self.rows_inserted - self.rows_resumed) / self.elapsed if self.elapsed else 0.0
+
+
+# ==================== READING ====================
+def read_chunks(source, file_format, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows from a path or file object."""
+    if file_format == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=True)
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def detect_format(name):
+    extension = os.path.splitext(name)[1].lower()
+    return {'.csv': 'csv', '.gz': 'csv', '.parquet': 'parquet', '.pq': 'parquet'}.get(extension, 'csv')
+
+
+# ==================== COERCION ====================
+def coerce_flags(values):
+    normalized = values.astype(str).str.strip().str.lower()
+    return normalized.map(FLAG_VALUES).fillna(0).astype(np.int8)
+
+
+def coerce_times(values):
+    values = values.astype(str).str.strip()
+    parsed = pd.to_datetime(values, format='%H:%M:%S', errors='coerce')
+    parsed = parsed.fillna(pd.to_datetime(values, format='%H:%M', errors='coerce'))
+    return parsed.dt.strftime('%H:%M:%S')
+
+
+def coerce_chunk(chunk):
+    """Return (clean rows, rejected row count) for one chunk of input.
+
+    Rows without a parseable stop_date are rejected; other bad values
+    become NULL, the same way the Register New Case form stores them.
+    """
+    df = chunk.reindex(columns=STOP_COLUMNS)
+
+    stop_date = pd.to_datetime(df['stop_date'], errors='coerce')
+    valid = stop_date.notna()
+    df = df[valid].copy()
+    df['stop_date'] = stop_date[valid].dt.strftime('%Y-%m-%d')
+    df['stop_time'] = coerce_times(df['stop_time'])
+
+    raw_age = chunk.loc[valid, 'driver_age_raw'] if 'driver_age_raw' in chunk else df['driver_age']
+    age = pd.to_numeric(df['driver_age'], errors='coerce')
+    age = age.fillna(pd.to_numeric(raw_age, errors='coerce'))
+    df['driver_age'] = age.where((age >= 0) & (age <= 120)).round().astype('Int16')
+    df['driver_age_raw'] = pd.to_numeric(raw_age, errors='coerce')
+
+    for column in FLAG_COLUMNS:
+        df[column] = coerce_flags(df[column])
+
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].astype('string').str.strip().replace('', pd.NA)
+
+    # "15 mins", "15", "0-15 Min": keep the text but drop values with no leading number.
+    has_minutes = df['stop_duration'].str.match(r'^\d+', na=False)
+    df['stop_duration'] = df['stop_duration'].where(has_minutes)
+    df['search_type'] = df['search_type'].where(df['search_conducted'] == 1)
+
+    df = df.astype(object).where(df.notna(), None)
+    return df, int((~valid).sum())
+
+
+def coerce_record(record):
+    """Scalar counterpart of coerce_chunk for one form submission.
+
+    Returns the clean row, or None when it has no parseable stop_date.
+    """
+    try:
+        stop_date = pd.Timestamp(str(record.get('stop_date'))).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+    row = {'stop_date': stop_date, 'stop_time': None}
+    for time_format in ('%H:%M:%S', '%H:%M'):
+        try:
+            row['stop_time'] = datetime.strptime(str(record.get('stop_time')).strip(), time_format).strftime('%H:%M:%S')
+            break
+        except ValueError:
+            pass
+
+    def number(value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if math.isnan(value) else value
+
+    raw_age = number(record.get('driver_age_raw', record.get('driver_age')))
+    age = number(record.get('driver_age'))
+    age = raw_age if age is None else age
+    row['driver_age'] = int(round(age)) if age is not None and 0 <= age <= 120 else None
+    row['driver_age_raw'] = raw_age
+
+    for column in FLAG_COLUMNS:
+        row[column] = FLAG_VALUES.get(str(record.get(column)).strip().lower(), 0)
+
+    for column in TEXT_COLUMNS:
+        value = record.get(column)
+        value = None if value is None else str(value).strip()
+        row[column] = value or None
+
+    if row['stop_duration'] is not None and not re.match(r'^\d+', row['stop_duration']):
+        row['stop_duration'] = None
+    if row['search_conducted'] != 1:
+        row['search_type'] = None
+    return {column: row[column] for column in STOP_COLUMNS}
+
+
+# ==================== WRITING ====================
+def insert_rows(conn, df, batch_size=BATCH_SIZE):
+    records = df.to_dict('records')
+    for start in range(0, len(records), batch_size):
+        conn.execute(text(INSERT_QUERY), records[start:start + batch_size])
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'rows_done': 0, 'rows_inserted': 0, 'rows_rejected': 0}
+
+
+def save_checkpoint(path, progress):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'rows_done': progress.rows_read,
+            'rows_inserted': progress.rows_inserted,
+            'rows_rejected': progress.rows_rejected,
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def checkpoint_path_for(name, size):
+    safe_name = "".join(ch if ch.isalnum() or ch in '._-' else '_' for ch in os.path.basename(name))
+    return os.path.join(CHECKPOINT_DIR, f"{safe_name}.{size}.json")
+
+
+def import_stops(engine, source, file_format, checkpoint_path=None,
+                 chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, on_progress=None):
+    """Import every row of source into traffic_stops and return the final progress."""
+    checkpoint = load_checkpoint(checkpoint_path)
+    rows_to_skip = checkpoint['rows_done']
+    progress = ImportProgress(
+        rows_read=rows_to_skip,
+        rows_inserted=checkpoint['rows_inserted'],
+        rows_rejected=checkpoint['rows_rejected'],
+        rows_resumed=checkpoint['rows_inserted'],
+    )
+    started = time.perf_counter()
+
+    for chunk in read_chunks(source, file_format, chunk_size):
+        if rows_to_skip >= len(chunk):
+            rows_to_skip -= len(chunk)
+            continue
+        chunk = chunk.iloc[rows_to_skip:]
+        rows_to_skip = 0
+
+        rows, rejected = coerce_chunk(chunk)
+        with engine.begin() as conn:
+            insert_rows(conn, rows, batch_size)
+
+        progress.rows_read += len(chunk)
+        progress.rows_inserted += len(rows)
+        progress.rows_rejected += rejected
+        save_checkpoint(checkpoint_path, progress)
+
+        progress.elapsed = time.perf_counter() - started
+        if on_progress is not None:
+            on_progress(progress)
+
+    progress.elapsed = time.perf_counter() - started
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="CSV or Parquet file to import")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="defaults to the file extension")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--checkpoint', help="checkpoint file (default: under .import_checkpoints/)")
+    parser.add_argument('--restart', action='store_true', help="ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or checkpoint_path_for(args.path, os.path.getsize(args.path))
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    def report(progress):
+        print(f"{progress.rows_read:>12,} rows read  {progress.rows_inserted:>12,} inserted  "
+              f"{progress.rows_rejected:>8,} rejected  {progress.rows_per_second:>10,.0f} rows/s")
+
+    engine = create_engine(DATABASE_URL)
+    progress = import_stops(engine, args.path, args.format or detect_format(args.path),
+                            checkpoint_path, args.chunk_size, args.batch_size, report)
+    print(f"Imported {progress.rows_inserted:,} rows ({progress.rows_rejected:,} rejected) "
+          f"in {progress.elapsed:.1f}s, {progress.rows_per_second:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Cached rendering of the Dashboard charts.
+
+Each chart is drawn once per (chart, data fingerprint, size, theme) into
+PNG or SVG bytes and kept in an LRU cache, so repeat page views skip
+matplotlib entirely. Figures are built with the object-oriented Figure
+API rather than pyplot, so nothing is left in pyplot's global figure
+registry, and every figure is cleared as soon as it has been saved.
+matplotlib itself is only imported on the first cache miss.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CHART_CACHE_MAX_BYTES = 32 * 1024 * 1024
+CHART_DPI = 100
+
+THEMES = {
+    'light': {'background': 'white', 'text': 'black'},
+    'dark': {'background': '#0e1117', 'text': '#fafafa'},
+}
+
+
+class ChartCache:
+    """Thread-safe LRU of rendered chart bytes with hit and miss counters."""
+
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = render()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self.total_bytes += len(image)
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'charts': len(self._entries), 'bytes': self.total_bytes}
+
+
+def fingerprint(data):
+    digest = hashlib.sha1()
+    for part in data:
+        array = np.asarray(part)
+        if array.dtype.kind in 'biuf':
+            digest.update(array.dtype.str.encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        else:
+            digest.update(repr(array.tolist()).encode())
+    return digest.hexdigest()
+
+
+# ==================== CHART TYPES ====================
+# Each draw function takes an Axes, the chart data and plain keyword options.
+def draw_bar(ax, data, title, xlabel, ylabel, color, rotation=0):
+    labels, values = data
+    positions = np.arange(len(values))
+    ax.bar(positions, values, color=color)
+    ax.set_xticks(positions)
+    ax.set_xticklabels(labels, rotation=rotation)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def draw_barh(ax, data, title, xlabel, color):
+    labels, values = data
+    positions = np.arange(len(values))
+    ax.barh(positions, values, color=color)
+    ax.set_yticks(positions)
+    ax.set_yticklabels(labels)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+
+
+def draw_pie(ax, data, title):
+    labels, values = data
+    ax.pie(values, labels=labels, autopct='%1.1f%%')
+    ax.set_title(title)
+
+
+def draw_histogram(ax, data, title, xlabel, ylabel, color):
+    counts, edges = data
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color=color, edgecolor='black')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def _render(draw, data, size, theme, image_format, options):
+    from matplotlib.figure import Figure
+
+    colors = THEMES.get(theme, THEMES['light'])
+    fig = Figure(figsize=size, dpi=CHART_DPI, facecolor=colors['background'])
+    try:
+        ax = fig.subplots()
+        ax.set_facecolor(colors['background'])
+        draw(ax, data, **options)
+        for text in [ax.title, ax.xaxis.label, ax.yaxis.label]:
+            text.set_color(colors['text'])
+        ax.tick_params(colors=colors['text'])
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=image_format, bbox_inches='tight', facecolor=colors['background'])
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def render_chart(cache, draw, data, size, theme='light', image_format='png', **options):
+    """Return the chart image bytes, rendering only on a cache miss."""
+    key = (draw.__name__, fingerprint(data), size, theme, image_format, tuple(sorted(options.items())))
+    return cache.get_or_render(key, lambda: _render(draw, data, size, theme, image_format, options))
@@ -0,0 +1,98 @@
+"""Streaming export of query results to CSV, gzip-compressed CSV or Parquet.
+
+Rows are written chunk by chunk as they arrive from a server-side cursor,
+so memory use is bounded by the chunk size however large the export is.
+"""
+import gzip
+import io
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+EXPORT_DIR = os.environ.get('TRAFFIC_EXPORT_DIR', 'exports')
+EXPORT_CHUNK_SIZE = 50_000
+# Larger exports are left on disk instead of being offered as a browser download.
+EXPORT_DOWNLOAD_MAX_BYTES = 200 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+def export_path(name, export_format):
+    extension = EXPORT_FORMATS[export_format][0]
+    safe_name = "".join(ch if ch.isalnum() else '_' for ch in name.lower()).strip('_')
+    return os.path.join(EXPORT_DIR, f"{safe_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+
+
+def _write_csv(chunks, path, compress, stats, on_progress):
+    with open(path, 'wb') as raw:
+        binary = gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
+        with io.TextIOWrapper(binary, encoding='utf-8', newline='') as out:
+            for chunk in chunks:
+                chunk.to_csv(out, header=stats.rows == 0, index=False)
+                out.flush()
+                stats.rows += len(chunk)
+                stats.bytes = raw.tell()
+                on_progress(stats)
+
+
+def _write_parquet(chunks, path, stats, on_progress):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from snapshot import writable_schema
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, writable_schema(table), compression='zstd')
+            writer.write_table(table.cast(writer.schema))
+            stats.rows += len(chunk)
+            on_progress(stats)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_export(chunks, export_format, path, on_progress=None):
+    """Write an iterable of DataFrame chunks to path and return ExportStats."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stats = ExportStats()
+    started = time.perf_counter()
+
+    def progress(stats):
+        stats.seconds = time.perf_counter() - started
+        if on_progress is not None:
+            on_progress(stats)
+
+    if export_format == 'Parquet':
+        _write_parquet(chunks, path, stats, progress)
+    elif export_format in ('CSV', 'CSV (gzip)'):
+        _write_csv(chunks, path, export_format == 'CSV (gzip)', stats, progress)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    stats.seconds = time.perf_counter() - started
+    stats.bytes = os.path.getsize(path) if os.path.exists(path) else 0
+    return stats
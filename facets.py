@@ -0,0 +1,125 @@
+"""Facet index behind the filter dropdowns of Search Incidents and Driver Details.
+
+The index holds the count of every combination of the facet columns (a
+small cube: its size depends on the columns' cardinalities, not on the
+number of stops). Dropdown options, their counts given the other
+selections, and the age bounds are sums over that cube, so populating a
+dropdown never reads traffic_stops. The cube follows the table from an id
+watermark like the Dashboard aggregates: one GROUP BY on the first load,
+then only rows with a higher id, and a periodic full reload to pick up
+rows that were updated or deleted.
+"""
+import threading
+import time
+
+import pandas as pd
+
+from query_catalog import FACET_COLUMNS, FACET_COUNTS_QUERY, FACET_DELTA_QUERY, LIVE_WATERMARK_QUERY
+
+DELTA_CHUNK_SIZE = 50_000
+MIN_REFRESH_SECONDS = 1.0
+RECONCILE_SECONDS = 10 * 60
+
+
+class FacetIndex:
+    """Counts of each combination of FACET_COLUMNS over every row up to watermark.
+
+    read(query, params) runs a query and returns a DataFrame. Filters map a
+    facet column to a value, or to a (low, high) pair matched inclusively.
+    """
+
+    def __init__(self, read, reconcile_seconds=RECONCILE_SECONDS):
+        self.read = read
+        self.reconcile_seconds = reconcile_seconds
+        self.watermark = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._cube = pd.DataFrame(columns=list(FACET_COLUMNS) + ['count'])
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cube)
+
+    def refresh(self, force=False):
+        """Bring the cube up to date and return the number of rows folded in.
+
+        Calls within MIN_REFRESH_SECONDS of the last one, or while another
+        thread is refreshing, return 0 and leave the cube as it is.
+        """
+        if not force and self.refreshed_at is not None and \
+                time.monotonic() - self.refreshed_at < MIN_REFRESH_SECONDS:
+            return 0
+        if not self._refresh_lock.acquire(blocking=self.watermark is None):
+            return 0
+        try:
+            if self.watermark is None or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+                rows = self._load()
+            else:
+                rows = self._apply_deltas()
+            self.refreshed_at = time.monotonic()
+            return rows
+        finally:
+            self._refresh_lock.release()
+
+    def _load(self):
+        watermark = self.read(LIVE_WATERMARK_QUERY, None)['max_id'].iloc[0]
+        watermark = 0 if pd.isna(watermark) else int(watermark)
+        cube = self.read(FACET_COUNTS_QUERY, {'watermark': watermark})
+        with self._lock:
+            self._cube = cube
+            self.watermark = watermark
+            self.loaded_at = time.monotonic()
+        return int(cube['count'].sum())
+
+    def _apply_deltas(self):
+        rows = 0
+        while True:
+            delta = self.read(FACET_DELTA_QUERY, {'after_id': self.watermark, 'limit': DELTA_CHUNK_SIZE})
+            if len(delta):
+                self._fold(delta)
+                rows += len(delta)
+            if len(delta) < DELTA_CHUNK_SIZE:
+                return rows
+
+    def _fold(self, delta):
+        counts = delta.groupby(list(FACET_COLUMNS), dropna=False).size().rename('count').reset_index()
+        with self._lock:
+            # NULLs form their own group in SQL's GROUP BY, and so here.
+            cube = pd.concat([self._cube, counts], ignore_index=True)
+            self._cube = cube.groupby(list(FACET_COLUMNS), dropna=False, sort=False)['count'].sum().reset_index()
+            self.watermark = int(delta['id'].max())
+
+    def _matching(self, filters):
+        with self._lock:
+            cube = self._cube
+        mask = pd.Series(True, index=cube.index)
+        for column, value in filters.items():
+            if isinstance(value, tuple):
+                low, high = value
+                mask &= cube[column].between(low, high)
+            else:
+                mask &= cube[column] == value
+        return cube[mask]
+
+    def counts(self, column, filters=None):
+        """Stops per non-null value of column among rows matching the filters on other columns.
+
+        A filter on column itself is ignored, so every option stays listed
+        with the count it would have if chosen.
+        """
+        filters = {name: value for name, value in (filters or {}).items() if name != column}
+        matching = self._matching(filters)
+        counts = matching.groupby(column)['count'].sum().astype('int64')
+        counts.index.name = None
+        return counts[counts > 0].sort_index()
+
+    def total(self, filters=None):
+        return int(self._matching(filters or {})['count'].sum())
+
+    def bounds(self, column, filters=None):
+        """(min, max) of a numeric column among matching rows, or None when no value is known."""
+        values = self.counts(column, filters).index
+        if values.empty:
+            return None
+        return values.min(), values.max()
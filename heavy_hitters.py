@@ -0,0 +1,369 @@
+"""Streaming heavy-hitter sketches for the "top vehicles" queries.
+
+For every flag (drug-related, searched, arrested), both overall and per
+country, a SpaceSaving summary keeps the plates most often stopped with that
+flag set, and a Count-Min sketch bounds any plate's count from above.
+SpaceSaving over-counts a plate by at most N / capacity, where N is the
+number of flagged stops, and never misses a plate above that share. Top-K
+answers come from memory in microseconds, without a GROUP BY over
+vehicle_number.
+
+The sketches follow traffic_stops by id like the vehicle index, so inserts
+and bulk imports from any process are picked up by refresh(), and are
+rebuilt in the background every reconcile_seconds to pick up rows committed
+out of id order. They are saved to disk with their watermark at most every
+save_seconds, off the request path, and resume from it on the next start.
+exact_top_query() is the equivalent SQL, for verifying an answer.
+"""
+import heapq
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from query_catalog import LIVE_WATERMARK_QUERY
+
+HEAVY_HITTER_FLAGS = ('drugs_related_stop', 'search_conducted', 'is_arrested')
+HEAVY_HITTER_PATH = os.environ.get('TRAFFIC_HEAVY_HITTER_PATH', os.path.join('sketches', 'heavy_hitters.npz'))
+HEAVY_HITTER_CHUNK_SIZE = 100_000
+SPACE_SAVING_CAPACITY = 1_000
+COUNT_MIN_WIDTH = 4_096
+COUNT_MIN_DEPTH = 4
+RECONCILE_SECONDS = 10 * 60
+SAVE_SECONDS = 60
+
+HEAVY_HITTER_LOAD_QUERY = """
+    SELECT id, vehicle_number, country_name, drugs_related_stop, search_conducted, is_arrested
+    FROM traffic_stops
+    WHERE id > :after_id AND id <= :until_id AND vehicle_number IS NOT NULL
+      AND (drugs_related_stop = 1 OR search_conducted = 1 OR is_arrested = 1)
+    ORDER BY id
+"""
+
+
+def exact_top_query(flag, country=None, k=10):
+    """The GROUP BY a sketch answer approximates, as (query, params)."""
+    if flag not in HEAVY_HITTER_FLAGS:
+        raise ValueError(f"Unsupported flag: {flag}")
+    params = {'limit': k}
+    country_clause = ""
+    if country is not None:
+        country_clause = "AND country_name = :country"
+        params['country'] = country
+    return f"""
+        SELECT vehicle_number, COUNT(*) AS count
+        FROM traffic_stops
+        WHERE {flag} = 1 AND vehicle_number IS NOT NULL {country_clause}
+        GROUP BY vehicle_number
+        ORDER BY count DESC
+        LIMIT :limit
+    """, params
+
+
+class SpaceSaving:
+    """Weighted SpaceSaving summary (Metwally et al.) of at most capacity items.
+
+    Each tracked item has a count and the most it can be over-counted by;
+    its true count lies in [count - error, count].
+    """
+
+    def __init__(self, capacity=SPACE_SAVING_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Lazy min-heap of (count, item); entries whose count is stale are skipped.
+        self._heap = []
+
+    def update(self, item, weight=1):
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            floor, evicted = self._pop_min()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = floor + weight
+            self.errors[item] = floor
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def top(self, k):
+        """[(item, count, error)] for the k largest counts."""
+        return [(item, count, self.errors[item])
+                for item, count in heapq.nlargest(k, self.counts.items(), key=lambda entry: entry[1])]
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'total': self.total,
+                'items': [[item, count, self.errors[item]] for item, count in self.counts.items()]}
+
+    @classmethod
+    def from_dict(cls, state):
+        summary = cls(state['capacity'])
+        summary.total = state['total']
+        for item, count, error in state['items']:
+            summary.counts[item] = count
+            summary.errors[item] = error
+        summary._heap = [(count, item) for item, count in summary.counts.items()]
+        heapq.heapify(summary._heap)
+        return summary
+
+
+class CountMinSketch:
+    """Count-Min sketch: estimates never undercount, and overcount by at most
+    e / width * total with probability 1 - exp(-depth).
+    """
+
+    def __init__(self, width=COUNT_MIN_WIDTH, depth=COUNT_MIN_DEPTH, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    def _buckets(self, items):
+        items = np.asarray(items, dtype=object)
+        return np.stack([
+            pd.util.hash_array(items, hash_key=f"countmin{row:08d}") % np.uint64(self.width)
+            for row in range(self.depth)
+        ]).astype(np.int64)
+
+    def update_many(self, items, weights):
+        buckets = self._buckets(items)
+        weights = np.asarray(weights, dtype=np.int64)
+        for row in range(self.depth):
+            np.add.at(self.table[row], buckets[row], weights)
+
+    def estimate_many(self, items):
+        if len(items) == 0:
+            return np.zeros(0, dtype=np.int64)
+        buckets = self._buckets(items)
+        return self.table[np.arange(self.depth)[:, None], buckets].min(axis=0)
+
+
+class HeavyHitters:
+    """SpaceSaving and Count-Min sketches per (flag, country); country None is all countries."""
+
+    def __init__(self, engine, path=HEAVY_HITTER_PATH, capacity=SPACE_SAVING_CAPACITY,
+                 reconcile_seconds=RECONCILE_SECONDS, save_seconds=SAVE_SECONDS):
+        self.engine = engine
+        self.path = path
+        self.capacity = capacity
+        self.reconcile_seconds = reconcile_seconds
+        self.save_seconds = save_seconds
+        self.max_id = 0
+        self.loaded_at = time.monotonic()
+        self.saved_at = float('-inf')
+        # The watermark last written to path; the sketches are unsaved while max_id differs.
+        self._saved_max_id = 0
+        self._summaries = {}
+        self._sketches = {}
+        # Answers stay valid until the sketches change, which bumps the version.
+        self._answers = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def keys(self):
+        with self._lock:
+            return sorted(self._summaries, key=lambda key: (key[0], key[1] or ''))
+
+    def countries(self):
+        return sorted({country for _, country in self.keys() if country is not None})
+
+    def _sketch_pair(self, key):
+        if key not in self._summaries:
+            self._summaries[key] = SpaceSaving(self.capacity)
+            self._sketches[key] = CountMinSketch()
+        return self._summaries[key], self._sketches[key]
+
+    def add_frame(self, df):
+        """Fold rows with id, vehicle_number, country_name and the flag columns into the sketches."""
+        if df.empty:
+            return
+        with self._lock:
+            for flag in HEAVY_HITTER_FLAGS:
+                flagged = df[pd.to_numeric(df[flag]).fillna(0) == 1]
+                if flagged.empty:
+                    continue
+                groups = [(None, flagged)] + [(country, rows) for country, rows in
+                                              flagged.groupby('country_name', dropna=True)]
+                for country, rows in groups:
+                    counts = rows['vehicle_number'].astype(str).value_counts()
+                    summary, sketch = self._sketch_pair((flag, country))
+                    for item, weight in counts.items():
+                        summary.update(item, int(weight))
+                    sketch.update_many(counts.index.to_numpy(), counts.to_numpy())
+            self.max_id = max(self.max_id, int(df['id'].max()))
+            self._answers = {}
+            self._version += 1
+
+    def load(self, after_id=0, until_id=None):
+        """Fold in the rows with after_id < id <= until_id, by default up to the current MAX(id)."""
+        with self.engine.connect() as conn:
+            if until_id is None:
+                until_id = conn.execute(text(LIVE_WATERMARK_QUERY)).scalar() or 0
+            for chunk in pd.read_sql(text(HEAVY_HITTER_LOAD_QUERY), conn,
+                                     params={'after_id': after_id, 'until_id': until_id},
+                                     chunksize=HEAVY_HITTER_CHUNK_SIZE):
+                self.add_frame(chunk)
+        # Unflagged rows up to until_id were read past, not folded in.
+        with self._lock:
+            self.max_id = max(self.max_id, int(until_id))
+
+    def refresh(self, latest_id):
+        """Pick up rows inserted since the last refresh, by this or any other process.
+
+        Returns at once while another thread refreshes. Once the sketches are
+        reconcile_seconds old, or the table shrank, they are rebuilt in the
+        background instead. Changes are saved in the background at most every
+        save_seconds.
+        """
+        if latest_id is None:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        # The table shrank, or it is time to pick up rows committed out of id order.
+        if latest_id < self.max_id or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+            threading.Thread(target=self._reconcile, name="heavy-hitters-reconcile", daemon=True).start()
+            return
+        try:
+            if latest_id > self.max_id:
+                self.load(after_id=self.max_id, until_id=latest_id)
+        finally:
+            self._refresh_lock.release()
+        if time.monotonic() - self.saved_at > self.save_seconds and self._save_lock.acquire(blocking=False):
+            threading.Thread(target=self._save_in_background, name="heavy-hitters-save", daemon=True).start()
+
+    def _reconcile(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    def rebuild(self):
+        """Recompute the sketches from scratch, e.g. after rows were updated or deleted."""
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Built aside and swapped in, so top() keeps answering from the old sketches meanwhile.
+        fresh = HeavyHitters(self.engine, self.path, self.capacity)
+        fresh.load()
+        with self._lock:
+            self.max_id = fresh.max_id
+            self._summaries = fresh._summaries
+            self._sketches = fresh._sketches
+            self._answers = {}
+            self._version += 1
+            self.loaded_at = time.monotonic()
+        self.save()
+
+    def _save_in_background(self):
+        try:
+            self.flush()
+        finally:
+            self._save_lock.release()
+
+    def flush(self):
+        """Save the sketches if they changed since they were last saved, e.g. on shutdown."""
+        with self._lock:
+            dirty = self.max_id != self._saved_max_id
+        if dirty:
+            self.save()
+
+    def top(self, flag, country=None, k=10):
+        """Top k plates for flag as a DataFrame with count bounds.
+
+        count and min_count bound the true count; guaranteed marks plates
+        whose lower bound is at least the upper bound of every plate outside
+        the top k. The returned DataFrame is shared and must not be mutated.
+        """
+        with self._lock:
+            answer = self._answers.get((flag, country, k))
+            if answer is not None:
+                return answer
+            version = self._version
+            summary = self._summaries.get((flag, country))
+            if summary is None:
+                return pd.DataFrame(columns=['vehicle_number', 'count', 'min_count', 'guaranteed'])
+            items = list(summary.counts)
+            counts = np.fromiter(summary.counts.values(), dtype=np.int64, count=len(items))
+            errors = np.fromiter((summary.errors[item] for item in items), dtype=np.int64, count=len(items))
+            upper = np.minimum(counts, self._sketches[(flag, country)].estimate_many(items))
+            # An untracked plate was never counted, or was evicted at or below the smallest count.
+            untracked = int(counts.min()) if len(items) >= summary.capacity else 0
+            total = summary.total
+        # Rank every tracked plate by the upper bound shown, so the plates left out are bounded too.
+        order = np.array(sorted(range(len(items)), key=lambda i: (-upper[i], items[i])), dtype=np.int64)
+        result = pd.DataFrame({
+            'vehicle_number': [items[i] for i in order[:k]],
+            'count': upper[order[:k]],
+            'min_count': (counts - errors)[order[:k]],
+        })
+        outside = max(int(upper[order[k:]].max()), untracked) if len(order) > k else untracked
+        result['guaranteed'] = result['min_count'] >= outside
+        result.attrs['total'] = total
+        result.attrs['max_error'] = total // self.capacity
+        with self._lock:
+            if self._version == version:
+                self._answers[(flag, country, k)] = result
+        return result
+
+    def save(self):
+        """Write the sketches and their watermark to path, replacing it atomically."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            keys = list(self._summaries)
+            max_id = self.max_id
+            meta = {
+                'max_id': max_id,
+                # Wall-clock age of the data, so a reopened file is reconciled on schedule.
+                'built_at': time.time() - (time.monotonic() - self.loaded_at),
+                'capacity': self.capacity,
+                'keys': [list(key) for key in keys],
+                'summaries': [self._summaries[key].to_dict() for key in keys],
+            }
+            tables = {f"table_{i}": self._sketches[key].table for i, key in enumerate(keys)}
+        # One temporary file per writer, as several worker processes save the same sketches.
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.array(json.dumps(meta)), **tables)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._saved_max_id = max_id
+            self.saved_at = time.monotonic()
+
+    @classmethod
+    def open(cls, engine, path=HEAVY_HITTER_PATH, capacity=SPACE_SAVING_CAPACITY):
+        """Sketches saved at path, or empty ones if there is no usable file."""
+        hitters = cls(engine, path, capacity)
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                meta = json.loads(str(saved['meta']))
+                tables = {name: saved[name] for name in saved.files if name != 'meta'}
+        except (OSError, ValueError, KeyError):
+            return hitters
+        if meta['capacity'] != capacity:
+            return hitters
+        for i, (key, state) in enumerate(zip(meta['keys'], meta['summaries'])):
+            key = tuple(key)
+            hitters._summaries[key] = SpaceSaving.from_dict(state)
+            hitters._sketches[key] = CountMinSketch(table=tables[f"table_{i}"])
+        hitters.max_id = hitters._saved_max_id = meta['max_id']
+        hitters.saved_at = time.monotonic()
+        hitters.loaded_at -= max(0.0, time.time() - meta.get('built_at', time.time()))
+        return hitters
@@ -0,0 +1,142 @@
+"""Hot-path instrumentation for database calls and pandas post-processing.
+
+Every tracked call records wall time, rows, result size, cache hit or miss
+and the page or canned query it ran for. Calls slower than the slow-query
+threshold get their EXPLAIN plan captured once per statement. Events can
+be exported as JSON lines for offline analysis.
+"""
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+SLOW_QUERY_MS = float(os.environ.get('TRAFFIC_SLOW_QUERY_MS', 500))
+MAX_EVENTS = 5_000
+MAX_PLANS = 200
+METRICS_EXPORT_PATH = os.path.join('metrics', 'query_metrics.jsonl')
+
+# The page or canned query the current code is running for. Worker threads
+# see it too as long as tasks are submitted with contextvars.copy_context().
+current_origin = contextvars.ContextVar('current_origin', default='unknown')
+
+
+@dataclass
+class Event:
+    kind: str
+    origin: str
+    statement: str
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='milliseconds'))
+    wall_ms: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    cache: Optional[str] = None
+    error: Optional[str] = None
+
+
+def short_statement(sql, limit=160):
+    return re.sub(r'\s+', ' ', sql).strip()[:limit]
+
+
+@contextmanager
+def origin(name):
+    token = current_origin.set(name)
+    try:
+        yield
+    finally:
+        current_origin.reset(token)
+
+
+class Instrumentation:
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, kind, statement):
+        """Time the enclosed block; the caller fills rows, bytes and cache on the event."""
+        event = Event(kind=kind, origin=current_origin.get(), statement=short_statement(statement))
+        started = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event.error = str(e)
+            raise
+        finally:
+            event.wall_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._events.append(event)
+
+    def record_result(self, event, result):
+        event.rows = len(result)
+        event.bytes = int(result.memory_usage(index=True, deep=True).sum())
+
+    def is_slow(self, event):
+        return event.wall_ms >= self.slow_query_ms and event.kind == 'db' and event.error is None
+
+    def capture_plan(self, backend, sql, params=None):
+        """Store the backend's EXPLAIN output for sql unless it was captured already."""
+        key = short_statement(sql, limit=10_000)
+        with self._lock:
+            if key in self._plans or len(self._plans) >= MAX_PLANS:
+                return
+        try:
+            plan = backend.explain(sql, params)
+        except Exception as e:
+            plan = pd.DataFrame({'error': [str(e)]})
+        with self._lock:
+            self._plans[key] = plan
+
+    def plan_for(self, statement):
+        with self._lock:
+            for key, plan in self._plans.items():
+                if key.startswith(statement):
+                    return plan
+        return None
+
+    def events(self):
+        with self._lock:
+            return pd.DataFrame([asdict(event) for event in self._events])
+
+    def slow_queries(self):
+        events = self.events()
+        if events.empty:
+            return events
+        slow = events[(events['kind'] == 'db') & (events['wall_ms'] >= self.slow_query_ms)]
+        return slow.sort_values('wall_ms', ascending=False)
+
+    def summary(self):
+        """Per origin and kind: call count, latency percentiles, rows, bytes and cache hit rate."""
+        events = self.events()
+        if events.empty:
+            return events
+        grouped = events.groupby(['origin', 'kind'])
+        summary = grouped['wall_ms'].agg(
+            calls='count', p50_ms='median', p95_ms=lambda s: s.quantile(0.95), max_ms='max'
+        )
+        summary['rows'] = grouped['rows'].sum()
+        summary['bytes'] = grouped['bytes'].sum()
+        summary['cache_hit_rate'] = grouped['cache'].agg(
+            lambda s: (s == 'hit').sum() / s.notna().sum() if s.notna().any() else None
+        )
+        return summary.sort_values('p95_ms', ascending=False).reset_index()
+
+    def export(self, path=METRICS_EXPORT_PATH):
+        """Write every buffered event to path as JSON lines and return the count."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            events = [asdict(event) for event in self._events]
+        with open(path, 'w') as f:
+            for event in events:
+                f.write(json.dumps(event) + '\n')
+        return len(events)
@@ -0,0 +1,154 @@
+"""Dashboard aggregates kept current from an id watermark instead of full reloads.
+
+The first load computes totals and value counts with GROUP BY queries up
+to the current MAX(id). After that a refresh reads only the rows with a
+higher id and folds them into the totals, so it costs O(new rows), and an
+idle refresh is a single primary-key range probe. A periodic full reload
+corrects for rows that were updated, deleted or committed out of id order.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from query_catalog import (
+    AGE_HISTOGRAM_BINS, LIVE_COUNT_COLUMNS, LIVE_DELTA_QUERY, LIVE_SUM_COLUMNS, LIVE_TOTALS_QUERY,
+    LIVE_WATERMARK_QUERY, live_counts_query,
+)
+
+DELTA_CHUNK_SIZE = 50_000
+MIN_REFRESH_SECONDS = 1.0
+RECONCILE_SECONDS = 10 * 60
+
+
+class LiveAggregates:
+    """Totals and value counts over traffic_stops for every row up to watermark.
+
+    read(query, params) runs a query and returns a DataFrame. Readers get
+    copies, so a refresh in another session never changes them mid-render.
+    """
+
+    def __init__(self, read, executor=None, reconcile_seconds=RECONCILE_SECONDS):
+        self.read = read
+        self.executor = executor
+        self.reconcile_seconds = reconcile_seconds
+        self.watermark = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.last_delta_rows = 0
+        self._totals = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Bring the aggregates up to date and return the number of rows folded in.
+
+        Calls within MIN_REFRESH_SECONDS of the last one, or while another
+        thread is refreshing, return 0 and leave the aggregates as they are.
+        """
+        if not force and self.refreshed_at is not None and \
+                time.monotonic() - self.refreshed_at < MIN_REFRESH_SECONDS:
+            return 0
+        if not self._refresh_lock.acquire(blocking=self.watermark is None):
+            return 0
+        try:
+            if self.watermark is None or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+                rows = self._load()
+            else:
+                rows = self._apply_deltas()
+            self.refreshed_at = time.monotonic()
+            self.last_delta_rows = rows
+            return rows
+        finally:
+            self._refresh_lock.release()
+
+    def _load(self):
+        watermark = self.read(LIVE_WATERMARK_QUERY, None)['max_id'].iloc[0]
+        watermark = 0 if pd.isna(watermark) else int(watermark)
+        jobs = {'totals': (LIVE_TOTALS_QUERY, {'watermark': watermark})}
+        jobs.update({column: (live_counts_query(column), {'watermark': watermark})
+                     for column in LIVE_COUNT_COLUMNS})
+        if self.executor is not None:
+            outcomes = self.executor.run_all(self.read, jobs)
+            for outcome in outcomes.values():
+                if outcome.error is not None:
+                    raise outcome.error
+            results = {name: outcome.result for name, outcome in outcomes.items()}
+        else:
+            results = {name: self.read(*args) for name, args in jobs.items()}
+
+        totals = results.pop('totals').iloc[0]
+        counts = {column: self._as_counts(result.set_index('value')['count'], column)
+                  for column, result in results.items()}
+        with self._lock:
+            self._totals = {name: int(totals[name]) for name in ['total_stops'] + list(LIVE_SUM_COLUMNS)}
+            self._counts = counts
+            self.watermark = watermark
+            self.loaded_at = time.monotonic()
+        return int(totals['total_stops'])
+
+    def _apply_deltas(self):
+        rows = 0
+        while True:
+            delta = self.read(LIVE_DELTA_QUERY, {'after_id': self.watermark, 'limit': DELTA_CHUNK_SIZE})
+            if len(delta):
+                self._fold(delta)
+                rows += len(delta)
+            if len(delta) < DELTA_CHUNK_SIZE:
+                return rows
+
+    def _fold(self, delta):
+        totals = {'total_stops': len(delta)}
+        totals.update({name: int(pd.to_numeric(delta[column]).fillna(0).sum())
+                       for name, column in LIVE_SUM_COLUMNS.items()})
+        counts = {column: self._as_counts(delta[column].value_counts(), column)
+                  for column in LIVE_COUNT_COLUMNS}
+        with self._lock:
+            self._totals = {name: value + totals[name] for name, value in self._totals.items()}
+            self._counts = {
+                column: self._counts[column].add(counts[column], fill_value=0).astype(np.int64)
+                for column in LIVE_COUNT_COLUMNS
+            }
+            self.watermark = int(delta['id'].max())
+
+    @staticmethod
+    def _as_counts(counts, column):
+        counts = counts.astype(np.int64)
+        if column == 'driver_age':
+            counts.index = counts.index.astype(float)
+        counts.index.name = None
+        counts.name = 'count'
+        return counts
+
+    def metrics(self):
+        """total_stops, arrests, searches, drug_stops, min_age and max_age as a Series."""
+        with self._lock:
+            totals = dict(self._totals)
+            ages = self._counts.get('driver_age')
+        ages = ages[ages > 0] if ages is not None else ages
+        has_ages = ages is not None and len(ages)
+        totals['min_age'] = ages.index.min() if has_ages else np.nan
+        totals['max_age'] = ages.index.max() if has_ages else np.nan
+        return pd.Series(totals)
+
+    def value_counts(self, column):
+        with self._lock:
+            counts = self._counts[column]
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    def age_histogram(self, bins=AGE_HISTOGRAM_BINS):
+        """(counts, edges) over driver_age, or None when no age is known.
+
+        Equal-width bins as in pandas' hist(), the last one closed on the right.
+        """
+        ages = self.value_counts('driver_age')
+        if ages.empty:
+            return None
+        min_age, max_age = ages.index.min(), ages.index.max()
+        width = (max_age - min_age) / bins if max_age > min_age else 1
+        bin_of = np.minimum(np.floor((ages.index.to_numpy() - min_age) / width), bins - 1)
+        counts = np.bincount(bin_of.astype(int), weights=ages.to_numpy(), minlength=bins).astype(np.int64)
+        edges = min_age + width * np.arange(bins + 1)
+        return counts, edges
@@ -0,0 +1,300 @@
+"""Versioned schema migrations for the traffic_stops table.
+
+Applied versions are recorded in the schema_migrations table, and every
+step checks the live schema first, so an interrupted run can be resumed
+by running the tool again.
+
+Usage:
+    python migrate.py                       # apply pending migrations
+    python migrate.py --status              # list applied and pending migrations
+    python migrate.py --extend-partitions   # add the coming months' partitions (monthly, from cron)
+"""
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from settings import DATABASE_URL
+
+BACKFILL_BATCH_SIZE = 50_000
+
+# Derived columns and the expression that computes each one from a row.
+# "{row}" is replaced by "NEW." inside triggers and by "" in UPDATEs.
+DERIVED_COLUMNS = {
+    'stop_hour': ("TINYINT UNSIGNED", "HOUR(CAST({row}stop_time AS TIME))"),
+    'stop_year': ("SMALLINT UNSIGNED", "YEAR(CAST({row}stop_date AS DATE))"),
+    'stop_month': ("TINYINT UNSIGNED", "MONTH(CAST({row}stop_date AS DATE))"),
+    'duration_minutes': (
+        "DECIMAL(10, 0)", "CAST(SUBSTRING_INDEX({row}stop_duration, ' ', 1) AS DECIMAL)"
+    ),
+    'age_group': ("VARCHAR(5)", """CASE
+            WHEN {row}driver_age IS NULL THEN NULL
+            WHEN {row}driver_age < 25 THEN '<25'
+            WHEN {row}driver_age < 35 THEN '25-34'
+            WHEN {row}driver_age < 45 THEN '35-44'
+            WHEN {row}driver_age < 55 THEN '45-54'
+            ELSE '55+'
+        END"""),
+}
+
+INDEXES = {
+    'idx_stops_year_month_hour': "stop_year, stop_month, stop_hour",
+    'idx_stops_hour_arrested': "stop_hour, is_arrested",
+    'idx_stops_year_country': "stop_year, country_name",
+    'idx_stops_violation_duration': "violation, duration_minutes",
+    'idx_stops_age_group_arrested': "age_group, is_arrested",
+    'idx_stops_driver_age': "driver_age",
+    'idx_stops_vehicle_number': "vehicle_number",
+    'idx_stops_stop_date': "stop_date",
+}
+
+# traffic_stops is range-partitioned by month of stop_date, with partitions
+# created this far ahead; later dates land in the overflow partition until
+# --extend-partitions splits it.
+PARTITION_MONTHS_AHEAD = 12
+OVERFLOW_PARTITION = 'pmax'
+
+
+def column_exists(conn, column):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+          AND column_name = :column
+    """), {'column': column}).scalar() > 0
+
+
+def index_exists(conn, index):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+          AND index_name = :index
+    """), {'index': index}).scalar() > 0
+
+
+def trigger_exists(conn, trigger):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.triggers
+        WHERE trigger_schema = DATABASE() AND trigger_name = :trigger
+    """), {'trigger': trigger}).scalar() > 0
+
+
+def column_type(conn, column):
+    return conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+          AND column_name = :column
+    """), {'column': column}).scalar()
+
+
+def index_columns(conn, index):
+    return [row[0] for row in conn.execute(text("""
+        SELECT column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+          AND index_name = :index
+        ORDER BY seq_in_index
+    """), {'index': index})]
+
+
+def partition_names(conn):
+    return [row[0] for row in conn.execute(text("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+          AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """))]
+
+
+def month_partition(month):
+    """Definition of the partition for month, a pandas Period."""
+    return f"PARTITION p{month.strftime('%Y%m')} VALUES LESS THAN ('{(month + 1).start_time:%Y-%m-%d}')"
+
+
+def months_until(first, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Months from first, a Period, to months_ahead months after the current one."""
+    return pd.period_range(first, pd.Timestamp.today().to_period('M') + months_ahead, freq='M')
+
+
+# ==================== MIGRATIONS ====================
+def add_derived_columns(engine):
+    with engine.connect() as conn:
+        for column, (column_type, _) in DERIVED_COLUMNS.items():
+            if not column_exists(conn, column):
+                conn.execute(text(f"ALTER TABLE traffic_stops ADD COLUMN {column} {column_type} NULL"))
+
+
+def add_derived_column_triggers(engine):
+    # Keeps the derived columns filled for every write path, including bulk loads.
+    assignments = ",\n            ".join(
+        f"NEW.{column} = {expression.format(row='NEW.')}"
+        for column, (_, expression) in DERIVED_COLUMNS.items()
+    )
+    with engine.connect() as conn:
+        for event in ("INSERT", "UPDATE"):
+            trigger = f"traffic_stops_derived_before_{event.lower()}"
+            if not trigger_exists(conn, trigger):
+                conn.execute(text(f"""
+                    CREATE TRIGGER {trigger} BEFORE {event} ON traffic_stops
+                    FOR EACH ROW SET
+                        {assignments}
+                """))
+
+
+def backfill_derived_columns(engine, batch_size=BACKFILL_BATCH_SIZE):
+    assignments = ", ".join(
+        f"{column} = {expression.format(row='')}"
+        for column, (_, expression) in DERIVED_COLUMNS.items()
+    )
+    with engine.connect() as conn:
+        min_id, max_id = conn.execute(text("SELECT MIN(id), MAX(id) FROM traffic_stops")).one()
+    if min_id is None:
+        return
+
+    started = time.perf_counter()
+    for batch_start in range(min_id, max_id + 1, batch_size):
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                UPDATE traffic_stops SET {assignments}
+                WHERE id BETWEEN :start AND :end
+            """), {'start': batch_start, 'end': batch_start + batch_size - 1})
+        done = min(batch_start + batch_size - 1, max_id) - min_id + 1
+        print(f"  backfilled ids up to {batch_start + batch_size - 1} "
+              f"({done / (max_id - min_id + 1):.0%}, {time.perf_counter() - started:.1f}s)")
+
+
+def add_case_key(engine):
+    # Idempotency key of cases queued by the Register New Case form; see write_queue.py.
+    with engine.connect() as conn:
+        if not column_exists(conn, 'case_key'):
+            conn.execute(text("ALTER TABLE traffic_stops ADD COLUMN case_key CHAR(36) NULL"))
+        if not index_exists(conn, 'uq_stops_case_key'):
+            conn.execute(text("CREATE UNIQUE INDEX uq_stops_case_key ON traffic_stops (case_key)"))
+
+
+def add_indexes(engine):
+    with engine.connect() as conn:
+        for index, columns in INDEXES.items():
+            if not index_exists(conn, index):
+                conn.execute(text(f"CREATE INDEX {index} ON traffic_stops ({columns})"))
+
+
+def partition_by_month(engine):
+    """Range-partition traffic_stops by month of stop_date.
+
+    Queries with a stop_date range then read only the months in range,
+    which EXPLAIN shows in its partitions column. MySQL requires the
+    partitioning column in every unique key, so the primary key becomes
+    (id, stop_date) and the case_key index (case_key, stop_date); a case
+    is always written with the same date, so retried cases are still
+    caught. stop_date becomes a NOT NULL DATE first. Each step rebuilds
+    the table, which takes a while on a large one.
+    """
+    with engine.connect() as conn:
+        if partition_names(conn):
+            return
+        undated = conn.execute(text("SELECT COUNT(*) FROM traffic_stops WHERE stop_date IS NULL")).scalar()
+        if undated:
+            raise RuntimeError(f"{undated:,} rows have no stop_date; date or delete them, then run again")
+        if column_type(conn, 'stop_date') != 'date':
+            conn.execute(text("ALTER TABLE traffic_stops MODIFY stop_date DATE NOT NULL"))
+        if index_columns(conn, 'PRIMARY') != ['id', 'stop_date']:
+            conn.execute(text("ALTER TABLE traffic_stops DROP PRIMARY KEY, ADD PRIMARY KEY (id, stop_date)"))
+        if index_columns(conn, 'uq_stops_case_key') != ['case_key', 'stop_date']:
+            conn.execute(text("""
+                ALTER TABLE traffic_stops DROP INDEX uq_stops_case_key,
+                    ADD UNIQUE INDEX uq_stops_case_key (case_key, stop_date)
+            """))
+        first = conn.execute(text("SELECT MIN(stop_date) FROM traffic_stops")).scalar()
+        first = pd.Timestamp(first if first is not None else 'today').to_period('M')
+        partitions = [month_partition(month) for month in months_until(first)]
+        partitions.append(f"PARTITION {OVERFLOW_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        conn.execute(text(f"""
+            ALTER TABLE traffic_stops PARTITION BY RANGE COLUMNS (stop_date) (
+                {", ".join(partitions)}
+            )
+        """))
+
+
+def extend_month_partitions(engine, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Split the overflow partition so months up to months_ahead ahead get their own.
+
+    Returns the number of partitions added.
+    """
+    with engine.connect() as conn:
+        monthly = [name for name in partition_names(conn) if name != OVERFLOW_PARTITION]
+        if not monthly:
+            return 0
+        next_month = pd.Period(monthly[-1][1:], freq='M') + 1
+        months = months_until(next_month, months_ahead)
+        if months.empty:
+            return 0
+        partitions = [month_partition(month) for month in months]
+        partitions.append(f"PARTITION {OVERFLOW_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        conn.execute(text(f"""
+            ALTER TABLE traffic_stops REORGANIZE PARTITION {OVERFLOW_PARTITION} INTO (
+                {", ".join(partitions)}
+            )
+        """))
+    return len(months)
+
+
+MIGRATIONS = [
+    (1, "Add stop_hour, stop_year, stop_month, duration_minutes, age_group", add_derived_columns),
+    (2, "Fill derived columns on insert and update", add_derived_column_triggers),
+    (3, "Backfill derived columns in batches", backfill_derived_columns),
+    (4, "Index derived and filter columns", add_indexes),
+    (5, "Add case_key idempotency column for queued cases", add_case_key),
+    (6, "Index stop_date for date windows", add_indexes),
+    (7, "Partition traffic_stops by month of stop_date", partition_by_month),
+]
+
+
+# ==================== RUNNER ====================
+def applied_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine):
+    applied = applied_versions(engine)
+    for version, description, apply in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying {version}: {description}")
+        started = time.perf_counter()
+        apply(engine)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"
+            ), {'version': version, 'description': description})
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', action='store_true', help="show migration status and exit")
+    parser.add_argument('--extend-partitions', action='store_true',
+                        help=f"add monthly partitions up to {PARTITION_MONTHS_AHEAD} months ahead and exit")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    if args.extend_partitions:
+        print(f"Added {extend_month_partitions(engine)} monthly partitions")
+    elif args.status:
+        applied = applied_versions(engine)
+        for version, description, _ in MIGRATIONS:
+            state = "applied" if version in applied else "pending"
+            print(f"{version:>3}  {state:<8} {description}")
+    else:
+        migrate(engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Per-vehicle and per-driver profile tables maintained from an id watermark.
+
+Each profile holds stop, arrest, search and drug-related stop counts, the
+first and last stop dates and the most frequent violation for one key: a
+normalized plate for vehicles, and (country, gender, race, age group) for
+drivers. Profiles are folded forward from the rows above the watermark like
+the vehicle index, so inserts and bulk imports from any process are picked
+up by refresh(), and rebuild() recomputes them from scratch, as refresh()
+also does in the background every reconcile_seconds to pick up rows
+committed out of id order. A profile is a
+dictionary lookup, which is what makes the repeat-offender view affordable.
+Profiles over a date window only read the stops dated within it.
+"""
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from query_catalog import LIVE_WATERMARK_QUERY, windowed
+from vehicle_index import normalize_plate
+
+PROFILE_CHUNK_SIZE = 100_000
+PROFILE_COUNTS = ('stops', 'arrests', 'searches', 'drug_stops')
+PROFILE_FIELDS = PROFILE_COUNTS + ('first_stop', 'last_stop', 'top_violation')
+DRIVER_KEY_COLUMNS = ('country_name', 'driver_gender', 'driver_race', 'age_group')
+# The age_group buckets migrate.py derives in the database.
+AGE_GROUP_BINS = [-np.inf, 25, 35, 45, 55, np.inf]
+AGE_GROUP_LABELS = ['<25', '25-34', '35-44', '45-54', '55+']
+UNKNOWN = 'Unknown'
+RECONCILE_SECONDS = 10 * 60
+
+PROFILE_LOAD_QUERY = """
+    SELECT id, stop_date, vehicle_number, country_name, driver_gender, driver_race, driver_age,
+           violation, is_arrested, search_conducted, drugs_related_stop
+    FROM traffic_stops
+    WHERE id > :after_id AND id <= :until_id
+    ORDER BY id
+"""
+
+
+class ProfileTable:
+    """Profiles keyed by one or more columns of a prepared frame.
+
+    An entry is [stops, arrests, searches, drug_stops, first_stop,
+    last_stop, top_violation, violation counts]. The most frequent
+    violation is kept current as counts grow; ties go to the name that
+    sorts first, so a rebuild gives the same answer as incremental updates.
+    """
+
+    def __init__(self, key_columns):
+        self.key_columns = list(key_columns)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fold(self, frame):
+        """Fold rows with the key columns, stop_date, violation and the count columns in."""
+        if frame.empty:
+            return
+        keys = self.key_columns[0] if len(self.key_columns) == 1 else self.key_columns
+        grouped = frame.groupby(keys, sort=False).agg(
+            stops=('arrests', 'size'), arrests=('arrests', 'sum'), searches=('searches', 'sum'),
+            drug_stops=('drug_stops', 'sum'), first_stop=('stop_date', 'min'), last_stop=('stop_date', 'max'),
+        )
+        violations = frame.dropna(subset=['violation']).groupby(
+            self.key_columns + ['violation'], sort=False).size()
+        for key, stops, arrests, searches, drug_stops, first_stop, last_stop in grouped.itertuples():
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [0, 0, 0, 0, pd.NaT, pd.NaT, None, Counter()]
+            entry[0] += int(stops)
+            entry[1] += int(arrests)
+            entry[2] += int(searches)
+            entry[3] += int(drug_stops)
+            if pd.notna(first_stop) and (pd.isna(entry[4]) or first_stop < entry[4]):
+                entry[4] = first_stop
+            if pd.notna(last_stop) and (pd.isna(entry[5]) or last_stop > entry[5]):
+                entry[5] = last_stop
+        for group, count in violations.items():
+            *key, violation = group
+            entry = self._entries[key[0] if len(key) == 1 else tuple(key)]
+            counts = entry[7]
+            counts[violation] += int(count)
+            top = entry[6]
+            if top is None or counts[violation] > counts[top] or \
+                    (counts[violation] == counts[top] and violation < top):
+                entry[6] = violation
+
+    def get(self, key):
+        """The profile for key as a dict, or None if the key has no stops."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return dict(zip(PROFILE_FIELDS, entry[:len(PROFILE_FIELDS)]))
+
+    def combine(self, keys):
+        """One profile over several keys, e.g. every plate a search matched."""
+        entries = [self._entries[key] for key in keys if key in self._entries]
+        if not entries:
+            return None
+        violations = Counter()
+        for entry in entries:
+            violations.update(entry[7])
+        first_stops = [entry[4] for entry in entries if pd.notna(entry[4])]
+        last_stops = [entry[5] for entry in entries if pd.notna(entry[5])]
+        profile = {name: sum(entry[i] for entry in entries) for i, name in enumerate(PROFILE_COUNTS)}
+        profile['first_stop'] = min(first_stops) if first_stops else pd.NaT
+        profile['last_stop'] = max(last_stops) if last_stops else pd.NaT
+        profile['top_violation'] = min(violations, key=lambda v: (-violations[v], v)) if violations else None
+        return profile
+
+    def frame(self):
+        """Every profile as a DataFrame with the key columns first."""
+        index = list(self._entries)
+        result = pd.DataFrame([entry[:len(PROFILE_FIELDS)] for entry in self._entries.values()],
+                              columns=list(PROFILE_FIELDS))
+        if len(self.key_columns) == 1:
+            result.insert(0, self.key_columns[0], index)
+        else:
+            keys = pd.DataFrame(index, columns=self.key_columns)
+            result = pd.concat([keys, result], axis=1)
+        for column in PROFILE_COUNTS:
+            result[column] = result[column].astype(np.int64)
+        return result
+
+
+class StopProfiles:
+    """The vehicle and driver profile tables, kept current from traffic_stops.
+
+    With a window, a (first, last) pair of ISO dates, only stops dated
+    within it are profiled.
+    """
+
+    def __init__(self, engine, window=None, reconcile_seconds=RECONCILE_SECONDS):
+        self.engine = engine
+        self.window = window
+        self.reconcile_seconds = reconcile_seconds
+        self.max_id = 0
+        self.loaded_at = time.monotonic()
+        self.vehicles = ProfileTable(['vehicle'])
+        self.drivers = ProfileTable(DRIVER_KEY_COLUMNS)
+        # Frames built from every profile stay valid until the next fold or reset.
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def prepare(df):
+        """The columns both tables fold, derived from traffic_stops rows."""
+        frame = pd.DataFrame({
+            'stop_date': pd.to_datetime(df['stop_date'], errors='coerce'),
+            'violation': df['violation'],
+            'arrests': pd.to_numeric(df['is_arrested'], errors='coerce').fillna(0).astype(np.int64),
+            'searches': pd.to_numeric(df['search_conducted'], errors='coerce').fillna(0).astype(np.int64),
+            'drug_stops': pd.to_numeric(df['drugs_related_stop'], errors='coerce').fillna(0).astype(np.int64),
+        })
+        frame['vehicle'] = df['vehicle_number'].map(normalize_plate, na_action='ignore')
+        ages = pd.to_numeric(df['driver_age'], errors='coerce')
+        frame['age_group'] = pd.cut(ages, AGE_GROUP_BINS, right=False, labels=AGE_GROUP_LABELS) \
+            .astype(object).where(ages.notna(), UNKNOWN)
+        for column in DRIVER_KEY_COLUMNS[:-1]:
+            frame[column] = df[column].where(df[column].notna(), UNKNOWN)
+        return frame
+
+    def add_frame(self, df):
+        if df.empty:
+            return
+        frame = self.prepare(df)
+        with self._lock:
+            self.vehicles.fold(frame[frame['vehicle'].notna() & (frame['vehicle'] != '')])
+            self.drivers.fold(frame)
+            self.max_id = max(self.max_id, int(df['id'].max()))
+            self._frames = {}
+
+    def load(self, after_id=0, until_id=None):
+        """Fold in the rows with after_id < id <= until_id, by default up to the current MAX(id)."""
+        with self.engine.connect() as conn:
+            if until_id is None:
+                until_id = conn.execute(text(LIVE_WATERMARK_QUERY)).scalar() or 0
+            query, params = windowed(PROFILE_LOAD_QUERY, {'after_id': after_id, 'until_id': until_id},
+                                     self.window)
+            for chunk in pd.read_sql(text(query), conn, params=params, chunksize=PROFILE_CHUNK_SIZE):
+                self.add_frame(chunk)
+        # Rows outside the window up to until_id were read past, so later
+        # refreshes start after them rather than after the last one profiled.
+        with self._lock:
+            self.max_id = max(self.max_id, int(until_id))
+
+    def refresh(self, latest_id):
+        """Pick up rows inserted since the last refresh, by this or any other process.
+
+        Returns at once while another thread refreshes. Once the profiles are
+        reconcile_seconds old, or the table shrank, they are rebuilt in the
+        background instead.
+        """
+        if latest_id is None:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        # The table shrank, or it is time to pick up rows committed out of id order.
+        if latest_id < self.max_id or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+            threading.Thread(target=self._reconcile, name="stop-profiles-reconcile", daemon=True).start()
+            return
+        try:
+            if latest_id > self.max_id:
+                self.load(after_id=self.max_id, until_id=latest_id)
+        finally:
+            self._refresh_lock.release()
+
+    def _reconcile(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    def rebuild(self):
+        """Recompute every profile from scratch, e.g. after rows were updated or deleted."""
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Built aside and swapped in, so lookups keep the old profiles meanwhile.
+        fresh = StopProfiles(self.engine, self.window, self.reconcile_seconds)
+        fresh.load()
+        with self._lock:
+            self.max_id = fresh.max_id
+            self.vehicles = fresh.vehicles
+            self.drivers = fresh.drivers
+            self._frames = {}
+            self.loaded_at = time.monotonic()
+
+    def vehicle(self, plates):
+        """Profile over the given normalized plates, or None if none has a stop."""
+        with self._lock:
+            return self.vehicles.combine(plates)
+
+    def driver(self, country, gender, race, age_group):
+        with self._lock:
+            return self.drivers.get((country, gender, race, age_group))
+
+    def _frame(self, name):
+        with self._lock:
+            result = self._frames.get(name)
+            if result is None:
+                result = self._frames[name] = getattr(self, name).frame()
+        return result
+
+    def repeat_offenders(self, min_stops=2, sort_by='stops', limit=100):
+        """Vehicles with at least min_stops stops, most by sort_by first."""
+        profiles = self._frame('vehicles')
+        offenders = profiles[profiles['stops'] >= min_stops]
+        return offenders.nlargest(limit, [sort_by, 'stops']).reset_index(drop=True)
+
+    def driver_profiles(self, gender=None):
+        """Driver profiles, optionally for one gender, largest groups first."""
+        profiles = self._frame('drivers')
+        if gender is not None:
+            profiles = profiles[profiles['driver_gender'] == gender]
+        return profiles.sort_values('stops', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,395 @@
+"""SQL used by the dashboard pages and the canned query catalogs.
+
+Nothing here imports Streamlit, so the benchmark suite and the command-line
+tools can share the exact statements the app runs.
+"""
+import re
+
+# ==================== DATE WINDOW ====================
+# Every page can be restricted to stops dated within a window, a (first, last)
+# pair of ISO dates, both included. windowed() swaps traffic_stops for a
+# derived table with the date predicate; MySQL, DuckDB and SQLite all merge
+# it into the outer query, so the predicate reaches the scan and prunes the
+# month partitions outside the window (see migrate.py and snapshot.py).
+WINDOW_PREDICATE = "stop_date BETWEEN :date_from AND :date_to"
+FROM_TRAFFIC_STOPS = re.compile(r'\bFROM traffic_stops\b')
+
+
+def windowed(query, params=None, window=None, predicate=WINDOW_PREDICATE):
+    """Return (query, params) restricted to window, or unchanged when window is None."""
+    if window is None:
+        return query, params
+    table = f"FROM (SELECT * FROM traffic_stops WHERE {predicate}) AS traffic_stops"
+    return FROM_TRAFFIC_STOPS.sub(table, query), dict(params or {}, date_from=window[0], date_to=window[1])
+
+
+# ==================== PAGE QUERIES ====================
+# Dashboard figures are kept current from an id watermark (see live_aggregates.py):
+# totals and value counts up to the watermark, then only the rows after it.
+AGE_HISTOGRAM_BINS = 30
+LIVE_SUM_COLUMNS = {'arrests': 'is_arrested', 'searches': 'search_conducted', 'drug_stops': 'drugs_related_stop'}
+LIVE_COUNT_COLUMNS = ('country_name', 'driver_gender', 'stop_outcome', 'driver_age')
+
+LIVE_WATERMARK_QUERY = "SELECT MAX(id) AS max_id FROM traffic_stops"
+
+LIVE_TOTALS_QUERY = """
+    SELECT COUNT(*) AS total_stops,
+           COALESCE(SUM(is_arrested), 0) AS arrests,
+           COALESCE(SUM(search_conducted), 0) AS searches,
+           COALESCE(SUM(drugs_related_stop), 0) AS drug_stops
+    FROM traffic_stops
+    WHERE id <= :watermark
+"""
+
+LIVE_DELTA_QUERY = """
+    SELECT id, is_arrested, search_conducted, drugs_related_stop,
+           country_name, driver_gender, stop_outcome, driver_age
+    FROM traffic_stops
+    WHERE id > :after_id
+    ORDER BY id
+    LIMIT :limit
+"""
+
+def live_counts_query(column):
+    if column not in LIVE_COUNT_COLUMNS:
+        raise ValueError(f"Unsupported column: {column}")
+    return f"""
+        SELECT {column} AS value, COUNT(*) AS count
+        FROM traffic_stops
+        WHERE id <= :watermark AND {column} IS NOT NULL
+        GROUP BY {column}
+    """
+
+
+# Filter dropdowns come from counts of every combination of the facet
+# columns, kept current from the same id watermark (see facets.py).
+FACET_COLUMNS = ('search_conducted', 'search_type', 'country_name', 'violation', 'driver_gender', 'driver_age')
+
+FACET_COUNTS_QUERY = f"""
+    SELECT {', '.join(FACET_COLUMNS)}, COUNT(*) AS count
+    FROM traffic_stops
+    WHERE id <= :watermark
+    GROUP BY {', '.join(FACET_COLUMNS)}
+"""
+
+FACET_DELTA_QUERY = f"""
+    SELECT id, {', '.join(FACET_COLUMNS)}
+    FROM traffic_stops
+    WHERE id > :after_id
+    ORDER BY id
+    LIMIT :limit
+"""
+
+# Filters become parameterized WHERE clauses and rows are read one page at a
+# time with keyset pagination on the primary key, never the whole table.
+PAGE_SIZE = 100
+
+
+def build_where_clause(equals=None, between=None, extra=None, window=None):
+    clauses = list(extra or [])
+    params = {}
+    if window is not None:
+        clauses.append(WINDOW_PREDICATE)
+        params.update(date_from=window[0], date_to=window[1])
+    for column, value in (equals or {}).items():
+        clauses.append(f"{column} = :{column}")
+        params[column] = value
+    for column, (low, high) in (between or {}).items():
+        clauses.append(f"{column} BETWEEN :{column}_min AND :{column}_max")
+        params[f"{column}_min"] = low
+        params[f"{column}_max"] = high
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+def filtered_summary_query(where):
+    return f"""
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(is_arrested), 0) AS arrests,
+               COALESCE(SUM(search_conducted), 0) AS searches,
+               AVG(driver_age) AS avg_age
+        FROM traffic_stops
+        {where}
+    """
+
+
+def page_query(where, params, after_id=None, page_size=PAGE_SIZE):
+    """Return (query, params) for the page of rows after after_id."""
+    params = dict(params, limit=page_size)
+    if after_id is not None:
+        where = f"{where} AND id > :after_id" if where else "WHERE id > :after_id"
+        params['after_id'] = after_id
+    return f"SELECT * FROM traffic_stops {where} ORDER BY id LIMIT :limit", params
+
+
+# ==================== MEDIUM LEVEL QUERIES ====================
+# The catalogs also run on DuckDB and SQLite (see analytics.py), so they stick
+# to shared syntax: rates multiply by 100.0 first so no dialect truncates them.
+MEDIUM_QUERIES = {
+    "Top 10 Vehicles in Drug-Related Stops": """
+        SELECT vehicle_number, COUNT(*) as stop_count
+        FROM traffic_stops
+        WHERE drugs_related_stop = 1 AND vehicle_number IS NOT NULL
+        GROUP BY vehicle_number
+        ORDER BY stop_count DESC
+        LIMIT 10;
+    """,
+
+    "Most Frequently Searched Vehicles": """
+        SELECT vehicle_number, COUNT(*) as search_count
+        FROM traffic_stops
+        WHERE search_conducted = 1 AND vehicle_number IS NOT NULL
+        GROUP BY vehicle_number
+        ORDER BY search_count DESC
+        LIMIT 15;
+    """,
+
+    "Age Group with Highest Arrest Rate": """
+        SELECT
+            age_group,
+            COUNT(*) as total_stops,
+            SUM(is_arrested) as arrests,
+            ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate
+        FROM traffic_stops
+        WHERE age_group IS NOT NULL
+        GROUP BY age_group
+        ORDER BY arrest_rate DESC;
+    """,
+
+    "Gender Distribution by Country": """
+        SELECT country_name, driver_gender, COUNT(*) as count
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL AND driver_gender IS NOT NULL
+        GROUP BY country_name, driver_gender
+        ORDER BY country_name, count DESC;
+    """,
+
+    "Race & Gender Combination - Highest Search Rate": """
+        SELECT
+            driver_race, driver_gender,
+            COUNT(*) as total_stops,
+            SUM(search_conducted) as searches,
+            ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) as search_rate
+        FROM traffic_stops
+        WHERE driver_race IS NOT NULL AND driver_gender IS NOT NULL
+        GROUP BY driver_race, driver_gender
+        HAVING total_stops >= 5
+        ORDER BY search_rate DESC
+        LIMIT 10;
+    """,
+
+    "Most Traffic Stops by Time of Day": """
+        SELECT
+            CASE
+                WHEN stop_hour >= 6 AND stop_hour < 12 THEN 'Morning (6AM-12PM)'
+                WHEN stop_hour >= 12 AND stop_hour < 18 THEN 'Afternoon (12PM-6PM)'
+                WHEN stop_hour >= 18 AND stop_hour < 24 THEN 'Evening (6PM-12AM)'
+                ELSE 'Night (12AM-6AM)'
+            END as time_period,
+            COUNT(*) as stops
+        FROM traffic_stops
+        WHERE stop_hour IS NOT NULL
+        GROUP BY time_period
+        ORDER BY stops DESC;
+    """,
+
+    "Average Stop Duration by Violation": """
+        SELECT violation, COUNT(*) as stop_count,
+               ROUND(AVG(duration_minutes), 2) as avg_duration_mins
+        FROM traffic_stops
+        WHERE violation IS NOT NULL AND duration_minutes IS NOT NULL
+        GROUP BY violation
+        ORDER BY avg_duration_mins DESC
+        LIMIT 15;
+    """,
+
+    "Night Stops vs Arrests": """
+        SELECT
+            CASE
+                WHEN stop_hour >= 20 OR stop_hour < 6 THEN 'Night (8PM-6AM)'
+                ELSE 'Day (6AM-8PM)'
+            END as period,
+            COUNT(*) as total_stops,
+            SUM(is_arrested) as arrests,
+            ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate
+        FROM traffic_stops
+        WHERE stop_hour IS NOT NULL
+        GROUP BY period
+        ORDER BY arrest_rate DESC;
+    """,
+
+    "Violations Associated with Searches/Arrests": """
+        SELECT violation,
+               COUNT(*) as total_stops,
+               SUM(search_conducted) as search_count,
+               SUM(is_arrested) as arrest_count,
+               ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) as search_rate,
+               ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate
+        FROM traffic_stops
+        WHERE violation IS NOT NULL
+        GROUP BY violation
+        ORDER BY search_rate DESC
+        LIMIT 15;
+    """,
+
+    "Most Common Violations Among Younger Drivers (<25)": """
+        SELECT violation, COUNT(*) as violation_count
+        FROM traffic_stops
+        WHERE driver_age < 25 AND violation IS NOT NULL
+        GROUP BY violation
+        ORDER BY violation_count DESC
+        LIMIT 10;
+    """,
+
+    "Violations Rarely Resulting in Search/Arrest": """
+        SELECT violation,
+               COUNT(*) as total_stops,
+               SUM(search_conducted) as searches,
+               SUM(is_arrested) as arrests,
+               ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) as search_rate,
+               ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate
+        FROM traffic_stops
+        WHERE violation IS NOT NULL
+        GROUP BY violation
+        HAVING searches = 0 AND arrests = 0
+        ORDER BY total_stops DESC;
+    """,
+
+    "Countries with Highest Drug-Related Stops Rate": """
+        SELECT country_name,
+               COUNT(*) as total_stops,
+               SUM(drugs_related_stop) as drug_stops,
+               ROUND(100.0 * SUM(drugs_related_stop) / COUNT(*), 2) as drug_stop_rate
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL
+        GROUP BY country_name
+        ORDER BY drug_stop_rate DESC;
+    """,
+
+    "Arrest Rate by Country and Violation": """
+        SELECT country_name, violation,
+               COUNT(*) as total_stops,
+               SUM(is_arrested) as arrests,
+               ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL AND violation IS NOT NULL
+        GROUP BY country_name, violation
+        HAVING total_stops >= 3
+        ORDER BY arrest_rate DESC
+        LIMIT 20;
+    """,
+
+    "Country with Most Stops - Search Conducted": """
+        SELECT country_name,
+               COUNT(*) as total_stops,
+               SUM(search_conducted) as searches_conducted,
+               ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) as search_rate
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL
+        GROUP BY country_name
+        ORDER BY searches_conducted DESC;
+    """
+}
+
+
+# Catalog queries the heavy-hitter sketches can answer: (flag, k); see heavy_hitters.py.
+HEAVY_HITTER_QUERIES = {
+    "Top 10 Vehicles in Drug-Related Stops": ('drugs_related_stop', 10),
+    "Most Frequently Searched Vehicles": ('search_conducted', 15),
+}
+
+
+# ==================== COMPLEX LEVEL QUERIES ====================
+COMPLEX_QUERIES = {
+    "Yearly Breakdown of Stops and Arrests by Country": """
+        SELECT
+            stop_year as year,
+            country_name,
+            COUNT(*) as total_stops,
+            SUM(is_arrested) as total_arrests,
+            ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate,
+            RANK() OVER (PARTITION BY stop_year ORDER BY COUNT(*) DESC) as rank_by_stops
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL AND stop_year IS NOT NULL
+        GROUP BY year, country_name
+        ORDER BY year DESC, total_stops DESC;
+    """,
+
+    "Driver Violation Trends - Age and Race": """
+        SELECT
+            driver_race,
+            age_group,
+            violation,
+            COUNT(*) as violation_count,
+            SUM(is_arrested) as arrests,
+            ROW_NUMBER() OVER (PARTITION BY driver_race ORDER BY COUNT(*) DESC) as violation_rank
+        FROM traffic_stops
+        WHERE driver_race IS NOT NULL AND age_group IS NOT NULL AND violation IS NOT NULL
+        GROUP BY driver_race, age_group, violation
+        ORDER BY driver_race, violation_count DESC;
+    """,
+
+    "Time Period Analysis - Stops by Year, Month, Hour": """
+        SELECT
+            stop_year as year,
+            stop_month as month,
+            stop_hour as hour_of_day,
+            COUNT(*) as stops,
+            SUM(is_arrested) as arrests,
+            ROUND(AVG(driver_age), 1) as avg_driver_age
+        FROM traffic_stops
+        WHERE stop_year IS NOT NULL AND stop_hour IS NOT NULL
+        GROUP BY year, month, hour_of_day
+        ORDER BY year DESC, month DESC, hour_of_day;
+    """,
+
+    "Violations with High Search and Arrest Rates": """
+        SELECT
+            violation,
+            COUNT(*) as total_stops,
+            SUM(search_conducted) as searches,
+            SUM(is_arrested) as arrests,
+            ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) as search_rate,
+            ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate,
+            RANK() OVER (ORDER BY 1.0 * SUM(search_conducted) / COUNT(*) DESC) as search_rank,
+            RANK() OVER (ORDER BY 1.0 * SUM(is_arrested) / COUNT(*) DESC) as arrest_rank
+        FROM traffic_stops
+        WHERE violation IS NOT NULL
+        GROUP BY violation
+        HAVING total_stops >= 5
+        ORDER BY search_rate DESC, arrest_rate DESC;
+    """,
+
+    "Driver Demographics by Country": """
+        SELECT
+            country_name,
+            driver_race,
+            driver_gender,
+            COUNT(*) as driver_count,
+            ROUND(AVG(driver_age), 1) as avg_age,
+            MIN(driver_age) as min_age,
+            MAX(driver_age) as max_age,
+            SUM(is_arrested) as total_arrests,
+            ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY country_name), 2) as pct_by_country
+        FROM traffic_stops
+        WHERE country_name IS NOT NULL AND driver_race IS NOT NULL AND driver_gender IS NOT NULL
+        GROUP BY country_name, driver_race, driver_gender
+        ORDER BY country_name, pct_by_country DESC;
+    """,
+
+    "Top 5 Violations with Highest Arrest Rates": """
+        SELECT
+            violation,
+            COUNT(*) as total_stops,
+            SUM(is_arrested) as arrests,
+            ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) as arrest_rate,
+            RANK() OVER (ORDER BY ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) DESC) as rank
+        FROM traffic_stops
+        WHERE violation IS NOT NULL
+        GROUP BY violation
+        HAVING COUNT(*) >= 5
+        ORDER BY arrest_rate DESC
+        LIMIT 5;
+    """
+}
+
@@ -0,0 +1,78 @@
+"""Concurrent execution of independent queries over the shared engine pool.
+
+Page latency for a set of independent queries approaches the slowest one
+instead of their sum. Time spent waiting for a pooled connection is
+recorded so pool saturation shows up in the UI.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from settings import QUERY_WORKERS
+
+WAIT_SAMPLES = 1_000
+
+
+@dataclass
+class QueryOutcome:
+    result: Any = None
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+
+
+class QueryExecutor:
+    def __init__(self, engine, max_workers=QUERY_WORKERS):
+        self.engine = engine
+        self.max_workers = max_workers
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query')
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self):
+        """engine.connect() that records how long the pool made us wait."""
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            with self._lock:
+                self._waits.append(time.perf_counter() - started)
+            yield conn
+
+    def run_all(self, run, jobs):
+        """Run run(*args) for every {name: args} job concurrently.
+
+        Returns {name: QueryOutcome} in the order of jobs; a failing job
+        records its exception instead of raising.
+        """
+        def timed(args):
+            started = time.perf_counter()
+            try:
+                return QueryOutcome(result=run(*args), seconds=time.perf_counter() - started)
+            except Exception as e:
+                return QueryOutcome(error=e, seconds=time.perf_counter() - started)
+
+        # Each job runs in a copy of the caller's context so context variables,
+        # such as the instrumentation origin, carry over to the worker thread.
+        futures = {
+            name: self._threads.submit(contextvars.copy_context().run, timed, args)
+            for name, args in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def pool_status(self):
+        pool = self.engine.pool
+        with self._lock:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'wait_p50_ms': float(np.percentile(waits, 50) * 1000),
+            'wait_p95_ms': float(np.percentile(waits, 95) * 1000),
+        }
@@ -0,0 +1,278 @@
+"""Cross-process cache of DataFrames for dashboards running several workers.
+
+Each Streamlit worker process keeps its own result cache and its own copy of
+the snapshot, so memory on a node grows with data size times workers. With
+TRAFFIC_SHARED_CACHE=directory, results and snapshot frames are also written
+once as uncompressed Arrow IPC files to a directory every worker on the node
+opens (under /dev/shm where it exists, i.e. shared memory). Readers
+memory-map an entry instead of copying it: the operating system keeps one
+copy of its pages however many workers map it, and numeric, date and string
+columns and categorical codes are used in place. Only what pandas cannot
+borrow, such as the values of categorical dictionaries, is private to each
+worker.
+
+Keys carry a generation token read from the same directory; bump_generation()
+replaces it, so one worker's write invalidates every worker's entries at
+once. Entries are evicted least recently read first beyond a byte budget.
+The directory is one implementation of a small key-value interface (get an
+entry as a readable Arrow source, put one through a writer callback); a
+networked store can stand in for it, see make_shared_cache.
+
+Usage:
+    python shared_cache.py           # show what the shared cache holds
+    python shared_cache.py --clear   # invalidate every worker's entries
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+import pandas as pd
+
+from settings import DATABASE_URL, SHARED_CACHE
+
+SHARED_CACHES = ('off', 'directory')
+SHARED_CACHE_MAX_BYTES = int(os.environ.get('TRAFFIC_SHARED_CACHE_MAX_MB', 1024)) * 1024 * 1024
+ENTRY_SUFFIX = '.arrow'
+GENERATION_NAME = 'GENERATION'
+# DataFrame.attrs travel in the schema metadata; Series values as mappings.
+ATTRS_METADATA_KEY = b'traffic_cache.attrs'
+
+
+def default_cache_dir(database_url=DATABASE_URL):
+    """Shared memory where the node has it, one directory per database."""
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha1(database_url.encode()).hexdigest()[:12]
+    return os.path.join(root, f"traffic_cache-{digest}")
+
+
+SHARED_CACHE_DIR = os.environ.get('TRAFFIC_SHARED_CACHE_DIR') or default_cache_dir()
+
+
+class DirectoryStore:
+    """Entries as files in one directory, the local stand-in for a shared key-value store.
+
+    Entries are written to a temporary file and renamed into place, so a
+    reader sees a whole entry or none. Removing an entry a worker has mapped
+    is safe: its pages stay valid until that worker lets go of them.
+    """
+
+    name = 'directory'
+
+    def __init__(self, path=SHARED_CACHE_DIR, max_bytes=SHARED_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """The entry memory-mapped as an Arrow source, or None."""
+        import pyarrow as pa
+        path = self._entry_path(key)
+        try:
+            source = pa.memory_map(path)
+        except FileNotFoundError:
+            return None
+        try:
+            # The modification time orders entries for eviction.
+            os.utime(path)
+        except OSError:
+            pass
+        return source
+
+    def put(self, key, write):
+        """Store the entry write(sink) produces; False if it could not be stored."""
+        import pyarrow as pa
+        tmp_path = os.path.join(self.path, f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                write(sink)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            # Out of space, or an entry still mapped on a platform that cannot replace it.
+            self._remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def delete(self, key):
+        self._remove(self._entry_path(key))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """(mtime, bytes, path) of every entry, least recently read first."""
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(ENTRY_SUFFIX) and not entry.name.startswith('.'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def generation(self):
+        try:
+            with open(os.path.join(self.path, GENERATION_NAME)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return '0'
+
+    def bump_generation(self):
+        """Replace the generation token and drop every entry."""
+        tmp_path = os.path.join(self.path, f".{GENERATION_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, os.path.join(self.path, GENERATION_NAME))
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'path': self.path}
+
+
+def encode_attrs(attrs):
+    series = {name: value.to_dict() for name, value in attrs.items() if isinstance(value, pd.Series)}
+    values = {name: value for name, value in attrs.items() if not isinstance(value, pd.Series)}
+    return json.dumps({'series': series, 'values': values}, default=str).encode()
+
+
+def decode_attrs(raw):
+    attrs = json.loads(raw)
+    result = dict(attrs['values'])
+    result.update({name: pd.Series(value) for name, value in attrs['series'].items()})
+    return result
+
+
+class SharedFrameCache:
+    """DataFrames by key in a store shared by every worker on the node.
+
+    Keys are any value with a stable repr, e.g. the result cache's keys;
+    the store's generation is part of every key. Frames read back are
+    backed by the mapped entry and must not be mutated.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def name(self):
+        return self.store.name
+
+    def _store_key(self, key):
+        return hashlib.sha1(repr((self.store.generation(), key)).encode()).hexdigest()
+
+    def generation(self):
+        return self.store.generation()
+
+    def bump_generation(self):
+        self.store.bump_generation()
+
+    def get(self, key):
+        """The frame stored under key, or None."""
+        import pyarrow as pa
+        source = self.store.get(self._store_key(key))
+        if source is None:
+            self.misses += 1
+            return None
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            self.misses += 1
+            return None
+        # One block per column, so pandas borrows each column instead of consolidating copies.
+        frame = table.to_pandas(split_blocks=True)
+        metadata = table.schema.metadata or {}
+        if ATTRS_METADATA_KEY in metadata:
+            frame.attrs = decode_attrs(metadata[ATTRS_METADATA_KEY])
+        self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        """Store frame under key; False if it cannot be stored, e.g. a column Arrow cannot type."""
+        import pyarrow as pa
+        bare = frame.copy(deep=False)
+        bare.attrs = {}
+        try:
+            table = pa.Table.from_pandas(bare)
+        except (pa.ArrowException, TypeError, ValueError):
+            return False
+        if frame.attrs:
+            metadata = {**table.schema.metadata, ATTRS_METADATA_KEY: encode_attrs(frame.attrs)}
+            table = table.replace_schema_metadata(metadata)
+
+        def write(sink):
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        return self.store.put(self._store_key(key), write)
+
+    def share(self, key, frame):
+        """Store frame and return the shared copy, or frame itself if it cannot be shared.
+
+        Handing back the mapped copy lets the worker that computed a frame
+        drop its private one.
+        """
+        if not self.put(key, frame):
+            return frame
+        shared = self.get(key)
+        return frame if shared is None else shared
+
+    def delete(self, key):
+        self.store.delete(self._store_key(key))
+
+    def stats(self):
+        return {**self.store.stats(), 'hits': self.hits, 'misses': self.misses}
+
+
+def make_shared_cache(name=SHARED_CACHE, path=SHARED_CACHE_DIR, max_bytes=SHARED_CACHE_MAX_BYTES):
+    """The SharedFrameCache configured by TRAFFIC_SHARED_CACHE, or None when it is off."""
+    if name == 'off':
+        return None
+    if name == 'directory':
+        return SharedFrameCache(DirectoryStore(path, max_bytes))
+    raise ValueError(f"Unknown shared cache: {name} (expected one of {', '.join(SHARED_CACHES)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=SHARED_CACHE_DIR)
+    parser.add_argument('--clear', action='store_true',
+                        help="bump the generation, invalidating every worker's entries")
+    args = parser.parse_args()
+
+    cache = make_shared_cache('directory', args.path)
+    if args.clear:
+        cache.bump_generation()
+    stats = cache.stats()
+    print(f"{stats['path']}: {stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB "
+          f"of {stats['max_bytes'] / 1024 ** 2:.0f} MB, generation {cache.generation()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""Columnar Parquet snapshot of traffic_stops for fast cold starts.
+
+The snapshot is a directory with one zstd-compressed Parquet file per month
+of stop_date (stop_period=YYYY-MM/data.parquet, Hive-style), so readers
+filtering on dates open only the months they need. Each month is read with
+its own date-range query, which touches a single partition of the table,
+and written in chunks through a server-side cursor. A refresh writes every
+month into a new version directory and then replaces _manifest.json, which
+names the current version and dates the snapshot; readers go through the
+manifest, so they see one whole version, never a mix of months from two.
+The previous version is kept until the next refresh for readers still on
+it. Readers memory-map the files and decode only the columns they ask for. Worker
+processes sharing a snapshot take turns refreshing it through a lock file
+beside it, and with a shared cache (see shared_cache.py) decode it once
+for every worker on the node.
+
+Usage:
+    python snapshot.py           # write or refresh the snapshot
+"""
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only serialized within a process.
+    fcntl = None
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from query_catalog import WINDOW_PREDICATE
+from settings import DATABASE_URL
+from stops_frame import compact_stops
+
+SNAPSHOT_PATH = os.environ.get('TRAFFIC_SNAPSHOT_PATH', os.path.join('snapshots', 'traffic_stops'))
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get('TRAFFIC_SNAPSHOT_MAX_AGE', 15 * 60))
+SNAPSHOT_CHUNK_SIZE = 100_000
+SNAPSHOT_COMPRESSION = 'zstd'
+# Hive partition column holding each file's month; rows without a stop_date go to 'none'.
+PARTITION_COLUMN = 'stop_period'
+NO_DATE_PARTITION = 'none'
+MANIFEST_NAME = '_manifest.json'
+VERSION_PREFIX = 'v'
+
+SNAPSHOT_DATE_RANGE_QUERY = "SELECT MIN(stop_date), MAX(stop_date) FROM traffic_stops"
+SNAPSHOT_MONTH_QUERY = f"SELECT * FROM traffic_stops WHERE {WINDOW_PREDICATE} ORDER BY id"
+SNAPSHOT_NO_DATE_QUERY = "SELECT * FROM traffic_stops WHERE stop_date IS NULL ORDER BY id"
+
+
+def snapshot_modified_at(path):
+    """When the snapshot at path was last written, or None if there is none.
+
+    A directory snapshot is dated by its manifest; a single Parquet file,
+    as older versions wrote, by the file itself.
+    """
+    try:
+        if os.path.isdir(path):
+            return os.path.getmtime(os.path.join(path, MANIFEST_NAME))
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_source(path):
+    """The file or directory holding the current version of the snapshot at path.
+
+    Directories written before versions were introduced hold their months
+    directly.
+    """
+    if not os.path.isdir(path):
+        return path
+    version = (read_manifest(path) or {}).get('version')
+    return path if version is None else os.path.join(path, version)
+
+
+def snapshot_months(engine):
+    """(period, first day, last day) for every month from the first stop_date to the last."""
+    with engine.connect() as conn:
+        first, last = conn.execute(text(SNAPSHOT_DATE_RANGE_QUERY)).one()
+    if first is None:
+        return []
+    return [(str(month), month.start_time.strftime('%Y-%m-%d'), month.end_time.strftime('%Y-%m-%d'))
+            for month in pd.period_range(pd.Timestamp(first), pd.Timestamp(last), freq='M')]
+
+
+def writable_schema(table):
+    """Schema for a ParquetWriter fed in chunks, taken from the first chunk.
+
+    An all-NULL column in the first chunk would otherwise pin its type to null.
+    """
+    import pyarrow as pa
+    return pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+        for field in table.schema
+    ]).remove_metadata()
+
+
+def write_partition(engine, path, period, query, params, schema=None, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """Write one month's rows to its partition and return (rows, schema).
+
+    Every file shares the schema of the first chunk written, passed back in
+    as schema. A month without rows gets no file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    directory = os.path.join(path, f"{PARTITION_COLUMN}={period}")
+    writer = None
+    rows = 0
+    try:
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunk_size):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = schema or writable_schema(table)
+                    os.makedirs(directory, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(directory, 'data.parquet'), schema,
+                                              compression=SNAPSHOT_COMPRESSION)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, schema
+
+
+def write_snapshot(engine, path=SNAPSHOT_PATH, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """Materialize traffic_stops into a new version under path, one file per month,
+    switch readers to it and return the number of rows written.
+    """
+    os.makedirs(path, exist_ok=True)
+    previous = (read_manifest(path) or {}).get('version')
+    version = f"{VERSION_PREFIX}{time.time_ns()}"
+    version_path = os.path.join(path, version)
+    partitions = {}
+    schema = None
+    for period, first_day, last_day in snapshot_months(engine):
+        partitions[period], schema = write_partition(
+            engine, version_path, period, SNAPSHOT_MONTH_QUERY, {'date_from': first_day, 'date_to': last_day},
+            schema, chunk_size,
+        )
+    partitions[NO_DATE_PARTITION], schema = write_partition(
+        engine, version_path, NO_DATE_PARTITION, SNAPSHOT_NO_DATE_QUERY, None, schema, chunk_size,
+    )
+    partitions = {period: rows for period, rows in partitions.items() if rows}
+    os.makedirs(version_path, exist_ok=True)
+
+    rows = sum(partitions.values())
+    tmp_manifest = os.path.join(path, f".{MANIFEST_NAME}.tmp")
+    with open(tmp_manifest, 'w') as f:
+        json.dump({'version': version, 'rows': rows, 'partitions': partitions, 'written_at': time.time()},
+                  f, indent=1)
+    os.replace(tmp_manifest, os.path.join(path, MANIFEST_NAME))
+
+    # Older versions, and versions a failed refresh left half-written. Months
+    # of an unversioned snapshot are its previous version until the next refresh.
+    for name in os.listdir(path):
+        if name in (version, previous):
+            continue
+        if name.startswith(VERSION_PREFIX) or name.startswith(f"{PARTITION_COLUMN}=") and previous is not None:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    return rows
+
+
+def snapshot_bytes(path):
+    """Size of the current version of the snapshot."""
+    source = snapshot_source(path)
+    if not os.path.isdir(source):
+        return os.path.getsize(source)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(source) for name in names)
+
+
+@contextlib.contextmanager
+def snapshot_lock(path, name, blocking=False):
+    """Yield whether this process holds the named lock of the snapshot at path.
+
+    Locks are files beside the snapshot, shared by every worker process.
+    Without blocking, a worker that finds the lock taken gets False at once.
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.{name}.lock", 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SnapshotStore:
+    """Reads the snapshot file and refreshes it in the background when stale.
+
+    With shared, a SharedFrameCache, decoded frames are kept in it and read
+    back memory-mapped, so every worker on the node maps one copy.
+    """
+
+    def __init__(self, engine, path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE_SECONDS, shared=None):
+        self.engine = engine
+        self.path = path
+        self.max_age = max_age
+        self.shared = shared
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def modified_at(self):
+        return snapshot_modified_at(self.path)
+
+    def age(self):
+        modified_at = self.modified_at()
+        return None if modified_at is None else time.time() - modified_at
+
+    def read(self, columns=None):
+        """Return the snapshot (or only the given columns) with compact column types,
+        or None if there is none yet.
+        """
+        modified_at = self.modified_at()
+        if modified_at is None:
+            self.refresh_in_background()
+            return None
+        if time.time() - modified_at > self.max_age:
+            self.refresh_in_background()
+
+        key = (tuple(columns) if columns else None, modified_at)
+        with self._lock:
+            frame = self._frames.get(key)
+        if frame is None:
+            frame = self._load(columns, modified_at)
+            with self._lock:
+                # Frames decoded from an older file are dropped once a new one appears.
+                stale = [k for k in self._frames if k[1] != modified_at]
+                self._frames = {k: v for k, v in self._frames.items() if k[1] == modified_at}
+                self._frames[key] = frame
+            if self.shared is not None:
+                for stale_key in stale:
+                    self.shared.delete(self._shared_key(*stale_key))
+        return frame
+
+    def _shared_key(self, columns, modified_at):
+        return ('snapshot', os.path.abspath(self.path), columns, modified_at)
+
+    def _load(self, columns, modified_at):
+        shared_key = self._shared_key(tuple(columns) if columns else None, modified_at)
+        if self.shared is None:
+            return self._decode(columns)
+        # One worker decodes while the others wait for its shared copy.
+        with snapshot_lock(self.path, 'decode', blocking=True):
+            frame = self.shared.get(shared_key)
+            if frame is None:
+                frame = self.shared.share(shared_key, self._decode(columns))
+                # Hand the decode's buffers back, leaving this worker with the mapped copy only.
+                import pyarrow as pa
+                pa.default_memory_pool().release_unused()
+        return frame
+
+    def _decode(self, columns):
+        import pyarrow.parquet as pq
+        table = pq.read_table(snapshot_source(self.path), columns=columns, memory_map=True)
+        if PARTITION_COLUMN in table.column_names and not (columns and PARTITION_COLUMN in columns):
+            table = table.drop_columns([PARTITION_COLUMN])
+        return compact_stops(table.to_pandas())
+
+    def refresh(self):
+        return write_snapshot(self.engine, self.path)
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with snapshot_lock(self.path, 'refresh') as acquired:
+                    # Another worker may have refreshed it while this one waited to start.
+                    age = self.age()
+                    if acquired and (age is None or age > self.max_age):
+                        self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="snapshot-refresh", daemon=True).start()
+
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    started = time.perf_counter()
+    rows = write_snapshot(engine)
+    size_mb = snapshot_bytes(SNAPSHOT_PATH) / 1024 ** 2 if rows else 0
+    print(f"Wrote {rows:,} rows to {SNAPSHOT_PATH} ({size_mb:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""Bitmap index over the filter columns of traffic_stops.
+
+Search Incidents and Driver Details filter on a few low-cardinality columns
+(the flags, gender, country, violation, search type and outcome) and an age
+range. For every value of those columns the index keeps the rows holding it
+as a compressed bitmap: sorted row positions while the value is rare,
+packed bits once it is common, as Roaring bitmaps choose per container.
+Ages are a permutation of the rows sorted by age, so an age range is two
+binary searches and a slice. Predicates are ANDed rarest first, and several
+values of one column ORed, so a query costs in proportion to the rows it
+matches rather than to the table; counts, the summary and each page's ids
+come from the index, and only the page's rows are read, by primary key.
+
+Rows are kept in id order and follow traffic_stops from an id watermark
+like the profiles: new rows go to a short tail that is scanned directly and
+sealed into the bitmaps once it outgrows a share of the index. rebuild()
+recomputes the index after rows were updated or deleted, and refresh()
+reseals it from the database in the background every reconcile_seconds, or
+on the next refresh after expire(), to pick up rows committed out of id
+order. An index over a date window holds only the stops dated within it.
+"""
+import threading
+import time
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from query_catalog import LIVE_WATERMARK_QUERY, windowed
+
+INDEX_FLAG_COLUMNS = ('search_conducted', 'is_arrested', 'drugs_related_stop')
+INDEX_VALUE_COLUMNS = INDEX_FLAG_COLUMNS + (
+    'driver_gender', 'country_name', 'violation', 'search_type', 'stop_outcome',
+)
+INDEX_RANGE_COLUMN = 'driver_age'
+STOP_INDEX_COLUMNS = INDEX_VALUE_COLUMNS + (INDEX_RANGE_COLUMN,)
+STOP_INDEX_CHUNK_SIZE = 100_000
+# The tail is sealed into the bitmaps once it holds this share of the sealed rows, or SEAL_MIN_ROWS.
+SEAL_FRACTION = 0.05
+SEAL_MIN_ROWS = 50_000
+# A sorted position takes 32 bits, so below this density positions are smaller than bits.
+SPARSE_DENSITY = 1 / 32
+# Packed bytes unpacked at a time when paging through a dense bitmap.
+SCAN_BYTES = 8_192
+RECONCILE_SECONDS = 10 * 60
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+STOP_INDEX_LOAD_QUERY = f"""
+    SELECT id, {', '.join(STOP_INDEX_COLUMNS)}
+    FROM traffic_stops
+    WHERE id > :after_id AND id <= :until_id
+    ORDER BY id
+"""
+
+
+def popcount(bits):
+    """The number of set bits in a packed array."""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bits).sum())
+    # numpy before 2.0 looks each byte up instead.
+    return int(POPCOUNT[bits].sum())
+
+
+class Bitmap:
+    """A set of row positions below size.
+
+    Sparse sets are sorted uint32 positions and dense ones packed bits
+    (np.packbits order); the operators pick the cheaper path for each pair.
+    """
+
+    __slots__ = ('size', 'positions', 'bits', '_count')
+
+    def __init__(self, size, positions=None, bits=None, count=None):
+        self.size = size
+        self.positions = positions
+        self.bits = bits
+        self._count = count
+
+    @classmethod
+    def empty(cls, size):
+        return cls(size, positions=np.empty(0, dtype=np.uint32), count=0)
+
+    @classmethod
+    def from_positions(cls, size, positions):
+        """From sorted, distinct positions."""
+        if len(positions) < size * SPARSE_DENSITY:
+            return cls(size, positions=positions.astype(np.uint32, copy=False), count=len(positions))
+        mask = np.zeros(size, dtype=bool)
+        mask[positions] = True
+        return cls(size, bits=np.packbits(mask), count=len(positions))
+
+    @classmethod
+    def from_mask(cls, mask):
+        count = int(np.count_nonzero(mask))
+        if count < len(mask) * SPARSE_DENSITY:
+            return cls(len(mask), positions=np.flatnonzero(mask).astype(np.uint32), count=count)
+        return cls(len(mask), bits=np.packbits(mask), count=count)
+
+    def __len__(self):
+        if self._count is None:
+            self._count = len(self.positions) if self.bits is None else popcount(self.bits)
+        return self._count
+
+    def contains(self, positions):
+        """Which of the given positions are in the set, as a boolean array."""
+        if self.bits is not None:
+            return (self.bits[positions >> 3] >> (7 - (positions & 7))) & 1 == 1
+        if not len(self.positions):
+            return np.zeros(len(positions), dtype=bool)
+        found = np.searchsorted(self.positions, positions)
+        found[found == len(self.positions)] = 0
+        return self.positions[found] == positions
+
+    def __and__(self, other):
+        if self.bits is not None and other.bits is not None:
+            return Bitmap(self.size, bits=self.bits & other.bits)
+        # Probe the other set with each position of the sparse (or smaller) one.
+        if self.bits is None and (other.bits is not None or len(self) <= len(other)):
+            small, large = self, other
+        else:
+            small, large = other, self
+        return Bitmap(self.size, positions=small.positions[large.contains(small.positions)])
+
+    def __or__(self, other):
+        if self.bits is not None and other.bits is not None:
+            return Bitmap(self.size, bits=self.bits | other.bits)
+        if self.bits is None and other.bits is None:
+            return Bitmap.from_positions(self.size, np.union1d(self.positions, other.positions))
+        dense, sparse = (self, other) if self.bits is not None else (other, self)
+        bits = dense.bits.copy()
+        np.bitwise_or.at(bits, sparse.positions >> 3, (128 >> (sparse.positions & 7)).astype(np.uint8))
+        return Bitmap(self.size, bits=bits)
+
+    def to_mask(self):
+        if self.bits is not None:
+            return np.unpackbits(self.bits, count=self.size).view(bool)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.positions] = True
+        return mask
+
+    def take(self, start=0, limit=None):
+        """The positions from start on, in order, at most limit of them."""
+        if self.bits is None:
+            first = np.searchsorted(self.positions, start)
+            return self.positions[first:None if limit is None else first + limit]
+        if limit is None:
+            positions = np.flatnonzero(self.to_mask()[start:]) + start
+            return positions.astype(np.uint32)
+        # Unpack only as much of the bitmap as the page needs.
+        found = []
+        remaining = limit
+        byte = start >> 3
+        while byte < len(self.bits) and remaining > 0:
+            block = np.flatnonzero(np.unpackbits(self.bits[byte:byte + SCAN_BYTES])) + byte * 8
+            block = block[block >= start][:remaining]
+            found.append(block)
+            remaining -= len(block)
+            byte += SCAN_BYTES
+        return np.concatenate(found).astype(np.uint32) if found else np.empty(0, dtype=np.uint32)
+
+
+def bitmaps_by_code(codes, value_count):
+    """One Bitmap per code in range(value_count); code -1 (NULL) gets none."""
+    counts = np.bincount(codes + 1, minlength=value_count + 1)
+    ends = np.concatenate([[0], np.cumsum(counts)])
+    # A stable sort keeps each code's positions in order.
+    order = np.argsort(codes, kind='stable')
+    return [Bitmap.from_positions(len(codes), order[ends[code + 1]:ends[code + 2]])
+            for code in range(value_count)]
+
+
+class SealedRows:
+    """Rows in id order as bitmaps and an age order. Never modified.
+
+    Only ids and ages are kept per row; the value codes live in the bitmaps.
+    age_order lists the rows with an age by age, and each distinct age's
+    rows in position order, starting at age_starts.
+    """
+
+    def __init__(self, rows, value_counts):
+        self.ids = rows['id']
+        self.ages = rows[INDEX_RANGE_COLUMN]
+        self.size = len(self.ids)
+        self.bitmaps = {column: bitmaps_by_code(rows[column], value_counts[column])
+                        for column in INDEX_VALUE_COLUMNS}
+        known = np.flatnonzero(~np.isnan(self.ages))
+        self.age_order = known[np.argsort(self.ages[known], kind='stable')].astype(np.uint32)
+        self.age_values, age_starts = np.unique(self.ages[self.age_order], return_index=True)
+        self.age_starts = np.append(age_starts, len(self.age_order))
+
+    def encoded(self):
+        """The rows encoded again, as they were sealed, codes recovered from the bitmaps."""
+        rows = {'id': self.ids, INDEX_RANGE_COLUMN: self.ages}
+        for column, bitmaps in self.bitmaps.items():
+            codes = np.full(self.size, -1, dtype=np.int16)
+            for code, bitmap in enumerate(bitmaps):
+                codes[bitmap.take()] = code
+            rows[column] = codes
+        return rows
+
+    def bitmap(self, column, code):
+        bitmaps = self.bitmaps[column]
+        if code is None or code >= len(bitmaps):
+            return Bitmap.empty(self.size)
+        return bitmaps[code]
+
+    def age_range(self, low, high):
+        first = self.age_starts[np.searchsorted(self.age_values, low, side='left')]
+        last = self.age_starts[np.searchsorted(self.age_values, high, side='right')]
+        positions = self.age_order[first:last]
+        if len(positions) < self.size * SPARSE_DENSITY:
+            return Bitmap(self.size, positions=np.sort(positions), count=len(positions))
+        if len(positions) <= self.size // 2:
+            return Bitmap.from_positions(self.size, positions)
+        # Wide ranges clear the fewer positions outside them instead.
+        mask = np.ones(self.size, dtype=bool)
+        mask[self.age_order[:first]] = False
+        mask[self.age_order[last:]] = False
+        mask[np.isnan(self.ages)] = False
+        return Bitmap(self.size, bits=np.packbits(mask), count=len(positions))
+
+
+def empty_rows():
+    rows = {'id': np.empty(0, np.int64), INDEX_RANGE_COLUMN: np.empty(0, np.float32)}
+    rows.update({column: np.empty(0, np.int16) for column in INDEX_VALUE_COLUMNS})
+    return rows
+
+
+def concat_rows(chunks):
+    """One encoded chunk from several, column by column."""
+    if not chunks:
+        return empty_rows()
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+class StopMatches:
+    """The rows matching one query: a bitmap over the sealed rows and positions in the tail."""
+
+    def __init__(self, values, sealed, rows, tail, tail_rows):
+        self.values = values
+        self.sealed = sealed
+        self.rows = rows
+        self.tail = tail
+        self.tail_rows = tail_rows
+
+    def __len__(self):
+        return len(self.rows) + len(self.tail_rows)
+
+    def ids(self, after_id=None, limit=None):
+        """Matching ids in order, from the first above after_id, at most limit of them."""
+        start = 0 if after_id is None else int(np.searchsorted(self.sealed.ids, after_id, side='right'))
+        ids = self.sealed.ids[self.rows.take(start, limit)]
+        if limit is None or len(ids) < limit:
+            tail_ids = self.tail['id'][self.tail_rows]
+            if after_id is not None:
+                tail_ids = tail_ids[tail_ids > after_id]
+            ids = np.concatenate([ids, tail_ids[:None if limit is None else limit - len(ids)]])
+        return ids.tolist()
+
+    def count(self, column, value):
+        """How many matching rows have value in column."""
+        code = self.values[column].get(value)
+        if code is None:
+            return 0
+        tail_count = int(np.count_nonzero(self.tail[column][self.tail_rows] == code))
+        return len(self.rows & self.sealed.bitmap(column, code)) + tail_count
+
+    def ages(self):
+        rows = self.rows.to_mask() if self.rows.bits is not None else self.rows.positions
+        return np.concatenate([self.sealed.ages[rows], self.tail[INDEX_RANGE_COLUMN][self.tail_rows]])
+
+    def summary(self):
+        """Total, arrests, searches and average age, as filtered_summary_query returns them."""
+        ages = self.ages()
+        known = ages[~np.isnan(ages)]
+        return pd.Series({
+            'total': len(self),
+            'arrests': self.count('is_arrested', 1),
+            'searches': self.count('search_conducted', 1),
+            'avg_age': float(known.mean(dtype=np.float64)) if len(known) else np.nan,
+        })
+
+
+class StopIndex:
+    """Bitmap and sorted-age index over STOP_INDEX_COLUMNS, kept current from traffic_stops.
+
+    With a window, a (first, last) pair of ISO dates, only stops dated
+    within it are indexed.
+    """
+
+    def __init__(self, engine, window=None, reconcile_seconds=RECONCILE_SECONDS):
+        self.engine = engine
+        self.window = window
+        self.reconcile_seconds = reconcile_seconds
+        self.max_id = 0
+        self.loaded_at = time.monotonic()
+        self._values = {column: {} for column in INDEX_VALUE_COLUMNS}
+        self._sealed = self._seal([])
+        self._tail = []
+        self._tail_rows = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._sealed.size + sum(len(chunk['id']) for chunk in self._tail)
+
+    def encode(self, df):
+        """The chunk's ids, value codes (-1 for NULL) and ages as arrays."""
+        chunk = {'id': df['id'].to_numpy(np.int64)}
+        for column in INDEX_VALUE_COLUMNS:
+            values = df[column]
+            if column in INDEX_FLAG_COLUMNS:
+                values = pd.to_numeric(values, errors='coerce').astype('Int64')
+            chunk_codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            codes = self._values[column]
+            # The trailing -1 maps factorize's NULL sentinel to ours.
+            mapping = np.array([codes.setdefault(value, len(codes)) for value in uniques] + [-1], dtype=np.int16)
+            chunk[column] = mapping[chunk_codes]
+        chunk[INDEX_RANGE_COLUMN] = pd.to_numeric(df[INDEX_RANGE_COLUMN], errors='coerce') \
+            .to_numpy(np.float32, na_value=np.nan)
+        return chunk
+
+    def _seal(self, chunks):
+        value_counts = {column: len(self._values[column]) for column in INDEX_VALUE_COLUMNS}
+        return SealedRows(concat_rows(chunks), value_counts)
+
+    def add_frame(self, df, seal=True):
+        """Add rows with ids above max_id, sealing the tail when it has grown long enough."""
+        if df.empty:
+            return
+        chunk = self.encode(df)
+        with self._lock:
+            self._tail.append(chunk)
+            self._tail_rows = None
+            self.max_id = max(self.max_id, int(chunk['id'].max()))
+        if seal:
+            self.seal(force=False)
+
+    def seal(self, force=True):
+        """Fold the tail into the bitmaps; without force only once it is long enough."""
+        with self._lock:
+            sealed, tail = self._sealed, self._tail
+        tail_size = sum(len(chunk['id']) for chunk in tail)
+        if not tail_size or not force and tail_size < max(SEAL_MIN_ROWS, sealed.size * SEAL_FRACTION):
+            return
+        resealed = self._seal([sealed.encoded()] + tail)
+        with self._lock:
+            self._sealed = resealed
+            # Chunks added while sealing stay in the tail.
+            self._tail = self._tail[len(tail):]
+            self._tail_rows = None
+
+    def load(self, after_id=0, until_id=None):
+        """Add the rows with after_id < id <= until_id, by default up to the current MAX(id)."""
+        with self.engine.connect() as conn:
+            if until_id is None:
+                until_id = conn.execute(text(LIVE_WATERMARK_QUERY)).scalar() or 0
+            query, params = windowed(STOP_INDEX_LOAD_QUERY, {'after_id': after_id, 'until_id': until_id},
+                                     self.window)
+            for chunk in pd.read_sql(text(query), conn, params=params, chunksize=STOP_INDEX_CHUNK_SIZE):
+                self.add_frame(chunk, seal=False)
+        # Rows outside the window up to until_id were read past, so later
+        # refreshes start after them rather than after the last one indexed.
+        with self._lock:
+            self.max_id = max(self.max_id, int(until_id))
+        self.seal(force=False)
+
+    def refresh(self, latest_id):
+        """Pick up rows inserted since the last refresh, by this or any other process.
+
+        Returns at once while another thread refreshes. Once the index is
+        reconcile_seconds old, or expired, or the table shrank, it is rebuilt
+        in the background instead.
+        """
+        if latest_id is None:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        # The table shrank, or it is time to pick up rows committed out of id order.
+        if latest_id < self.max_id or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+            threading.Thread(target=self._reconcile, name="stop-index-reconcile", daemon=True).start()
+            return
+        try:
+            if latest_id > self.max_id:
+                self.load(after_id=self.max_id, until_id=latest_id)
+        finally:
+            self._refresh_lock.release()
+
+    def expire(self):
+        """Have the next refresh rebuild the index, e.g. after a bulk import."""
+        with self._lock:
+            self.loaded_at = float('-inf')
+
+    def _reconcile(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    def rebuild(self):
+        """Recompute the index from scratch, e.g. after rows were updated or deleted."""
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Built aside and swapped in, so queries keep matching against the old index meanwhile.
+        fresh = StopIndex(self.engine, self.window, self.reconcile_seconds)
+        fresh.load()
+        with self._lock:
+            self.max_id = fresh.max_id
+            self._values = fresh._values
+            self._sealed = fresh._sealed
+            self._tail = fresh._tail
+            self._tail_rows = None
+            self.loaded_at = time.monotonic()
+
+    def _tail_snapshot(self):
+        if self._tail_rows is None:
+            self._tail_rows = concat_rows(self._tail)
+        return self._tail_rows
+
+    def match(self, equals=None, between=None):
+        """The rows matching every filter.
+
+        equals maps a column of INDEX_VALUE_COLUMNS to a value, or to a
+        list of values any of which matches; between maps driver_age to a
+        (low, high) pair matched inclusively. NULLs never match.
+        """
+        with self._lock:
+            values = self._values
+            sealed = self._sealed
+            tail = self._tail_snapshot()
+        tail_mask = np.ones(len(tail['id']), dtype=bool)
+        bitmaps = []
+        for column, value in (equals or {}).items():
+            if column not in INDEX_VALUE_COLUMNS:
+                raise ValueError(f"Unsupported filter column: {column}")
+            codes = [values[column][v] for v in (value if isinstance(value, list) else [value])
+                     if v in values[column]]
+            if codes:
+                bitmaps.append(reduce(lambda a, b: a | b, [sealed.bitmap(column, code) for code in codes]))
+            else:
+                bitmaps.append(Bitmap.empty(sealed.size))
+            tail_mask &= np.isin(tail[column], codes)
+        for column, (low, high) in (between or {}).items():
+            if column != INDEX_RANGE_COLUMN:
+                raise ValueError(f"Unsupported range column: {column}")
+            bitmaps.append(sealed.age_range(low, high))
+            ages = tail[INDEX_RANGE_COLUMN]
+            tail_mask &= (ages >= low) & (ages <= high)
+        # Rarest first, so each AND probes as few positions as possible.
+        bitmaps.sort(key=len)
+        if bitmaps:
+            rows = reduce(lambda a, b: a & b, bitmaps)
+        else:
+            rows = Bitmap.from_mask(np.ones(sealed.size, dtype=bool))
+        return StopMatches(values, sealed, rows, tail, np.flatnonzero(tail_mask))
@@ -0,0 +1,72 @@
+"""Compact in-memory representation of the traffic_stops table.
+
+Repeated strings become categoricals, the 0/1 flags become bool and small
+integers get the narrowest unsigned type, which cuts the footprint of a
+loaded table by roughly an order of magnitude and speeds up value_counts()
+and equality masks on those columns.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = [
+    'country_name', 'driver_gender', 'driver_race', 'violation', 'violation_raw',
+    'search_type', 'stop_outcome', 'stop_duration', 'age_group', 'stop_date', 'stop_time',
+]
+FLAG_COLUMNS = ['is_arrested', 'search_conducted', 'drugs_related_stop']
+SMALL_INT_COLUMNS = ['driver_age', 'stop_hour', 'stop_month', 'stop_year']
+# Plates repeat far less than the other strings; only worth a categorical below this ratio.
+VEHICLE_CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def to_small_int(values):
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().any():
+        dtype = pd.UInt8Dtype() if numeric.max() <= np.iinfo(np.uint8).max else pd.UInt16Dtype()
+        return numeric.round().astype(dtype)
+    return pd.to_numeric(numeric.round(), downcast='unsigned')
+
+
+def compact_stops(df):
+    """Return a copy of a traffic_stops frame with compact column types.
+
+    The deep size of each original column is kept in attrs['source_bytes']
+    so memory_report() can show the saving.
+    """
+    source_bytes = df.memory_usage(index=False, deep=True)
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in CATEGORY_COLUMNS:
+            values = values.astype('category')
+        elif column in FLAG_COLUMNS:
+            values = values.fillna(0).astype(bool)
+        elif column in SMALL_INT_COLUMNS and values.min() >= 0:
+            values = to_small_int(values)
+        elif column == 'vehicle_number':
+            if values.nunique() <= VEHICLE_CATEGORY_MAX_UNIQUE_RATIO * len(values):
+                values = values.astype('category')
+        elif column == 'id':
+            values = pd.to_numeric(values, downcast='unsigned')
+        elif column in ('driver_age_raw', 'duration_minutes'):
+            values = pd.to_numeric(values, errors='coerce').astype(np.float32)
+        columns[column] = values
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs['source_bytes'] = source_bytes
+    return compact
+
+
+def memory_report(df):
+    """Per-column dtype and deep memory use, with the pre-compaction size when known."""
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(index=False, deep=True),
+    })
+    source_bytes = df.attrs.get('source_bytes')
+    if source_bytes is not None:
+        report['loaded_bytes'] = source_bytes.reindex(report.index)
+        report['reduction'] = (report['loaded_bytes'] / report['bytes']).round(1)
+    report.loc['TOTAL'] = report.sum(numeric_only=True)
+    report.loc['TOTAL', 'dtype'] = ''
+    if source_bytes is not None:
+        report.loc['TOTAL', 'reduction'] = round(report.loc['TOTAL', 'loaded_bytes'] / report.loc['TOTAL', 'bytes'], 1)
+    return report
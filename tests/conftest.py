@@ -0,0 +1,63 @@
+"""Fixtures over the SQLite stand-in for traffic_stops; see benchmarks/synthetic.py."""
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from benchmarks.synthetic import generate, load_sqlite, sqlite_engine
+
+TEST_ROWS = 6_000
+
+
+@pytest.fixture(scope='session')
+def stand_in(tmp_path_factory):
+    path = tmp_path_factory.mktemp('stand_in') / 'stops.sqlite'
+    load_sqlite(str(path), generate(TEST_ROWS, seed=7, chunk_size=2_000))
+    return path
+
+
+@pytest.fixture
+def db_path(stand_in, tmp_path):
+    """A private copy of the stand-in, free to modify."""
+    path = tmp_path / 'stops.sqlite'
+    shutil.copy(stand_in, path)
+    return path
+
+
+@pytest.fixture
+def engine(db_path):
+    engine = sqlite_engine(db_path)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_path):
+    """A plain sqlite3 connection, for reading expected results and moving rows around."""
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def hold_back(db, first_id, last_id):
+    """Delete rows first_id..last_id and return a function that commits them again, ids unchanged.
+
+    Structures built in between see the rows as committed out of id order.
+    """
+    rows = db.execute("SELECT * FROM traffic_stops WHERE id BETWEEN ? AND ?", (first_id, last_id)).fetchall()
+    db.execute("DELETE FROM traffic_stops WHERE id BETWEEN ? AND ?", (first_id, last_id))
+    db.commit()
+
+    def commit():
+        db.executemany(f"INSERT INTO traffic_stops VALUES ({', '.join('?' for _ in rows[0])})", rows)
+        db.commit()
+
+    return commit
+
+
+def join_background(name):
+    """Wait for the background threads with the given name, e.g. a reconcile."""
+    for thread in threading.enumerate():
+        if thread.name == name:
+            thread.join()
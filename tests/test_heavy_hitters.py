@@ -0,0 +1,84 @@
+from collections import Counter
+
+import pytest
+
+from conftest import hold_back, join_background
+from heavy_hitters import HEAVY_HITTER_FLAGS, HeavyHitters, exact_top_query
+
+# Small enough that the stand-in's plates overflow it and get evicted.
+CAPACITY = 50
+
+
+def exact_counts(db, flag, country=None):
+    query, params = exact_top_query(flag, country, k=10 ** 9)
+    return Counter(dict(db.execute(query, params).fetchall()))
+
+
+@pytest.fixture
+def hitters(engine, tmp_path):
+    hitters = HeavyHitters(engine, str(tmp_path / 'heavy_hitters.npz'), CAPACITY)
+    hitters.load()
+    return hitters
+
+
+@pytest.mark.parametrize('flag', HEAVY_HITTER_FLAGS)
+@pytest.mark.parametrize('country', [None, 'India'])
+def test_top_bounds_hold(hitters, db, flag, country):
+    exact = exact_counts(db, flag, country)
+    top = hitters.top(flag, country, k=10)
+    assert len(top) == 10
+    assert top.attrs['total'] == sum(exact.values())
+    for plate, count, min_count in zip(top['vehicle_number'], top['count'], top['min_count']):
+        assert min_count <= exact[plate] <= count
+    # A guaranteed plate stops at least as often as every plate left out.
+    outside = max(count for plate, count in exact.items() if plate not in set(top['vehicle_number']))
+    for plate in top.loc[top['guaranteed'], 'vehicle_number']:
+        assert exact[plate] >= outside
+
+
+@pytest.mark.parametrize('flag', HEAVY_HITTER_FLAGS)
+def test_frequent_plates_are_never_missed(hitters, db, flag):
+    exact = exact_counts(db, flag)
+    tracked = set(hitters._summaries[(flag, None)].counts)
+    max_error = sum(exact.values()) // CAPACITY
+    assert {plate for plate, count in exact.items() if count > max_error} <= tracked
+
+
+def test_saved_sketches_reopen_with_their_watermark(hitters, engine):
+    hitters.save()
+    reopened = HeavyHitters.open(engine, hitters.path, CAPACITY)
+    assert reopened.max_id == hitters.max_id
+    assert reopened.top('is_arrested').equals(hitters.top('is_arrested'))
+    assert HeavyHitters.open(engine, hitters.path, CAPACITY + 1).max_id == 0
+
+
+def test_refresh_saves_in_the_background_and_flush_only_when_changed(engine, db, tmp_path):
+    commit = hold_back(db, 5_001, 6_000)
+    hitters = HeavyHitters(engine, str(tmp_path / 'heavy_hitters.npz'), CAPACITY, save_seconds=3600)
+    hitters.refresh(5_000)
+    join_background('heavy-hitters-save')
+    assert HeavyHitters.open(engine, hitters.path, CAPACITY).max_id == 5_000
+
+    commit()
+    hitters.refresh(6_000)
+    join_background('heavy-hitters-save')
+    # Not due yet: the file still holds the first refresh.
+    assert HeavyHitters.open(engine, hitters.path, CAPACITY).max_id == 5_000
+    hitters.flush()
+    assert HeavyHitters.open(engine, hitters.path, CAPACITY).max_id == 6_000
+
+
+def test_reconcile_picks_up_rows_committed_out_of_order(engine, db, tmp_path):
+    commit = hold_back(db, 100, 400)
+    hitters = HeavyHitters(engine, str(tmp_path / 'heavy_hitters.npz'), CAPACITY)
+    hitters.load()
+    commit()
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    hitters.refresh(latest_id)
+    exact = exact_counts(db, 'search_conducted')
+    assert hitters.top('search_conducted').attrs['total'] < sum(exact.values())
+
+    hitters.loaded_at -= hitters.reconcile_seconds
+    hitters.refresh(latest_id)
+    join_background('heavy-hitters-reconcile')
+    assert hitters.top('search_conducted').attrs['total'] == sum(exact.values())
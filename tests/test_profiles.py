@@ -0,0 +1,112 @@
+import pandas as pd
+import pytest
+
+from conftest import hold_back, join_background
+from profiles import StopProfiles
+from query_catalog import build_where_clause
+from vehicle_index import normalize_plate
+
+WINDOW = ('2008-01-01', '2010-12-31')
+
+
+def sql_vehicle_profiles(db, window=None):
+    where, params = build_where_clause(extra=["vehicle_number IS NOT NULL"], window=window)
+    counts = pd.read_sql(f"""
+        SELECT vehicle_number, COUNT(*) AS stops, SUM(is_arrested) AS arrests,
+               SUM(search_conducted) AS searches, SUM(drugs_related_stop) AS drug_stops,
+               MIN(stop_date) AS first_stop, MAX(stop_date) AS last_stop
+        FROM traffic_stops {where}
+        GROUP BY vehicle_number
+    """, db, params=params)
+    violations = pd.read_sql(f"""
+        SELECT vehicle_number, violation, COUNT(*) AS count
+        FROM traffic_stops {where} AND violation IS NOT NULL
+        GROUP BY vehicle_number, violation
+    """, db, params=params)
+    # Ties go to the violation that sorts first.
+    top = violations.sort_values(['vehicle_number', 'count', 'violation'], ascending=[True, False, True]) \
+        .drop_duplicates('vehicle_number').set_index('vehicle_number')['violation']
+    return counts.assign(top_violation=counts['vehicle_number'].map(top))
+
+
+def assert_vehicles_match_sql(profiles, db, window=None):
+    expected = sql_vehicle_profiles(db, window)
+    assert len(profiles.vehicles) == len(expected)
+    for row in expected.itertuples(index=False):
+        profile = profiles.vehicle([normalize_plate(row.vehicle_number)])
+        assert (profile['stops'], profile['arrests'], profile['searches'], profile['drug_stops']) == \
+            (row.stops, row.arrests, row.searches, row.drug_stops)
+        assert profile['first_stop'] == pd.Timestamp(row.first_stop)
+        assert profile['last_stop'] == pd.Timestamp(row.last_stop)
+        assert profile['top_violation'] == (None if pd.isna(row.top_violation) else row.top_violation)
+
+
+def test_vehicle_profiles_equal_sql(engine, db):
+    profiles = StopProfiles(engine)
+    profiles.load()
+    assert_vehicles_match_sql(profiles, db)
+
+
+def test_repeat_offenders_equal_sql(engine, db):
+    profiles = StopProfiles(engine)
+    profiles.load()
+    offenders = profiles.repeat_offenders(min_stops=3, limit=10 ** 6)
+    expected = db.execute("""
+        SELECT vehicle_number FROM traffic_stops WHERE vehicle_number IS NOT NULL
+        GROUP BY vehicle_number HAVING COUNT(*) >= 3
+    """).fetchall()
+    assert set(offenders['vehicle']) == {normalize_plate(plate) for plate, in expected}
+    assert offenders['stops'].is_monotonic_decreasing
+
+
+def test_driver_profiles_add_up_to_sql(engine, db):
+    profiles = StopProfiles(engine)
+    profiles.load()
+    drivers = profiles.driver_profiles()
+    by_gender = drivers.groupby('driver_gender')[['stops', 'arrests']].sum()
+    for gender, stops, arrests in db.execute("""
+        SELECT COALESCE(driver_gender, 'Unknown'), COUNT(*), SUM(is_arrested)
+        FROM traffic_stops GROUP BY 1
+    """):
+        assert (by_gender.loc[gender, 'stops'], by_gender.loc[gender, 'arrests']) == (stops, arrests)
+    assert (profiles.driver_profiles('F')['driver_gender'] == 'F').all()
+
+
+def test_refreshed_profiles_equal_a_full_load(engine, db):
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    refreshed = StopProfiles(engine)
+    refreshed.load(until_id=latest_id // 3)
+    refreshed.refresh(2 * latest_id // 3)
+    refreshed.refresh(latest_id)
+    loaded = StopProfiles(engine)
+    loaded.load()
+    pd.testing.assert_frame_equal(refreshed.repeat_offenders(1, limit=10 ** 6),
+                                  loaded.repeat_offenders(1, limit=10 ** 6))
+    pd.testing.assert_frame_equal(refreshed.driver_profiles(), loaded.driver_profiles())
+
+
+def test_window_advances_watermark_past_rows_outside_it(engine, db):
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    profiles = StopProfiles(engine, WINDOW)
+    profiles.load(until_id=latest_id)
+    assert profiles.max_id == latest_id
+    assert_vehicles_match_sql(profiles, db, WINDOW)
+
+
+@pytest.mark.parametrize('window', [None, WINDOW])
+def test_reconcile_picks_up_rows_committed_out_of_order(engine, db, window):
+    commit = hold_back(db, 2_000, 2_300)
+    profiles = StopProfiles(engine, window)
+    profiles.load()
+    commit()
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    profiles.refresh(latest_id)
+    where, params = build_where_clause(window=window)
+    expected = db.execute(f"SELECT COUNT(*) FROM traffic_stops {where}", params).fetchone()[0]
+    assert profiles.driver_profiles()['stops'].sum() < expected
+
+    profiles.loaded_at -= profiles.reconcile_seconds
+    profiles.refresh(latest_id)
+    join_background('stop-profiles-reconcile')
+    assert profiles.driver_profiles()['stops'].sum() == expected
+    assert_vehicles_match_sql(profiles, db, window)
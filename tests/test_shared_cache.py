@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import pytest
+
+from shared_cache import DirectoryStore, SharedFrameCache, make_shared_cache
+
+ENTRY = b'x' * 1_000
+
+
+def put_bytes(store, key, data=ENTRY):
+    return store.put(key, lambda sink: sink.write(data))
+
+
+def age(store, key, seconds_ago):
+    """Backdate an entry's last read."""
+    path = store._entry_path(key)
+    stamp = os.stat(path).st_mtime - seconds_ago
+    os.utime(path, (stamp, stamp))
+
+
+def test_eviction_drops_the_least_recently_read_entries(tmp_path):
+    store = DirectoryStore(str(tmp_path), max_bytes=3 * len(ENTRY))
+    for i, key in enumerate(['a', 'b', 'c']):
+        assert put_bytes(store, key)
+        age(store, key, 100 - i)
+    # Reading a marks it recently used, so b is the oldest.
+    assert store.get('a') is not None
+
+    assert put_bytes(store, 'd')
+    assert store.get('b') is None
+    assert all(store.get(key) is not None for key in ['a', 'c', 'd'])
+    assert store.stats()['bytes'] <= store.max_bytes
+
+
+def test_an_entry_over_budget_evicts_everything_older(tmp_path):
+    store = DirectoryStore(str(tmp_path), max_bytes=3 * len(ENTRY))
+    for i, key in enumerate(['a', 'b']):
+        put_bytes(store, key)
+        age(store, key, 100 - i)
+    put_bytes(store, 'big', b'x' * (2 * len(ENTRY) + 1))
+    assert store.get('a') is None and store.get('b') is None
+    assert store.get('big') is not None
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return make_shared_cache('directory', str(tmp_path), max_bytes=64 * 1024 * 1024)
+
+
+def test_frames_round_trip_with_their_attrs(cache):
+    frame = pd.DataFrame({'country_name': ['USA', 'India', None], 'stops': [3, 2, 1],
+                          'violation': pd.Categorical(['Speeding', 'DUI', 'Speeding'])})
+    frame.attrs = {'total': 6, 'by_gender': pd.Series({'M': 4, 'F': 2})}
+    shared = cache.share(('query', 1), frame)
+    pd.testing.assert_frame_equal(shared, frame, check_dtype=False)
+    assert shared.attrs['total'] == 6
+    pd.testing.assert_series_equal(shared.attrs['by_gender'], frame.attrs['by_gender'])
+    assert cache.stats()['hits'] == 1
+
+
+def test_bumping_the_generation_invalidates_every_worker(cache, tmp_path):
+    other_worker = SharedFrameCache(DirectoryStore(str(tmp_path)))
+    frame = pd.DataFrame({'stops': [1, 2, 3]})
+    assert cache.put('key', frame)
+    assert other_worker.get('key') is not None
+    other_worker.bump_generation()
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_frames_arrow_cannot_type_are_not_shared(cache):
+    frame = pd.DataFrame({'mixed': [1, 'a', 2.5]})
+    assert cache.share('key', frame) is frame
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+import stop_index
+from conftest import hold_back, join_background
+from query_catalog import build_where_clause, filtered_summary_query
+from stop_index import SCAN_BYTES, Bitmap, StopIndex
+
+FILTERS = [
+    ({}, {}),
+    ({'is_arrested': 1}, {}),
+    ({'driver_gender': 'F', 'search_conducted': 1}, {}),
+    ({'country_name': ['USA', 'India'], 'violation': 'Speeding'}, {}),
+    ({'search_type': ['Vehicle', 'Both'], 'stop_outcome': 'Arrest'}, {}),
+    ({}, {'driver_age': (25, 40)}),
+    ({'drugs_related_stop': 1, 'driver_gender': ['M', 'F']}, {'driver_age': (18, 30)}),
+    ({'country_name': 'Nowhere'}, {}),
+]
+# filtered_summary_query only takes single values.
+SUMMARY_FILTERS = [(equals, between) for equals, between in FILTERS
+                   if not any(isinstance(value, list) for value in equals.values())]
+
+
+def sql_ids(db, equals, between, window=None):
+    """The ids matching the filters, by SQL."""
+    extra, params = [], {}
+    for column, value in equals.items():
+        values = value if isinstance(value, list) else [value]
+        names = [f"{column}_{i}" for i in range(len(values))]
+        extra.append(f"{column} IN ({', '.join(':' + name for name in names)})")
+        params.update(zip(names, values))
+    where, where_params = build_where_clause(between=between, extra=extra, window=window)
+    params.update(where_params)
+    return [row[0] for row in db.execute(f"SELECT id FROM traffic_stops {where} ORDER BY id", params)]
+
+
+def random_bitmap(rng, size, density):
+    mask = rng.random(size) < density
+    return Bitmap.from_mask(mask), mask
+
+
+@pytest.mark.parametrize('left_density, right_density', [
+    (0.001, 0.01), (0.001, 0.5), (0.5, 0.001), (0.4, 0.6), (0.02, 0.03),
+])
+def test_bitmap_and_or_match_masks(left_density, right_density):
+    rng = np.random.default_rng(1)
+    left, left_mask = random_bitmap(rng, 20_003, left_density)
+    right, right_mask = random_bitmap(rng, 20_003, right_density)
+    assert (left.bits is None) == (left_density < stop_index.SPARSE_DENSITY)
+    assert np.array_equal((left & right).to_mask(), left_mask & right_mask)
+    assert np.array_equal((left | right).to_mask(), left_mask | right_mask)
+    assert len(left & right) == np.count_nonzero(left_mask & right_mask)
+    assert len(left | right) == np.count_nonzero(left_mask | right_mask)
+
+
+@pytest.mark.parametrize('density', [0.01, 0.5])
+def test_bitmap_take_pages_in_order(density):
+    rng = np.random.default_rng(2)
+    size = SCAN_BYTES * 8 * 3 + 5
+    bitmap, mask = random_bitmap(rng, size, density)
+    positions = np.flatnonzero(mask)
+    assert np.array_equal(bitmap.take(), positions)
+    start = SCAN_BYTES * 8 - 3
+    expected = positions[positions >= start]
+    assert np.array_equal(bitmap.take(start, 10), expected[:10])
+    assert np.array_equal(bitmap.take(start, len(expected) + 10), expected)
+
+
+@pytest.mark.parametrize('equals, between', FILTERS)
+def test_match_equals_sql(engine, db, equals, between):
+    index = StopIndex(engine)
+    index.load()
+    matches = index.match(equals, between)
+    expected = sql_ids(db, equals, between)
+    assert matches.ids() == expected
+    assert len(matches) == len(expected)
+    assert matches.ids(after_id=expected[len(expected) // 2] if expected else 0, limit=25) == \
+        expected[len(expected) // 2 + 1:][:25]
+
+
+@pytest.mark.parametrize('equals, between', SUMMARY_FILTERS)
+def test_summary_equals_sql(engine, db, equals, between):
+    index = StopIndex(engine)
+    index.load()
+    summary = index.match(equals, between).summary()
+    where, params = build_where_clause(equals=equals, between=between)
+    expected = db.execute(filtered_summary_query(where), params).fetchone()
+    assert (summary['total'], summary['arrests'], summary['searches']) == expected[:3]
+    if expected[3] is None:
+        assert np.isnan(summary['avg_age'])
+    else:
+        assert summary['avg_age'] == pytest.approx(expected[3])
+
+
+def test_tail_matches_before_and_after_sealing(engine, db, monkeypatch):
+    monkeypatch.setattr(stop_index, 'SEAL_MIN_ROWS', 10 ** 9)
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    index = StopIndex(engine)
+    index.load(until_id=latest_id // 2)
+    index.seal()
+    index.refresh(latest_id)
+    assert len(index._tail) > 0
+    equals, between = {'driver_gender': 'M', 'is_arrested': 1}, {'driver_age': (20, 50)}
+    expected = sql_ids(db, equals, between)
+    with_tail = index.match(equals, between)
+    assert with_tail.ids() == expected
+    # A page that starts in the sealed rows and runs on into the tail.
+    boundary = [i for i in expected if i <= latest_id // 2][-3]
+    assert with_tail.ids(after_id=boundary, limit=10) == [i for i in expected if i > boundary][:10]
+
+    monkeypatch.setattr(stop_index, 'SEAL_MIN_ROWS', 100)
+    index.seal(force=False)
+    assert index._tail == []
+    assert len(index) == len(sql_ids(db, {}, {}))
+    assert index.match(equals, between).ids() == expected
+
+
+def test_window_advances_watermark_past_rows_outside_it(engine, db):
+    window = ('2005-01-01', '2006-12-31')
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    index = StopIndex(engine, window)
+    index.load(until_id=latest_id)
+    assert index.max_id == latest_id
+    assert index.match({'is_arrested': 1}).ids() == sql_ids(db, {'is_arrested': 1}, {}, window)
+
+
+def test_reconcile_picks_up_rows_committed_out_of_order(engine, db):
+    commit = hold_back(db, 100, 150)
+    index = StopIndex(engine, reconcile_seconds=60)
+    index.load()
+    commit()
+    latest_id = db.execute("SELECT MAX(id) FROM traffic_stops").fetchone()[0]
+    index.refresh(latest_id)
+    assert 120 not in index.match().ids()
+
+    index.expire()
+    index.refresh(latest_id)
+    join_background('stop-index-reconcile')
+    assert index.match().ids() == sql_ids(db, {}, {})
@@ -0,0 +1,81 @@
+import sqlite3
+import time
+
+import pytest
+
+from write_queue import CaseQueue, new_case_key, validate_case
+
+
+def new_case(plate='TN9999999'):
+    return validate_case({
+        'stop_date': '2015-06-01', 'stop_time': '10:30', 'country_name': 'USA', 'driver_gender': 'F',
+        'driver_age': 30, 'violation': 'Speeding', 'is_arrested': True, 'vehicle_number': plate,
+    })
+
+
+@pytest.fixture
+def commits():
+    """The row counts on_commit was called with."""
+    return []
+
+
+@pytest.fixture
+def queue(engine, tmp_path, commits):
+    queue = CaseQueue(engine, str(tmp_path / 'cases.sqlite'), on_commit=commits.append)
+    yield queue
+    queue.close()
+
+
+def stored(db, case_key):
+    return db.execute("SELECT COUNT(*) FROM traffic_stops WHERE case_key = ?", (case_key,)).fetchone()[0]
+
+
+def test_resubmitting_a_key_queues_the_case_once(queue, db):
+    case_key = new_case_key()
+    assert queue.submit(new_case(), case_key) == case_key
+    assert queue.submit(new_case(), case_key) == case_key
+    assert queue.stats()['pending'] == 1
+    assert queue.flush() == 1
+    assert stored(db, case_key) == 1
+    assert queue.status([case_key])['status'].tolist() == ['confirmed']
+
+
+def test_replay_after_a_lost_confirmation_inserts_no_duplicate(queue, db, commits):
+    case_key = queue.submit(new_case())
+    rows = db.execute("SELECT COUNT(*) FROM traffic_stops").fetchone()[0]
+    assert queue.flush() == 1
+    # A crash between the database commit and the local confirmation leaves the case pending.
+    local = sqlite3.connect(queue.path)
+    local.execute("UPDATE cases SET status = 'pending', confirmed_at = NULL WHERE case_key = ?", (case_key,))
+    local.commit()
+    local.close()
+
+    assert queue.flush() == 0
+    assert stored(db, case_key) == 1
+    assert db.execute("SELECT COUNT(*) FROM traffic_stops").fetchone()[0] == rows + 1
+    assert queue.stats()['pending'] == 0
+    assert commits == [1]
+
+
+def test_pending_cases_share_one_commit(queue, db, commits):
+    case_keys = [queue.submit(new_case(f"TN{i:07d}")) for i in range(25)]
+    assert queue.flush() == 25
+    assert queue.stats()['batches'] == 1
+    assert commits == [25]
+    assert sum(stored(db, case_key) for case_key in case_keys) == 25
+
+
+def test_a_reopened_queue_writes_what_was_left_pending(engine, db, tmp_path):
+    path = str(tmp_path / 'cases.sqlite')
+    first = CaseQueue(engine, path)
+    case_key = first.submit(new_case())
+    first.close()
+
+    second = CaseQueue(engine, path).start()
+    try:
+        deadline = time.monotonic() + 10
+        while second.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert stored(db, case_key) == 1
+    finally:
+        second.close()
@@ -0,0 +1,175 @@
+"""In-memory index over vehicle_number for exact, prefix and substring lookups."""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import pandas as pd
+from sqlalchemy import text
+
+from query_catalog import LIVE_WATERMARK_QUERY
+
+VEHICLE_INDEX_CHUNK_SIZE = 100_000
+RECONCILE_SECONDS = 10 * 60
+
+
+def normalize_plate(value):
+    return "".join(ch for ch in str(value).casefold() if ch.isalnum())
+
+
+class VehicleIndex:
+    """Plate index with per-plate row ids and stop, arrest and search counts.
+
+    Plates are case-folded with separators removed. Prefix lookups bisect a
+    sorted list of plates, which is re-sorted lazily after new plates are
+    added; substring lookups intersect trigram posting sets and then confirm
+    each candidate. Statistics never touch the table.
+
+    New rows are caught up from an id watermark; a periodic rebuild picks up
+    rows committed out of id order, updated or deleted.
+    """
+
+    NGRAM = 3
+
+    def __init__(self, engine, reconcile_seconds=RECONCILE_SECONDS):
+        self.engine = engine
+        self.reconcile_seconds = reconcile_seconds
+        self.loaded_at = time.monotonic()
+        self.max_id = 0
+        self._plates = {}
+        self._sorted_plates = []
+        self._sorted_stale = False
+        self._grams = defaultdict(set)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._plates)
+
+    def add(self, row_id, vehicle_number, is_arrested, search_conducted):
+        plate = normalize_plate(vehicle_number)
+        if not plate:
+            return
+        with self._lock:
+            entry = self._plates.get(plate)
+            if entry is None:
+                entry = {'rows': [], 'stops': 0, 'arrests': 0, 'searches': 0}
+                self._plates[plate] = entry
+                self._sorted_stale = True
+                for i in range(len(plate) - self.NGRAM + 1):
+                    self._grams[plate[i:i + self.NGRAM]].add(plate)
+            entry['rows'].append(int(row_id))
+            entry['stops'] += 1
+            entry['arrests'] += int(is_arrested or 0)
+            entry['searches'] += int(search_conducted or 0)
+            self.max_id = max(self.max_id, int(row_id))
+
+    def add_frame(self, df):
+        for row in df.itertuples(index=False):
+            self.add(row.id, row.vehicle_number, row.is_arrested, row.search_conducted)
+
+    def lookup(self, query, mode="contains"):
+        """Return the normalized plates matching query under the given mode."""
+        needle = normalize_plate(query)
+        if not needle:
+            return []
+        with self._lock:
+            if mode == "exact":
+                return [needle] if needle in self._plates else []
+            if mode == "prefix":
+                if self._sorted_stale:
+                    self._sorted_plates = sorted(self._plates)
+                    self._sorted_stale = False
+                start = bisect_left(self._sorted_plates, needle)
+                matches = []
+                for plate in self._sorted_plates[start:]:
+                    if not plate.startswith(needle):
+                        break
+                    matches.append(plate)
+                return matches
+            if len(needle) < self.NGRAM:
+                candidates = self._plates.keys()
+            else:
+                postings = sorted(
+                    (self._grams.get(needle[i:i + self.NGRAM], set())
+                     for i in range(len(needle) - self.NGRAM + 1)),
+                    key=len,
+                )
+                candidates = set.intersection(*postings)
+            return sorted(plate for plate in candidates if needle in plate)
+
+    def stats(self, plates):
+        with self._lock:
+            entries = [self._plates[plate] for plate in plates]
+        return {
+            'stops': sum(e['stops'] for e in entries),
+            'arrests': sum(e['arrests'] for e in entries),
+            'searches': sum(e['searches'] for e in entries),
+        }
+
+    def row_ids(self, plates, limit=None):
+        with self._lock:
+            ids = sorted(i for plate in plates for i in self._plates[plate]['rows'])
+        return ids if limit is None else ids[:limit]
+
+    def load(self, after_id=0, until_id=None):
+        """Add the rows with after_id < id <= until_id, by default up to the current MAX(id)."""
+        query = """
+            SELECT id, vehicle_number, is_arrested, search_conducted
+            FROM traffic_stops
+            WHERE id > :after_id AND id <= :until_id AND vehicle_number IS NOT NULL
+            ORDER BY id
+        """
+        with self.engine.connect() as conn:
+            if until_id is None:
+                until_id = conn.execute(text(LIVE_WATERMARK_QUERY)).scalar() or 0
+            for chunk in pd.read_sql(text(query), conn, params={'after_id': after_id, 'until_id': until_id},
+                                     chunksize=VEHICLE_INDEX_CHUNK_SIZE):
+                self.add_frame(chunk)
+        # Rows without a plate up to until_id are read past, not added.
+        with self._lock:
+            self.max_id = max(self.max_id, int(until_id))
+
+    def refresh(self, latest_id):
+        """Pick up rows inserted since the index was built, by this or any other process.
+
+        Returns at once while another thread refreshes. Once the index is
+        reconcile_seconds old, or the table shrank, it is rebuilt in the
+        background instead.
+        """
+        if latest_id is None:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        # The table shrank, or it is time to pick up rows committed out of id order.
+        if latest_id < self.max_id or time.monotonic() - self.loaded_at > self.reconcile_seconds:
+            threading.Thread(target=self._reconcile, name="vehicle-index-reconcile", daemon=True).start()
+            return
+        try:
+            if latest_id > self.max_id:
+                self.load(after_id=self.max_id, until_id=latest_id)
+        finally:
+            self._refresh_lock.release()
+
+    def _reconcile(self):
+        try:
+            self._rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    def rebuild(self):
+        """Recompute the index from scratch, e.g. after rows were updated or deleted."""
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Built aside and swapped in, so lookups keep the old index meanwhile.
+        fresh = VehicleIndex(self.engine, self.reconcile_seconds)
+        fresh.load()
+        with self._lock:
+            self.max_id = fresh.max_id
+            self._plates = fresh._plates
+            self._sorted_plates = fresh._sorted_plates
+            self._sorted_stale = fresh._sorted_stale
+            self._grams = fresh._grams
+            self.loaded_at = time.monotonic()
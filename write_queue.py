@@ -0,0 +1,242 @@
+"""Durable, group-committed write path for Register New Case.
+
+A submission is validated, written to a local SQLite queue (WAL,
+synchronous=FULL) under an idempotency key and acknowledged as pending;
+that local commit is all the form waits for. A background writer drains
+the queue in batches, inserting each batch into traffic_stops in one
+transaction, so concurrent submissions share a commit. Keys already in
+traffic_stops.case_key are skipped, which makes retries after a crash
+between the database commit and the local confirmation safe: a queued
+case is written exactly once and never lost.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+from dateutil import tz
+from sqlalchemy import bindparam, exc, text
+
+from bulk_import import STOP_COLUMNS, coerce_record
+from instrumentation import origin
+
+QUEUE_PATH = os.environ.get('TRAFFIC_WRITE_QUEUE_PATH', os.path.join('queue', 'cases.sqlite'))
+GROUP_COMMIT_WINDOW_SECONDS = 0.02
+MAX_BATCH_SIZE = 500
+POLL_SECONDS = 1.0
+MAX_RETRY_SECONDS = 30.0
+CONFIRMED_RETENTION_SECONDS = 24 * 60 * 60
+# Errors that condemn the case itself; anything else is retried later.
+REJECTED_CASE_ERRORS = (exc.IntegrityError, exc.DataError)
+
+CASE_INSERT_QUERY = f"""
+    INSERT INTO traffic_stops ({', '.join(STOP_COLUMNS)}, case_key)
+    VALUES ({', '.join(':' + column for column in STOP_COLUMNS)}, :case_key)
+"""
+
+EXISTING_KEYS_QUERY = text(
+    "SELECT case_key FROM traffic_stops WHERE case_key IN :keys"
+).bindparams(bindparam('keys', expanding=True))
+
+QUEUE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cases (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        case_key TEXT NOT NULL UNIQUE,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        submitted_at REAL NOT NULL,
+        confirmed_at REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    )
+"""
+
+
+def new_case_key():
+    return str(uuid.uuid4())
+
+
+def validate_case(record):
+    """Coerce a form submission the way bulk imports are coerced; raise ValueError if unusable."""
+    row = coerce_record(record)
+    if row is None:
+        raise ValueError("A valid stop date is required")
+    return row
+
+
+class CaseQueue:
+    """Local durable queue of new cases and the writer thread that drains it.
+
+    on_commit(rows), if given, is called from the writer thread after each
+    batch reaches the database.
+    """
+
+    def __init__(self, engine, path=QUEUE_PATH, on_commit=None, instrumentation=None):
+        self.engine = engine
+        self.path = path
+        self.on_commit = on_commit
+        self.instrumentation = instrumentation
+        self.batches = 0
+        self.rows_written = 0
+        self.last_batch_size = 0
+        self.last_error = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = FULL")
+        self._db.execute(QUEUE_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ==================== SUBMITTING ====================
+    def submit(self, record, case_key=None):
+        """Queue a validated case durably and return its key.
+
+        Submitting the same key twice queues the case once.
+        """
+        case_key = case_key or new_case_key()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO cases (case_key, payload, submitted_at) VALUES (?, ?, ?)",
+                (case_key, json.dumps(record), time.time()),
+            )
+        self._wake.set()
+        return case_key
+
+    def status(self, case_keys):
+        """DataFrame of status, timestamps and error for the given keys, newest first."""
+        if not case_keys:
+            return pd.DataFrame(columns=['case_key', 'status', 'submitted_at', 'confirmed_at', 'error'])
+        placeholders = ", ".join("?" for _ in case_keys)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT case_key, status, submitted_at, confirmed_at, error FROM cases "
+                f"WHERE case_key IN ({placeholders}) ORDER BY seq DESC", list(case_keys),
+            ).fetchall()
+        result = pd.DataFrame(rows, columns=['case_key', 'status', 'submitted_at', 'confirmed_at', 'error'])
+        for column in ('submitted_at', 'confirmed_at'):
+            result[column] = pd.to_datetime(result[column], unit='s', utc=True).dt.tz_convert(tz.tzlocal()) \
+                .dt.tz_localize(None)
+        return result
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM cases GROUP BY status").fetchall())
+        return {
+            'pending': counts.get('pending', 0),
+            'confirmed': counts.get('confirmed', 0),
+            'failed': counts.get('failed', 0),
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'last_batch_size': self.last_batch_size,
+            'last_error': self.last_error,
+        }
+
+    # ==================== WRITER ====================
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="case-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def _run(self):
+        retry_seconds = POLL_SECONDS
+        with origin("Register New Case (writer)"):
+            while not self._stop.is_set():
+                # Pending cases left by a previous process are picked up on the first pass.
+                self._wake.wait(retry_seconds)
+                self._wake.clear()
+                # Let submissions arriving together share one commit.
+                time.sleep(GROUP_COMMIT_WINDOW_SECONDS)
+                try:
+                    self.flush()
+                    retry_seconds = POLL_SECONDS
+                except Exception as e:
+                    # The database is unreachable or not migrated; the cases stay pending.
+                    self.last_error = str(e)
+                    retry_seconds = min(retry_seconds * 2, MAX_RETRY_SECONDS)
+
+    def flush(self):
+        """Write every pending case and return how many reached the database."""
+        written = 0
+        while True:
+            with self._lock:
+                batch = self._db.execute(
+                    "SELECT case_key, payload FROM cases WHERE status = 'pending' ORDER BY seq LIMIT ?",
+                    (MAX_BATCH_SIZE,),
+                ).fetchall()
+            if not batch:
+                break
+            records = [dict(json.loads(payload), case_key=case_key) for case_key, payload in batch]
+            try:
+                written += self._write(records)
+            except REJECTED_CASE_ERRORS:
+                # Isolate the cases the database rejects so the rest still go through.
+                for record in records:
+                    try:
+                        written += self._write([record])
+                    except REJECTED_CASE_ERRORS as e:
+                        self._mark_failed(record['case_key'], e)
+        self._prune()
+        return written
+
+    def _write(self, records):
+        keys = [record['case_key'] for record in records]
+        with self._track() as event, self.engine.begin() as conn:
+            existing = set(conn.execute(EXISTING_KEYS_QUERY, {'keys': keys}).scalars())
+            new_records = [record for record in records if record['case_key'] not in existing]
+            if new_records:
+                conn.execute(text(CASE_INSERT_QUERY), new_records)
+            if event is not None:
+                event.rows = len(new_records)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE cases SET status = 'confirmed', confirmed_at = ?, attempts = attempts + 1, "
+                f"error = NULL WHERE case_key IN ({', '.join('?' for _ in keys)})",
+                [time.time()] + keys,
+            )
+        self.batches += 1
+        self.rows_written += len(new_records)
+        self.last_batch_size = len(records)
+        self.last_error = None
+        if self.on_commit is not None and new_records:
+            self.on_commit(len(new_records))
+        return len(new_records)
+
+    @contextmanager
+    def _track(self):
+        if self.instrumentation is None:
+            yield None
+        else:
+            with self.instrumentation.track('db', CASE_INSERT_QUERY) as event:
+                yield event
+
+    def _mark_failed(self, case_key, error):
+        with self._lock:
+            self._db.execute(
+                "UPDATE cases SET status = 'failed', attempts = attempts + 1, error = ? WHERE case_key = ?",
+                (str(error.orig if getattr(error, 'orig', None) is not None else error), case_key),
+            )
+
+    def _prune(self):
+        with self._lock:
+            self._db.execute("DELETE FROM cases WHERE status = 'confirmed' AND confirmed_at < ?",
+                             (time.time() - CONFIRMED_RETENTION_SECONDS,))